@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Remembers which session IDs were valid a moment ago.
+
+Every route checks that the client's session exists in the
+session store (see server.is_authenticated), and clients in a
+game poll all the time, so that's the same handful of checks
+over and over. Once a session's been found it's taken as valid
+for a little while (TTL seconds, or until it expires if that's
+sooner) without asking the store again.
+
+Sessions that get deleted are forgotten right away, as long
+as the store says so (see SQLiteStore.on_delete()). With any
+other store, a deleted session can still pass for up to TTL.
+"""
+
+from time import time, perf_counter
+
+from litestar.stores.base import Store
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# in seconds
+DEFAULT_TTL = 30
+
+# how many session IDs are remembered.
+# the oldest ones are dropped after that
+DEFAULT_CAPACITY = 65536
+
+
+###########
+# CLASSES #
+###########
+
+
+class AuthCache:
+    """
+    Session ID -> until when it counts as valid.
+    """
+
+    def __init__(self, store: Store, ttl: float = DEFAULT_TTL, capacity: int = DEFAULT_CAPACITY):
+        self.store = store
+        self.ttl = ttl
+        self.capacity = capacity
+
+        self._valid_until: dict[str, float] = dict()
+
+        self.hits = 0
+        self.misses = 0
+        # how long the checks took altogether, in seconds
+        self._hit_time = 0.0
+        self._miss_time = 0.0
+
+    def stats(self) -> dict:
+        checks = self.hits + self.misses
+        return {
+            "cached": len(self._valid_until),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / checks if checks else None,
+            # average time per check, in microseconds
+            "hit_us": self._hit_time / self.hits * 1e6 if self.hits else None,
+            "miss_us": self._miss_time / self.misses * 1e6 if self.misses else None,
+            "mean_us": (self._hit_time + self._miss_time) / checks * 1e6 if checks else None,
+        }
+
+    async def check(self, session_id: str | None) -> bool:
+        """
+        Whether the session exists (or did a moment ago).
+        """
+        start = perf_counter()
+        now = time()
+
+        valid_until = self._valid_until.get(session_id)
+
+        if valid_until is not None and now < valid_until:
+            self.hits += 1
+            self._hit_time += perf_counter() - start
+            return True
+
+        self.misses += 1
+        exists = session_id is not None and await self.store.exists(session_id)
+
+        if exists:
+            self._remember(session_id, now, await self.store.expires_in(session_id))
+        else:
+            self._valid_until.pop(session_id, None)
+
+        self._miss_time += perf_counter() - start
+        return exists
+
+    def _remember(self, session_id: str, now: float, expires_in: int | None) -> None:
+        ttl = self.ttl
+
+        # never past when the session itself expires
+        # (None if it doesn't, some stores say -1)
+        if expires_in is not None and expires_in >= 0:
+            ttl = min(ttl, expires_in)
+
+        if ttl <= 0:
+            return
+
+        if len(self._valid_until) >= self.capacity:
+            # dicts keep their order, so this is the oldest one
+            del self._valid_until[next(iter(self._valid_until))]
+
+        self._valid_until[session_id] = now + ttl
+
+    def forget(self, session_id: str | None = None) -> None:
+        """
+        Forgets a session, or every session if it's None.
+        """
+        if session_id is None:
+            self._valid_until.clear()
+        else:
+            self._valid_until.pop(session_id, None)
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Encode/decode throughput of the codec (codec.py),
+in both its JSON and binary formats, next to the
+old to_json style of str(__dict__) with swapped quotes.
+
+Run from the repository root with:
+
+python -m benchmarks.codec_throughput [iterations]
+"""
+
+import sys
+import json
+import random
+from time import perf_counter
+
+import codec
+from classes import Game, Hand, Group, IngameRow
+
+
+DEFAULT_ITERATIONS = 20_000
+
+
+def legacy_dumps(data: dict) -> str:
+    """
+    Roughly what the old to_json decorator did
+    (on plain dicts, since the decorator is gone).
+    """
+    return str(data).replace("'", '"').replace("False", "false").replace("True", "true")
+
+
+def legacy_loads(data: str) -> dict:
+    """
+    What every old construct_from_db did before
+    building the objects: try, fix the bools, try again.
+    """
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return json.loads(data.replace("False", "false").replace("True", "true"))
+
+
+def make_game() -> tuple[Game, Hand]:
+    """
+    A mid-game table: the pool drawn down, a
+    hand of tiles and a dozen groups on the table.
+    """
+    random.seed(1)
+    game = Game()
+    game.game_data.shuffled_pool = False
+    game.start()
+
+    rows = [IngameRow(hand=Hand()) for _ in range(4)]
+    game.dole_out_hands(rows)
+
+    for _ in range(12):
+        game.table.groups.append(Group(tiles=[game.draw_tile() for _ in range(4)]))
+
+    return game, rows[0].hand
+
+
+def timed(name: str, count: int, func) -> None:
+    start = perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = perf_counter() - start
+    print(f"{name:<32} {count / elapsed:>12,.0f} ops/s  ({elapsed / count * 1e6:.1f} us/op)")
+
+
+def main(count: int) -> None:
+    game, hand = make_game()
+
+    hand_dict = codec.hand_to_dict(hand)
+    table_dict = codec.table_to_dict(game.table)
+    row = codec.game_to_row(game)
+    columns = list(codec.GAME_SCHEMA)
+
+    hand_legacy = legacy_dumps(hand_dict)
+    table_legacy = legacy_dumps(table_dict)
+    hand_json = codec.dumps(hand_dict)
+    table_json = codec.dumps(table_dict)
+    hand_binary = codec.hand_to_bytes(hand)
+    table_binary = codec.table_to_bytes(game.table)
+
+    print(f"hand:  legacy {len(hand_legacy)} B, json {len(hand_json)} B, binary {len(hand_binary)} B")
+    print(f"table: legacy {len(table_legacy)} B, json {len(table_json)} B, binary {len(table_binary)} B")
+    print()
+
+    # ----------------
+    # hands
+    timed("hand encode (legacy)", count, lambda: legacy_dumps(codec.hand_to_dict(hand)))
+    timed("hand encode (json)", count, lambda: codec.dumps(codec.hand_to_dict(hand)))
+    timed("hand encode (binary)", count, lambda: codec.hand_to_bytes(hand))
+    timed("hand decode (legacy)", count, lambda: codec.hand_from_dict(legacy_loads(hand_legacy)))
+    timed("hand decode (json)", count, lambda: codec.decode_hand(hand_json))
+    timed("hand decode (binary)", count, lambda: codec.decode_hand(hand_binary))
+    print()
+
+    # ----------------
+    # tables
+    timed("table encode (legacy)", count, lambda: legacy_dumps(codec.table_to_dict(game.table)))
+    timed("table encode (json)", count, lambda: codec.encode_table(game.table))
+    timed("table encode (binary)", count, lambda: codec.table_to_bytes(game.table))
+    timed("table decode (legacy)", count, lambda: codec.table_from_dict(legacy_loads(table_legacy)))
+    timed("table decode (json)", count, lambda: codec.decode_table(table_json))
+    timed("table decode (binary)", count, lambda: codec.decode_table(table_binary))
+    print()
+
+    # ----------------
+    # settings and whole games
+    timed("settings encode", count, lambda: codec.encode_settings(game.game_data))
+    timed("settings decode", count, lambda: codec.decode_settings(row[5]))
+    timed("game encode", count, lambda: codec.game_to_row(game))
+    timed("game decode", count, lambda: codec.game_from_row(row, columns))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS)
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Latency of /game/{id} and /game/{id}/board when the client
+already has the current version (If-None-Match, answered
+with a 304 by etags.ConditionalGetMiddleware) next to a
+plain request that builds the whole response.
+
+Runs the real app in-process (no network), in a
+temporary directory so the database is a fresh one.
+
+Run from the repository root with:
+
+python -m benchmarks.conditional_get [requests]
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from itertools import count as counter
+from time import perf_counter
+
+
+DEFAULT_REQUESTS = 2_000
+PLAYERS = 4
+
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def timed(name: str, count: int, request) -> None:
+    latencies = list()
+
+    for _ in range(count):
+        start = perf_counter()
+        await request()
+        latencies.append(perf_counter() - start)
+
+    latencies.sort()
+    print(
+        f"{name:<28} mean {sum(latencies) / count * 1e6:>7.0f} us, "
+        f"p50 {percentile(latencies, 0.5) * 1e6:>7.0f} us, "
+        f"p99 {percentile(latencies, 0.99) * 1e6:>7.0f} us"
+    )
+
+
+async def main(count: int) -> None:
+    # server.py keeps its data in ./data
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from litestar.testing import AsyncTestClient
+    import server
+
+    addresses = counter()
+
+    async def app(scope, receive, send):
+        # every request "comes from" somewhere else,
+        # otherwise the rate limit kicks in right away
+        if scope["type"] == "http":
+            n = next(addresses)
+            scope["client"] = (f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}", 0)
+        await server.app(scope, receive, send)
+
+    async with AsyncTestClient(app=app) as client:
+        cookies = list()
+
+        # every client needs its own session
+        for i in range(PLAYERS):
+            response = await client.put(f"/api/user/player{i}")
+            client.cookies.clear()
+            cookies.append({"cookie": response.headers["set-cookie"].split(";")[0]})
+
+        game_id = (await client.post("/api/game/", headers=cookies[0])).json()["id"]
+        for headers in cookies:
+            await client.post(f"/api/game/{game_id}/join", headers=headers)
+        await client.put(f"/api/game/{game_id}/start", headers=cookies[0])
+
+        headers = cookies[0]
+        game_url = f"/api/game/{game_id}"
+        board_url = f"/api/game/{game_id}/board"
+
+        game_etag = (await client.get(game_url, headers=headers)).headers["etag"]
+        board_etag = (await client.get(board_url, headers=headers)).headers["etag"]
+
+        assert (await client.get(board_url, headers={**headers, "if-none-match": board_etag})).status_code == 304
+
+        print(f"{PLAYERS} players, {count} requests each")
+        print()
+
+        await timed("/game (200)", count, lambda: client.get(game_url, headers=headers))
+        await timed("/game (304)", count, lambda: client.get(
+            game_url, headers={**headers, "if-none-match": game_etag}
+        ))
+        print()
+
+        await timed("/board (200)", count, lambda: client.get(board_url, headers=headers))
+        await timed("/board (304)", count, lambda: client.get(
+            board_url, headers={**headers, "if-none-match": board_etag}
+        ))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS))
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Lookups on an un-indexed database (the schema from
+before SCHEMA_VERSION 1) next to the same database
+after it has been migrated by initialize_db_and_tables.
+
+Run from the repository root with:
+
+python -m benchmarks.ingame_indexes [ingame rows]
+"""
+
+import os
+import sys
+import random
+import shutil
+import sqlite3
+import tempfile
+from uuid import uuid4
+from time import perf_counter
+
+import queries
+from functions import initialize_db_and_tables
+
+
+DEFAULT_ROWS = 100_000
+PLAYERS_PER_GAME = 4
+LOOKUPS = 500
+
+# what the tables looked like before they were keyed
+OLD_SCHEMA = """
+CREATE TABLE games(
+    gameID TEXT, gameState TEXT, lastActive TEXT, currentPlayerTurn INT,
+    tableContents TEXT, gameData TEXT, PRIMARY KEY(gameID DESC));
+CREATE TABLE ingame(
+    userID TEXT, gameID TEXT, turnNumber INT, hand TEXT,
+    FOREIGN KEY(gameID) REFERENCES games(gameID));
+"""
+
+# about the size of a starting hand, the
+# contents don't matter for any of these queries
+HAND = '{"score":0,"tiles":[' + ",".join(['{"number":1,"color":"#000000","joker":false}'] * 14) + "]}"
+
+
+def populate(path: str, rows: int) -> list[tuple[str, str]]:
+    """
+    Creates an old-style database with the amount of ingame rows.
+    Returns every (gameID, userID) pair.
+    """
+    random.seed(1)
+    con = sqlite3.connect(path)
+    con.executescript(OLD_SCHEMA)
+
+    games = list()
+    pairs = list()
+
+    for _ in range(rows // PLAYERS_PER_GAME):
+        game_id = uuid4().hex
+        day = f"2024-{random.randint(1, 12):02}-{random.randint(1, 28):02}"
+        games.append((game_id, "ONGOING", day, 0, "{}", "{}"))
+        pairs += [(game_id, uuid4().hex) for _ in range(PLAYERS_PER_GAME)]
+
+    con.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?);", games)
+    con.executemany(
+        "INSERT INTO ingame VALUES (?, ?, ?, ?);",
+        [(user_id, game_id, 0, HAND) for game_id, user_id in pairs],
+    )
+    con.commit()
+    con.close()
+
+    return pairs
+
+
+def timed(name: str, lookups: list[tuple[str, str]], func) -> None:
+    start = perf_counter()
+    for game_id, user_id in lookups:
+        func(game_id, user_id)
+    elapsed = perf_counter() - start
+    print(f"{name:<24} {elapsed / len(lookups) * 1e6:>10.1f} us/query")
+
+
+def run_queries(con: sqlite3.Connection, lookups: list[tuple[str, str]]) -> None:
+    timed("ingame row", lookups, lambda g, u: queries.ingame_row(con, g, u))
+    timed("players in game", lookups, lambda g, u: queries.players_in_game(con, g))
+    timed("games with player", lookups, lambda g, u: queries.games_with_player(con, u))
+    timed("set hand", lookups, lambda g, u: con.execute(
+        queries.SET_HAND, {"game_id": g, "user_id": u, "hand": HAND}
+    ))
+    con.rollback()
+
+
+def main(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        old_path = os.path.join(directory, "old.db")
+        new_path = os.path.join(directory, "new.db")
+
+        pairs = populate(old_path, rows)
+        shutil.copy(old_path, new_path)
+        lookups = [random.choice(pairs) for _ in range(LOOKUPS)]
+
+        print(f"{rows} ingame rows, {len(pairs) // PLAYERS_PER_GAME} games, {LOOKUPS} lookups each")
+        print()
+
+        con = sqlite3.connect(new_path)
+        start = perf_counter()
+        initialize_db_and_tables(con)
+        print(f"migration took {perf_counter() - start:.2f} s")
+        print()
+
+        old_con = sqlite3.connect(old_path)
+        print("before (no keys or indexes):")
+        run_queries(old_con, lookups)
+        old_con.close()
+        print()
+
+        print("after:")
+        run_queries(con, lookups)
+        con.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
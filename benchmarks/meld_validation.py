@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Compares the meld lookup engine (melds.py) to the
+sort-and-walk validation Group used before it.
+
+Run from the repository root with:
+
+python -m benchmarks.meld_validation [group count]
+
+NOTE: the old Group._is_set/_is_run are gone (_is_run
+didn't work: it changed the numbers of frozen jokers and
+sorted Tiles, which can't be sorted), so old_is_set and
+old_is_run below do the same walk the way it was meant to.
+Both sides should count the same number of valid groups.
+"""
+
+import sys
+import random
+from time import perf_counter
+
+from classes import COLORS, Tile, Group, GameSettings, get_code_table
+
+
+# groups are drawn from this many pre-made groups
+# so that millions of Tiles don't have to exist at once
+DISTINCT_GROUPS = 10_000
+DEFAULT_GROUP_COUNT = 1_000_000
+
+
+def random_group(settings: GameSettings) -> list[Tile]:
+    """
+    Returns a group that's valid about half of the time.
+    """
+    colors = list(COLORS.values())
+    jokers = random.choice([0, 0, 0, 1, 2])
+    tiles = list()
+
+    if random.random() < 0.5:
+        # a run, possibly with a gap
+        color = random.choice(colors)
+        length = random.randint(3, 6)
+        start = random.randint(settings.min_tile, settings.max_tile - length + 1)
+        tiles = [Tile(number=n, color=color) for n in range(start, start + length)]
+        if random.random() < 0.3:
+            tiles.pop(random.randrange(len(tiles)))
+    elif random.random() < 0.5:
+        # a set
+        number = random.randint(settings.min_tile, settings.max_tile)
+        tiles = [Tile(number=number, color=c) for c in random.sample(colors, random.randint(2, 4))]
+    else:
+        # just random tiles
+        tiles = [
+            Tile(number=random.randint(settings.min_tile, settings.max_tile), color=random.choice(colors))
+            for _ in range(random.randint(3, 5))
+        ]
+
+    tiles += [Tile(color=random.choice(colors), joker=True) for _ in range(jokers)]
+    random.shuffle(tiles)
+    return tiles
+
+
+def old_is_set(tiles: list[Tile]) -> bool:
+    """
+    Every numbered tile has the same number and a different
+    color, and there are no more tiles than colors.
+    (jokers fill in for anything)
+    """
+    numbered = [tile for tile in tiles if not tile.joker]
+
+    if not numbered or len(tiles) > len(COLORS):
+        return False
+
+    same_number = all(tile.number == numbered[0].number for tile in numbered)
+    return same_number and len({tile.color for tile in numbered}) == len(numbered)
+
+
+def old_is_run(tiles: list[Tile], min_tile: int, max_tile: int) -> bool:
+    """
+    Sorts the numbered tiles and walks the gaps between
+    them, filling each one with jokers. Whatever jokers are
+    left have to fit before or after the run.
+    """
+    numbered = sorted(tile.number for tile in tiles if not tile.joker)
+
+    if not numbered or len({tile.color for tile in tiles if not tile.joker}) != 1:
+        return False
+
+    jokers = len(tiles) - len(numbered)
+
+    for previous, number in zip(numbered, numbered[1:]):
+        # a gap of -1 is the same number twice
+        gap = number - previous - 1
+        jokers -= gap
+
+        if gap < 0 or jokers < 0:
+            return False
+
+    return jokers <= (max_tile - min_tile) - (numbered[-1] - numbered[0])
+
+
+def old_is_valid(group: Group, settings: GameSettings) -> bool:
+    """
+    What Group.is_valid() used to do.
+    """
+    if len(group.tiles) < 3:
+        return False
+
+    tiles = list(group.tiles)
+    return old_is_set(tiles) or old_is_run(tiles, settings.min_tile, settings.max_tile)
+
+
+def main(count: int) -> None:
+    random.seed(1)
+    settings = GameSettings()
+    groups = [random_group(settings) for _ in range(DISTINCT_GROUPS)]
+
+    start = perf_counter()
+    meld_table = settings.meld_table()
+    build_time = perf_counter() - start
+    print(f"built table of {len(meld_table.melds)} melds in {build_time * 1000:.1f} ms")
+
+    # the Groups are made fresh for every pass over the
+    # pre-made groups (is_valid() reorders them), but
+    # making them isn't timed, only validating them
+    def timed(validate) -> tuple[float, int]:
+        total = 0.0
+        valid = 0
+        done = 0
+        while done < count:
+            batch = [Group(tiles=list(g)) for g in groups[:count - done]]
+            start = perf_counter()
+            for group in batch:
+                if validate(group):
+                    valid += 1
+            total += perf_counter() - start
+            done += len(batch)
+        return total, valid
+
+    # ----------------
+    # old implementation
+    old_time, old_valid = timed(lambda group: old_is_valid(group, settings))
+
+    # ----------------
+    # lookup engine, through Group.is_valid()
+    new_time, new_valid = timed(lambda group: group.is_valid(settings.max_tile, settings.min_tile))
+
+    # ----------------
+    # lookup engine on its own
+    code_table = get_code_table(settings.min_tile, settings.max_tile)
+    codes = [[t.code for t in g] for g in groups]
+    start = perf_counter()
+    for i in range(count):
+        meld_table.order_codes(codes[i % DISTINCT_GROUPS], code_table)
+    raw_time = perf_counter() - start
+
+    print(f"{count} groups")
+    print(f"old sort-and-walk:         {old_time:.2f} s ({old_time / count * 1e9:.0f} ns/group, {old_valid} valid)")
+    print(f"Group.is_valid():          {new_time:.2f} s ({new_time / count * 1e9:.0f} ns/group, {new_valid} valid)")
+    print(f"MeldTable.order_codes(): {raw_time:.2f} s ({raw_time / count * 1e9:.0f} ns/group)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_GROUP_COUNT)
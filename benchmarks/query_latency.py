@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Per-query latency of the old f-string SQL (a new
+statement text for every game/user, so SQLite compiles
+each one from scratch) next to the parameterized
+statements in queries.py (compiled once, then reused
+from the connection's statement cache).
+
+Run from the repository root with:
+
+python -m benchmarks.query_latency [queries]
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+from uuid import uuid4
+from time import perf_counter
+
+import queries
+from classes import Game, Hand, IngameRow
+from functions import initialize_db_and_tables
+
+
+DEFAULT_QUERIES = 50_000
+GAME_COUNT = 2_000
+PLAYERS_PER_GAME = 4
+
+
+def populate(con: sqlite3.Connection) -> list[tuple[str, str]]:
+    """
+    Fills the database with started games.
+    Returns every (gameID, userID) pair.
+    """
+    random.seed(1)
+    pairs = list()
+
+    for _ in range(GAME_COUNT):
+        game = Game()
+        game.start()
+        rows = [IngameRow(user_id=uuid4().hex, game_id=str(game.id), hand=Hand()) for _ in range(PLAYERS_PER_GAME)]
+        game.dole_out_hands(rows)
+
+        queries.insert_game(con, game)
+        for turn, row in enumerate(rows):
+            queries.insert_player(con, row.user_id, row.game_id, turn, row.hand)
+            pairs.append((row.game_id, row.user_id))
+
+    con.commit()
+    return pairs
+
+
+def timed(name: str, pairs: list[tuple[str, str]], func) -> None:
+    start = perf_counter()
+    for game_id, user_id in pairs:
+        func(game_id, user_id)
+    elapsed = perf_counter() - start
+    print(f"{name:<36} {elapsed / len(pairs) * 1e6:>8.1f} us/query")
+
+
+def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        con = sqlite3.connect(
+            os.path.join(directory, "bench.db"),
+            cached_statements=queries.STATEMENT_CACHE_SIZE,
+        )
+        initialize_db_and_tables(con)
+        pairs = populate(con)
+        lookups = [random.choice(pairs) for _ in range(count)]
+
+        print(f"{GAME_COUNT} games, {len(pairs)} ingame rows, {count} queries each")
+        print()
+
+        # ----------------
+        # game by ID
+        timed("game by id (f-string)", lookups, lambda g, u: con.execute(
+            f"SELECT * FROM games WHERE gameID == '{g}';"
+        ).fetchone())
+        timed("game by id (queries.py)", lookups, lambda g, u: queries.game_by_id(con, g))
+        print()
+
+        # ----------------
+        # one player's row
+        timed("ingame row (f-string)", lookups, lambda g, u: con.execute(
+            f"SELECT * FROM ingame WHERE gameID == '{g}' AND userID == '{u}';"
+        ).fetchone())
+        timed("ingame row (queries.py)", lookups, lambda g, u: queries.ingame_row(con, g, u))
+        print()
+
+        # ----------------
+        # players in a game
+        timed("players in game (f-string)", lookups, lambda g, u: con.execute(
+            f"SELECT userID FROM ingame WHERE gameID == '{g}';"
+        ).fetchall())
+        timed("players in game (queries.py)", lookups, lambda g, u: queries.players_in_game(con, g))
+
+        con.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_QUERIES)
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+The session store (sessionstore.SQLiteStore) next to
+litestar's FileStore, which is what the server used before.
+
+Both get the same sessions, half of which expire right away,
+then each gets timed on what the server does with sessions:
+saving one, loading one (renewing it, like renew_on_access
+does), checking that one exists (every authenticated request)
+and deleting the expired ones (/clear).
+
+"cold" is a new SQLiteStore on the same database, i.e.
+nothing in memory yet, like right after a restart.
+
+Everything goes in a temporary directory.
+
+Run from the repository root with:
+
+python -m benchmarks.session_store [sessions] [lookups]
+"""
+
+import os
+import sys
+import json
+import random
+import asyncio
+import secrets
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from litestar.stores.file import FileStore
+
+from sessionstore import SQLiteStore
+
+
+DEFAULT_SESSIONS = 100_000
+DEFAULT_LOOKUPS = 10_000
+
+# the same as server.py
+MAX_AGE = 60 * 60 * 12
+# the ones that expire right away
+SHORT_AGE = 1
+
+
+async def timed(name: str, count: int, func, keys) -> None:
+    start = perf_counter()
+    for key in keys:
+        await func(key)
+    elapsed = perf_counter() - start
+
+    print(f"{name:<34} {elapsed:>8.2f} s total, {elapsed / count * 1e6:>8.1f} us each")
+
+
+async def populate(store, sessions: list[str]) -> None:
+    start = perf_counter()
+
+    for i, key in enumerate(sessions):
+        value = json.dumps({"username": f"player{i}"}).encode()
+        await store.set(key, value, expires_in=SHORT_AGE if i % 2 else MAX_AGE)
+
+    elapsed = perf_counter() - start
+    print(f"{'set (new)':<34} {elapsed:>8.2f} s total, {elapsed / len(sessions) * 1e6:>8.1f} us each")
+
+
+async def run(name: str, store, sessions: list[str], lookup_count: int, reopen=None) -> None:
+    print(name)
+
+    await populate(store, sessions)
+    # let the short ones expire
+    await asyncio.sleep(SHORT_AGE + 0.1)
+
+    live = [key for i, key in enumerate(sessions) if i % 2 == 0]
+    lookups = random.sample(live, lookup_count)
+
+    if reopen is not None:
+        cold = reopen()
+        await timed("get + renew (cold)", lookup_count, lambda key: cold.get(key, renew_for=MAX_AGE), lookups)
+        cold.close()
+
+    await timed("get + renew", lookup_count, lambda key: store.get(key, renew_for=MAX_AGE), lookups)
+    await timed("exists", lookup_count, store.exists, lookups)
+
+    async def save_unchanged(key: str) -> None:
+        # what the session middleware does at the end of a request
+        await store.set(key, await store.get(key), expires_in=MAX_AGE)
+
+    await timed("set (unchanged)", lookup_count, save_unchanged, lookups)
+
+    start = perf_counter()
+    await store.delete_expired()
+    print(f"{'delete_expired':<34} {perf_counter() - start:>8.2f} s")
+
+    assert not await store.exists(sessions[1])
+    assert await store.exists(sessions[0])
+    print()
+
+
+async def main(session_count: int, lookup_count: int) -> None:
+    directory = tempfile.mkdtemp()
+    sessions = [secrets.token_hex(16) for _ in range(session_count)]
+    lookup_count = min(lookup_count, session_count // 2)
+
+    print(f"{session_count} sessions, {lookup_count} lookups")
+    print()
+
+    path = os.path.join(directory, "sessions.db")
+    store = SQLiteStore(path)
+    await run("SQLiteStore", store, sessions, lookup_count, reopen=lambda: SQLiteStore(path))
+    store.close()
+
+    await run("FileStore", FileStore(path=Path(directory, "sessions")), sessions, lookup_count)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    defaults = [DEFAULT_SESSIONS, DEFAULT_LOOKUPS]
+    asyncio.run(main(*(args + defaults[len(args):])))
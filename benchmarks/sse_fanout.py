@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+How long a published message takes to reach every
+subscriber (broadcast.py) with hundreds of
+subscribers in each of thousands of games.
+
+Every subscriber is a task iterating over its
+Subscription, like the SSE stream in server.py does.
+
+Run from the repository root with:
+
+python -m benchmarks.sse_fanout [games] [subscribers per game] [rounds]
+"""
+
+import sys
+import asyncio
+from time import perf_counter
+
+from broadcast import Broadcaster
+
+
+DEFAULT_GAMES = 1_000
+DEFAULT_SUBSCRIBERS = 200
+DEFAULT_ROUNDS = 5
+
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def main(game_count: int, subscriber_count: int, rounds: int) -> None:
+    total = game_count * subscriber_count
+    # every one of them is open the whole time
+    broadcaster = Broadcaster(max_streams=total, heartbeat_interval=None)
+    latencies = list()
+    received = 0
+    all_received = asyncio.Event()
+
+    async def subscriber(game_id: str) -> None:
+        nonlocal received
+        subscription = broadcaster.subscribe(game_id)
+
+        try:
+            async for event in subscription:
+                latencies.append(perf_counter() - event.data["sent_at"])
+                received += 1
+                if received == total:
+                    all_received.set()
+        finally:
+            subscription.close()
+
+    start = perf_counter()
+    game_ids = [f"game-{i}" for i in range(game_count)]
+    tasks = [
+        asyncio.create_task(subscriber(game_id))
+        for game_id in game_ids
+        for _ in range(subscriber_count)
+    ]
+    # let every task subscribe
+    await asyncio.sleep(0)
+    print(f"{game_count} games x {subscriber_count} subscribers = {total} subscribers")
+    print(f"subscribing took {perf_counter() - start:.2f} s")
+    print()
+
+    for round_number in range(rounds):
+        latencies.clear()
+        received = 0
+        all_received.clear()
+
+        start = perf_counter()
+        for game_id in game_ids:
+            broadcaster.publish(game_id, "move", {"sent_at": perf_counter()})
+        publish_time = perf_counter() - start
+
+        await all_received.wait()
+        total_time = perf_counter() - start
+        latencies.sort()
+
+        print(
+            f"round {round_number + 1}: publish {publish_time / game_count * 1e6:.1f} us/game, "
+            f"all delivered in {total_time * 1000:.0f} ms, "
+            f"latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms"
+        )
+
+    # ----------------
+    # unsubscribing and cleaning up
+    start = perf_counter()
+    for game_id in game_ids:
+        broadcaster.close(game_id)
+    await asyncio.gather(*tasks)
+    print()
+    print(f"closing every game took {perf_counter() - start:.2f} s, channels left: {broadcaster.subscriber_count()}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    defaults = [DEFAULT_GAMES, DEFAULT_SUBSCRIBERS, DEFAULT_ROUNDS]
+    asyncio.run(main(*(args + defaults[len(args):])))
@@ -0,0 +1,508 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Sends game notifications to every client
+listening to a game (over SSE, see server.py).
+
+Every connection gets its own Subscription with a
+small queue of its own, so one message reaches ALL
+of the players in a game, not just whoever happened
+to grab it from a shared queue first.
+
+Every message is a GameEvent with a sequence number that
+goes up by one for each event of a game, so a client that
+sees a number get skipped knows it missed something and
+can grab the whole board again instead.
+
+The numbers are only kept in memory, so they start over
+whenever the server restarts or a game is forgotten (see
+close()). Each time they do, the game gets a new epoch, and
+event IDs are "<epoch>:<seq>", so a client can tell a number
+from before apart from the same number now. (an epoch is
+the Broadcaster's boot ID plus a counter, e.g. "3f2a9c1e.7")
+
+The last few events of each game are kept around, so a client
+that reconnects (sending the Last-Event-ID it got up to) is
+sent just the events it missed. Only if those are too old to
+still be around, or from another epoch, is it told to grab
+the whole board instead (with a "snapshot" event).
+
+Slow clients can't make the server hold onto an
+endless amount of messages either: once a queue is full,
+everything in it is dropped in favor of the newest event.
+The client notices the skipped sequence numbers and grabs
+the board once, instead of working through a backlog
+of changes that are already out of date.
+
+The Broadcaster also looks after the connections themselves:
+- streams get a HEARTBEAT when there's nothing to send, so a
+  client that's gone is noticed when writing it fails (which
+  ends the stream)
+- a reaper closes streams that haven't taken anything for too
+  long (stuck or never started) and forgets games nobody has
+  listened to or sent anything to in a while
+- there's a limit on open streams, per session and overall
+"""
+
+import asyncio
+import logging
+import secrets
+from time import monotonic
+from itertools import count
+from collections import deque
+from dataclasses import dataclass, field
+
+
+logger = logging.getLogger(__name__)
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# how many messages a subscriber
+# can fall behind before losing some
+DEFAULT_MAX_PENDING = 16
+
+# how many of each game's latest events are
+# kept for clients that reconnect
+DEFAULT_HISTORY_SIZE = 64
+
+# all in seconds
+# a stream with nothing to send gets a heartbeat this often
+HEARTBEAT_INTERVAL = 15.0
+# a stream that hasn't taken a message or heartbeat
+# in this long is closed
+STALE_AFTER = HEARTBEAT_INTERVAL * 3
+# a game with no streams and no events in this long is forgotten
+IDLE_GAME_AFTER = 60.0 * 60
+
+# open streams allowed per session and overall
+MAX_STREAMS_PER_SESSION = 4
+MAX_STREAMS = 10_000
+
+
+###########
+# CLASSES #
+###########
+
+
+@dataclass(frozen=True)
+class GameEvent:
+    """
+    A notification about a game.
+
+    epoch: which numbering seq belongs to, see above
+    seq: the game's sequence number for this event
+    event: the type of event, e.g. "move"
+    data: whatever changed, should be JSON-able
+    """
+    epoch: str
+    seq: int
+    event: str
+    data: dict = field(default_factory=dict)
+
+    @property
+    def id(self) -> str:
+        """
+        The event's ID, as sent to clients.
+        """
+        return event_id(self.epoch, self.seq)
+
+
+def event_id(epoch: str, seq: int) -> str:
+    return f"{epoch}:{seq}"
+
+
+def parse_event_id(value: str | None) -> tuple[str, int] | None:
+    """
+    (epoch, seq) of an event ID, None if it isn't one.
+    """
+    if value is None:
+        return None
+
+    epoch, _, seq = value.rpartition(":")
+
+    try:
+        return epoch, int(seq)
+    except ValueError:
+        return None
+
+
+# what a Subscription gives out when there's been
+# nothing to send for a while (compare with "is")
+HEARTBEAT = GameEvent(epoch="", seq=0, event="heartbeat")
+
+
+class StreamLimitReached(Exception):
+    """
+    Raised when subscribing would go over
+    MAX_STREAMS_PER_SESSION or MAX_STREAMS.
+    """
+
+
+class Subscription:
+    """
+    One client's stream of messages for a game.
+
+    Use it as an async iterator; it stops once
+    it's closed (or the game's channel is), and
+    gives out a HEARTBEAT every heartbeat_interval
+    seconds that there's nothing else.
+    """
+
+    def __init__(
+        self,
+        broadcaster: "Broadcaster",
+        game_id: str,
+        owner: str | None = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        heartbeat_interval: float | None = HEARTBEAT_INTERVAL,
+    ):
+        self.broadcaster = broadcaster
+        self.game_id = game_id
+        # the session it belongs to
+        self.owner = owner
+        self.max_pending = max_pending
+        self.heartbeat_interval = heartbeat_interval
+
+        self._pending: deque = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        # the last time anything was taken from it
+        self.last_seen = monotonic()
+
+        # how many messages were dropped
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.get(self.heartbeat_interval)
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    def put(self, message) -> None:
+        """
+        Queues a message without ever waiting.
+        """
+        if self.closed:
+            return
+
+        # they're too far behind for the backlog to be worth
+        # anything, the sequence numbers tell them to catch up
+        if len(self._pending) >= self.max_pending:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+
+        self._pending.append(message)
+        self._ready.set()
+
+    async def get(self, timeout: float | None = None):
+        """
+        Waits for the next message.
+        Returns None once the subscription is closed
+        or HEARTBEAT if nothing came within the timeout.
+        """
+        while not self._pending:
+            if self.closed:
+                return None
+
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except TimeoutError:
+                self.last_seen = monotonic()
+                return HEARTBEAT
+
+        self.last_seen = monotonic()
+        return self._pending.popleft()
+
+    def close(self) -> None:
+        """
+        Unsubscribes. Anything still pending
+        is delivered before get() returns None.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        # wake up whoever is waiting so they see it's closed
+        self._ready.set()
+        self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """
+    Game ID -> every Subscription to that game.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        heartbeat_interval: float | None = HEARTBEAT_INTERVAL,
+        stale_after: float = STALE_AFTER,
+        idle_game_after: float = IDLE_GAME_AFTER,
+        max_streams_per_session: int = MAX_STREAMS_PER_SESSION,
+        max_streams: int = MAX_STREAMS,
+    ):
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.idle_game_after = idle_game_after
+        self.max_streams_per_session = max_streams_per_session
+        self.max_streams = max_streams
+
+        self._channels: dict[str, set[Subscription]] = dict()
+
+        # different every time the server starts,
+        # so epochs never repeat, see above
+        self.boot_id = secrets.token_hex(4)
+        self._epoch_counter = count(1)
+        # game ID -> the epoch its numbers are in
+        self._epochs: dict[str, str] = dict()
+        # game ID -> sequence number of its latest event.
+        # kept whether or not anyone is subscribed
+        self._sequences: dict[str, int] = dict()
+        # game ID -> its latest events, oldest first
+        self._history: dict[str, deque[GameEvent]] = dict()
+        # game ID -> when its latest event was sent
+        self._last_event_at: dict[str, float] = dict()
+
+        # session -> how many streams it has open
+        self._streams_by_owner: dict[str, int] = dict()
+        self._stream_count = 0
+
+        self._reaper: asyncio.Task | None = None
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._channels
+
+    def subscriber_count(self, game_id: str | None = None) -> int:
+        """
+        The amount of subscribers to the
+        game given, or to all of them.
+        """
+        if game_id is not None:
+            return len(self._channels.get(game_id, ()))
+        return self._stream_count
+
+    def stats(self) -> dict:
+        return {
+            "streams": self._stream_count,
+            "sessions": len(self._streams_by_owner),
+            "channels": len(self._channels),
+            "games": len(self._epochs),
+        }
+
+    def epoch(self, game_id: str) -> str:
+        """
+        The epoch the game's sequence numbers are in. A game that
+        doesn't have one yet gets one (and is forgotten again
+        once it's idle, same as a game that had events).
+        """
+        epoch = self._epochs.get(game_id)
+
+        if epoch is None:
+            epoch = self._epochs[game_id] = f"{self.boot_id}.{next(self._epoch_counter)}"
+            self._last_event_at.setdefault(game_id, monotonic())
+
+        return epoch
+
+    def sequence(self, game_id: str) -> int:
+        """
+        The sequence number of the game's latest event,
+        i.e. what a snapshot of the game right now is up to.
+        (in the game's epoch, see epoch())
+        """
+        return self._sequences.get(game_id, 0)
+
+    def last_event_id(self, game_id: str) -> str:
+        """
+        The ID of the game's latest event, i.e. epoch()
+        and sequence() together, as clients see it.
+        """
+        return event_id(self.epoch(game_id), self.sequence(game_id))
+
+    def subscribe(self, game_id: str, last_event_id: str | None = None, owner: str | None = None) -> Subscription:
+        """
+        Subscribes to a game's events.
+
+        last_event_id: the ID of the last event a reconnecting
+        client got. Whatever it missed since then is sent first,
+        or a "snapshot" event if that's no longer possible.
+
+        owner: the session subscribing, for the per-session limit.
+
+        Raises StreamLimitReached if there are too many streams open.
+        """
+        if self._stream_count >= self.max_streams:
+            raise StreamLimitReached("The server has too many open streams.")
+        if owner is not None and self._streams_by_owner.get(owner, 0) >= self.max_streams_per_session:
+            raise StreamLimitReached("This session has too many open streams.")
+
+        subscription = Subscription(self, game_id, owner, self.max_pending, self.heartbeat_interval)
+        self._channels.setdefault(game_id, set()).add(subscription)
+
+        self._stream_count += 1
+        if owner is not None:
+            self._streams_by_owner[owner] = self._streams_by_owner.get(owner, 0) + 1
+
+        if last_event_id is not None:
+            self._catch_up(subscription, last_event_id)
+
+        return subscription
+
+    def _catch_up(self, subscription: Subscription, last_event_id: str) -> None:
+        game_id = subscription.game_id
+        epoch = self.epoch(game_id)
+        seq = self.sequence(game_id)
+        last = parse_event_id(last_event_id)
+
+        # the numbers started over since (or it isn't an
+        # ID at all), so the client's board can't be caught
+        # up, whatever its number says
+        if last is not None and last[0] == epoch:
+            last_seq = last[1]
+
+            # nothing was missed
+            if last_seq == seq:
+                return
+
+            history = self._history.get(game_id, ())
+            oldest = history[0].seq if history else seq + 1
+
+            # still have every event after the last one they got
+            if oldest <= last_seq + 1 and last_seq < seq:
+                for event in history:
+                    if event.seq > last_seq:
+                        subscription.put(event)
+                return
+
+        # the client's board is too far behind, it has to get a new one.
+        # not kept in the history, it only makes sense for this client
+        subscription.put(GameEvent(epoch=epoch, seq=seq, event="snapshot"))
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._channels.get(subscription.game_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+
+        subscribers.discard(subscription)
+
+        # nobody's listening to that game anymore
+        if not subscribers:
+            del self._channels[subscription.game_id]
+
+        self._stream_count -= 1
+        owner = subscription.owner
+        if owner is not None:
+            self._streams_by_owner[owner] -= 1
+            if self._streams_by_owner[owner] <= 0:
+                del self._streams_by_owner[owner]
+
+    def publish(self, game_id: str, event: str, data: dict | None = None) -> GameEvent:
+        """
+        Sends an event to everyone subscribed to the game.
+        Never waits. Returns the event that was sent.
+        """
+        seq = self._sequences.get(game_id, 0) + 1
+        self._sequences[game_id] = seq
+        message = GameEvent(epoch=self.epoch(game_id), seq=seq, event=event, data=data or dict())
+
+        history = self._history.get(game_id)
+        if history is None:
+            history = self._history[game_id] = deque(maxlen=self.history_size)
+        history.append(message)
+        self._last_event_at[game_id] = monotonic()
+
+        for subscription in self._channels.get(game_id, ()):
+            subscription.put(message)
+
+        return message
+
+    def close(self, game_id: str) -> None:
+        """
+        Ends every subscription to the game (after they
+        get what's already been sent) and forgets
+        about it, e.g. when it ends. If there are any
+        events after that, they're in a new epoch.
+        """
+        # copied, closing them changes the set
+        for subscription in list(self._channels.get(game_id, ())):
+            subscription.close()
+
+        self._epochs.pop(game_id, None)
+        self._sequences.pop(game_id, None)
+        self._history.pop(game_id, None)
+        self._last_event_at.pop(game_id, None)
+
+    ##########
+    # REAPER #
+    ##########
+
+    def reap(self) -> tuple[int, int]:
+        """
+        Closes stale streams and forgets idle games.
+        Returns how many of each there were.
+        """
+        now = monotonic()
+        stale = [
+            subscription
+            for subscribers in self._channels.values()
+            for subscription in subscribers
+            if now - subscription.last_seen > self.stale_after
+        ]
+        for subscription in stale:
+            subscription.close()
+
+        idle = [
+            game_id
+            for game_id, last_event_at in self._last_event_at.items()
+            if game_id not in self._channels and now - last_event_at > self.idle_game_after
+        ]
+        for game_id in idle:
+            self.close(game_id)
+
+        return len(stale), len(idle)
+
+    async def _reap_loop(self) -> None:
+        # often enough that a stale stream is
+        # never left much longer than stale_after
+        interval = self.heartbeat_interval or self.stale_after
+
+        while True:
+            await asyncio.sleep(interval)
+
+            stale, idle = self.reap()
+            if stale or idle:
+                logger.info("Closed %s stale streams and forgot %s idle games.", stale, idle)
+
+    async def start(self) -> None:
+        """
+        Starts reaping in the background.
+        """
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def shutdown(self) -> None:
+        """
+        Stops reaping and closes every stream.
+        """
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+        for game_id in list(self._channels):
+            for subscription in list(self._channels.get(game_id, ())):
+                subscription.close()
@@ -1,10 +1,13 @@
-import json
 import random
+from array import array
+from functools import lru_cache
 from uuid import UUID, uuid4
+from time import time
 from datetime import datetime
-from json import JSONDecodeError
 from dataclasses import dataclass, field
 
+from melds import MeldTable, get_meld_table
+
 
 ######################
 # ABSOLUTE VARIABLES #
@@ -17,47 +20,6 @@ MAX_POSSIBLE_PLAYERS = 6
 MIN_POSSIBLE_PLAYERS = 4
 
 
-def convert_bools_for_json(data: str) -> str:
-    """
-    This gave me a lot of headache so I made
-    a method, that way I can have even more
-    headache when this also fails and I can't
-    figure out why.
-    """
-    data = data.replace("False", "false")
-    data = data.replace("True", "true")
-    return data
-
-
-##############
-# DECORATORS #
-##############
-
-
-def to_json(cls):
-    """
-    Modifies the __str__() function of the
-    given class to print out a dictionary (as a string)
-    of the given object, which should make
-    saving things to a file a lot easier.
-    """
-
-    def new_str(self):
-        """
-        Returns the object's attirbutes as a
-        dictionary converted to a string for
-        use with JSON files. Quotes are converted
-        to double quotes for this reason.
-        """
-        # swapping the quotes because JSON
-        # prefers them to be double quotes
-        first_part = str(self.__dict__).replace("'", '"')
-        return convert_bools_for_json(first_part)
-    
-    cls.__repr__ = new_str
-    return cls
-
-
 #########
 # ENUMS #
 #########
@@ -76,6 +38,63 @@ COLORS = {
     "RED": "#FF2E17",
 }
 
+# the position of each color in COLORS,
+# used by tile codes and the meld lookup engine (see melds.py)
+COLOR_INDEX = {color: i for i, color in enumerate(COLORS.values())}
+COLOR_BY_INDEX = list(COLORS.values())
+
+
+#################
+# TILE ENCODING #
+#################
+
+# a tile can be stored as a single small int:
+# the number, then two bits for the color,
+# then one bit for whether or not it's a joker.
+#
+# e.g. a red 7 is (7 << 3) | (3 << 1) | 0 = 62
+#
+# this is what Hands, Groups and the pool store
+# internally instead of a whole object per tile.
+COLOR_BITS = 2
+JOKER_BIT = 1
+
+# array typecode for lists of tile codes
+# (unsigned short, so 2 bytes a tile)
+TILE_CODE_TYPE = "H"
+
+
+def encode_tile(number: int, color: str, joker: bool) -> int:
+    """
+    Returns the code for a tile.
+    """
+    try:
+        color_index = COLOR_INDEX[color]
+    except KeyError:
+        raise ValueError(f"{color} is not a valid tile color.")
+
+    return (number << (COLOR_BITS + 1)) | (color_index << 1) | (JOKER_BIT if joker else 0)
+
+
+def decode_tile(code: int) -> tuple[int, int, bool]:
+    """
+    Returns the color index, number and joker
+    flag of a tile code, in that order.
+    """
+    return (code >> 1) & ((1 << COLOR_BITS) - 1), code >> (COLOR_BITS + 1), bool(code & JOKER_BIT)
+
+
+@lru_cache(maxsize=16)
+def get_code_table(min_tile: int, max_tile: int) -> tuple[list[int], list[int]]:
+    """
+    What every tile code (up to the highest tile) stands for in
+    the tile range's meld table, see MeldTable.code_table().
+    Don't modify what comes out of here!
+    """
+    meld_table = get_meld_table(min_tile, max_tile, len(COLORS))
+    return meld_table.code_table(decode_tile, (max_tile + 1) << (COLOR_BITS + 1))
+
+
 GROUP_TYPES = [
     "RUN",
     "SET",
@@ -87,11 +106,14 @@ GROUP_TYPES = [
 ###########
 
 
-@dataclass
-@to_json
+@dataclass(frozen=True)
 class Tile:
     """
     Stores the number and color of a tile.
+
+    Tiles are immutable and interned: there is only
+    ever one Tile object per tile code (see from_code()),
+    so a whole game only has a few dozen of them.
     """
     # default values - should be changed if needed.
     number: int = 0
@@ -100,20 +122,118 @@ class Tile:
     # this could just be the number 0,
     # but a separate flag increases readability a ton.
 
-    def construct_from_db(self, data: dict) -> None:
+    @property
+    def code(self) -> int:
+        """
+        The compact int version of this tile.
+        """
+        return encode_tile(self.number, self.color, self.joker)
+
+    @classmethod
+    def from_code(cls, code: int) -> "Tile":
+        """
+        Returns the one Tile object for the given code.
+        """
+        tile = _TILES.get(code)
+
+        if tile is None:
+            color_index, number, joker = decode_tile(code)
+            tile = cls(number=number, color=COLOR_BY_INDEX[color_index], joker=joker)
+            _TILES[code] = tile
+
+        return tile
+
+    @classmethod
+    def from_db(cls, data: dict) -> "Tile":
         """
-        Constructs tiles from a dictionary.
+        Returns a tile from a dictionary.
 
         For use on a hand returned from the database and
         already constructed from the database output.
         """
-        self.number = data["number"]
-        self.color = data["color"]
-        self.joker = data["joker"]
+        return cls.from_code(encode_tile(data["number"], data["color"], data["joker"]))
+
+
+# code -> Tile, see Tile.from_code()
+_TILES: dict[int, Tile] = dict()
+
+
+class TileArray(array):
+    """
+    A list of tiles that only stores each tile's code.
+
+    It acts like a list of Tiles (append, remove, pop,
+    "in" and so on all take and give Tile objects) so the
+    rest of the code doesn't have to care, but it takes two
+    bytes a tile instead of a whole object.
+    """
+
+    def __new__(cls, tiles=()):
+        return super().__new__(cls, TILE_CODE_TYPE, [t.code for t in tiles])
+
+    @property
+    def codes(self) -> list[int]:
+        """
+        The tile codes themselves.
+        """
+        return self.tolist()
+
+    @classmethod
+    def from_codes(cls, codes) -> "TileArray":
+        """
+        Builds a TileArray straight from tile codes.
+        """
+        tiles = cls()
+        tiles.fromlist(list(codes))
+        return tiles
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return TileArray.from_codes(super().__getitem__(i))
+        return Tile.from_code(super().__getitem__(i))
+
+    def __setitem__(self, i, tile) -> None:
+        if isinstance(i, slice):
+            super().__setitem__(i, array(TILE_CODE_TYPE, [t.code for t in tile]))
+        else:
+            super().__setitem__(i, tile.code)
+
+    def __iter__(self):
+        return map(Tile.from_code, super().__iter__())
+
+    def __contains__(self, tile) -> bool:
+        return isinstance(tile, Tile) and super().__contains__(tile.code)
+
+    def __repr__(self) -> str:
+        # the same as a list's repr
+        return repr(list(self))
+
+    def append(self, tile: Tile) -> None:
+        super().append(tile.code)
+
+    def extend(self, tiles) -> None:
+        super().extend(array(TILE_CODE_TYPE, [t.code for t in tiles]))
+
+    def insert(self, i: int, tile: Tile) -> None:
+        super().insert(i, tile.code)
+
+    def remove(self, tile: Tile) -> None:
+        super().remove(tile.code)
+
+    def pop(self, i: int = -1) -> Tile:
+        return Tile.from_code(super().pop(i))
+
+    def index(self, tile: Tile, *args) -> int:
+        return super().index(tile.code, *args)
+
+    def count(self, tile: Tile) -> int:
+        return super().count(tile.code)
+
+    def clear(self) -> None:
+        del self[:]
 
 
 @dataclass
-@to_json
 class Hand:
     """
     The hands and of each player.
@@ -129,7 +249,14 @@ class Hand:
     client manipulation.
     """
     score: int = 0
-    tiles: list[Tile] = field(default_factory=list)
+    tiles: list[Tile] = field(default_factory=TileArray)
+
+    def __post_init__(self):
+        """
+        Stores the tiles as codes, whatever they were given as.
+        """
+        if not isinstance(self.tiles, TileArray):
+            self.tiles = TileArray(self.tiles)
 
     def update_score(self):
         """
@@ -148,224 +275,56 @@ class Hand:
             if tile.joker:
                 self.score -= 30
 
-    def construct_from_db(self, data: str) -> None:
-        """
-        Modifies the current Hand object to reflect the database output.
-        """
-        # I'm so tired of this
-        try:
-            data = json.loads(data)
-        except JSONDecodeError:
-            data = convert_bools_for_json(data)
-            data = json.loads(data)
-
-        self.score = data["score"]
-
-        for t in data["tiles"]:
-            tile = Tile()
-            tile.construct_from_db(t)
-            self.tiles.append(tile)
-
 
 @dataclass
-@to_json
 class Group:
     """
     A group of tiles in a run or set on the table.
     This is separate from a hand as it should
     remain on the table and be manipulatable.
     """
-    tiles: list[Tile] = field(default_factory=list)
+    tiles: list[Tile] = field(default_factory=TileArray)
 
-    def _is_set(self) -> bool:
+    def __post_init__(self):
         """
-        Determines whether or not this
-        group is a set.
+        Stores the tiles as codes, whatever they were given as.
         """
-        # they are either the same number or a joker
-        # calling an explicit equals so it's a bit clearer
-        same_number = all([(x.number == self.tiles[0].number) or (x.joker == True) for x in self.tiles])
-        used_colors = list()
-        used_colors.append(self.tiles[0].color)
-
-        if not same_number:
-            return False
-
-        for i, tile in enumerate(self.tiles):
-            # if it's the first iteration
-            if i == 0:
-                continue
+        if not isinstance(self.tiles, TileArray):
+            self.tiles = TileArray(self.tiles)
 
-            # make sure each color is different
-            # if any of them are the same,
-            # it's not a valid set
-            # unless that tile is a joker
-            if tile.color in used_colors and not tile.joker:
-                return False
-
-        return same_number
-
-    def _is_run(self, min_tile: int, max_tile: int) -> bool:
+    def content_key(self) -> tuple[int, ...]:
         """
-        Determines whether or not this
-        group is a run.
+        The same for any groups with the same tiles,
+        whatever order they're in. Used to remember
+        which groups were already validated.
         """
-        # making sure all colors are the same
-        # by comparing each tile's color
-        # to the first tile's color
-        # making allowances for jokers
-        all_same_color: bool = all([(x.color == self.tiles[0].color) or (x.joker == True) for x in self.tiles])
-
-        if not all_same_color:
-            # go ahead and skip any other check
-            return False
-
-        # get all joker tiles
-        joker_tiles: list[Tile] = [x for x in self.tiles if x.joker]
-        jokers_to_spare: bool = len(joker_tiles) > 0
-
-        # make sure all joker tiles
-        # are never falsely flagged as sequential
-        for tile in joker_tiles:
-            tile.number = min_tile - 10
-
-        # get all non-joker tiles
-        numbered_tiles: list[Tile] = sorted([x for x in self.tiles if not x.joker])
-
-        # prepare a list to set the output to
-        output_list: list[Tile] = list()
-
-        # -------------------------
-        # check if it's sequential
-        for i, tile in enumerate(numbered_tiles):
-            # skip the first check
-            if i == 0:
-                output_list.append(tile)
-                continue
-
-            next_tile: Tile = numbered_tiles[i - 1]
-
-            # if it is one, it's sequential
-            sequential: bool = abs(tile.number - next_tile.number) == 1
-
-            if sequential:
-                output_list.append(tile)
-                continue
-
-            # if NOT sequential
-            # -----------------
-            output_list.append(tile)
-
-            # for use in calculating if there are
-            # enough jokers to fill the gap
-            current_num: int = tile.number
-
-            # this should only be ran if
-            # the sequential check failed
-            # e.g. if there's a "gap" to be filled
-            while True:
-                jokers_to_spare: bool = len(joker_tiles) > 0
-                local_seq: bool = abs(current_num - next_tile.number) == 1
-
-                # if we've run out of jokers but it still isn't sequential
-                if not local_seq and not jokers_to_spare:
-                    return False
-                # if we made it sequential, break
-                # regardless of how many jokers are left
-                elif local_seq:
-                    break
-
-                # if there are jokers
-                # and it's not sequential
-                # "use" the jokers to fill the spaces
-                output_list.append(joker_tiles.pop())
-                current_num += 1
-            # once the gap is filled,
-            # start over from the next numbered tile
-            # to see if it's sequential to the following tiles
-        # --------------------
-
-        # just in case some funny business happened
-        jokers_to_spare: bool = len(joker_tiles) > 0
-
-        # --------------------
-        # dole out remaining jokers
-
-        # this WILL reorder user input
-        # but only if they put jokers at the
-        # beginning or end, so I'm okay with it,
-        # at least for now
-        if jokers_to_spare:
-            # if there is enough "space" at the beginning
-            # or end for all remaining jokers
-            can_fit_at_end = len(jokers_to_spare) <= (max_tile - max(numbered_tiles))
-            can_fit_at_beginning = len(jokers_to_spare) <= (min(numbered_tiles) - min_tile)
-
-            # if there is a joker,
-            # it IS sequential (see last check)
-            # and there is no place for the extra jokers to go
-            if not can_fit_at_end and not can_fit_at_beginning:
-                return False
-            elif can_fit_at_beginning and not can_fit_at_end:
-                # put all unused jokers at the beginning
-                self.tiles = joker_tiles + output_list
-            elif can_fit_at_end and not can_fit_at_beginning:
-                # put all unused jokers at the end
-                self.tiles = output_list + joker_tiles
-            # if it has neither the largest nor the smallest tiles
-            elif can_fit_at_beginning and can_fit_at_end:
-                # just default to putting the extras at the end
-                self.tiles = output_list + joker_tiles
-            # something went wrong
-            else:
-                return False
-        else:
-            # update hand to be sorted
-            # so that users can't submit
-            # hands out of order
-            self.tiles = output_list
-        # ------------------
-
-        # if it survived the "sequential" gauntlet
-        return all_same_color
+        return tuple(sorted(self.tiles.codes))
 
     def is_valid(self, max_tile_number: int, min_tile_number: int) -> bool:
         """
         Returns a bool of whether
         or not this group is valid.
+
+        Also reorders the tiles so that
+        users can't submit groups out of order.
         """
         # if there are two few tiles,
         # it's already invalid
         if len(self.tiles) < 3:
             return False
 
-        is_set = self._is_set()
-        is_run = self._is_run(min_tile_number, max_tile_number)
-
-        # return true if it's either a set OR a run
-        return is_set or is_run
+        meld_table = get_meld_table(min_tile_number, max_tile_number, len(COLORS))
+        codes = self.tiles.codes
+        ordered = meld_table.order_codes(codes, get_code_table(min_tile_number, max_tile_number))
 
-    def construct_from_db(self, data: str) -> None:
-        """
-        Constructs the current object to match the database
-        when given a JSON string from said database.
-        Same as all other construct_from_db methods.
-        """
-        # just in case there are any tiles already
-        self.tiles.clear()
+        if ordered is None:
+            return False
 
-        # if it's a string,
-        # convert it to JSON
-        if isinstance(data, str):
-            # let this err for debugging
-            data = json.loads(data)
-        elif not isinstance(data, dict):
-            raise ValueError("Data to construct must be of type string.")
+        # most groups come in already in order
+        if ordered != codes:
+            self.tiles = TileArray.from_codes(ordered)
 
-        for tile_str in data["tiles"]:
-            tile = Tile()
-            tile.construct_from_db(tile_str)
-            self.tiles.append(tile)
+        return True
 
     # # this value is purely for cosmetic purposes,
     # # but potentially we can use it for another scoring
@@ -373,19 +332,115 @@ class Group:
     # owner_id: UUID
 
 
+@dataclass(frozen=True)
+class TableSnapshot:
+    """
+    What a Table looked like at some point, see Table.snapshot().
+    """
+    groups: tuple[Group, ...]
+    cursor: int
+    # only for pools that aren't shuffled,
+    # shuffled ones only need the cursor
+    pool: TileArray | None = None
+
+
 @dataclass
-@to_json
 class Table:
     """
     Used to store information about the tiles on the table,
     including runs, sets, and the pool remaining.
+
+    The pool works one of two ways:
+
+    - a list of the remaining tiles that random tiles
+      are popped out of (the original way), or
+    - when a seed is set, the whole deck shuffled once
+      with that seed, and a cursor pointing at the next
+      tile to draw. Only the seed and cursor are saved,
+      since the deck can be rebuilt from the seed.
+
+    The groups are a tuple, and the Groups in it are never
+    changed once they're on the table. A move makes a new tuple
+    instead, with the same Group objects for whatever it didn't
+    touch. That way a snapshot of the table is just a reference
+    to the tuple (plus the cursor), and so is going back to one.
     """
-    pool: list[Tile] = field(default_factory=list)
-    groups: list[Group] = field(default_factory=list)
+    pool: list[Tile] = field(default_factory=TileArray)
+    groups: tuple[Group, ...] = field(default_factory=tuple)
+
+    # only used for shuffled pools, see above
+    seed: int | None = None
+    cursor: int = 0
+
+    def __post_init__(self):
+        """
+        Stores the pool as codes and the
+        groups as a tuple, whatever they were given as.
+        """
+        if not isinstance(self.pool, TileArray):
+            self.pool = TileArray(self.pool)
+        if not isinstance(self.groups, tuple):
+            self.groups = tuple(self.groups)
+
+    def snapshot(self) -> TableSnapshot:
+        """
+        The table as it is right now, to go
+        back to later with restore().
+        """
+        # a pool that isn't shuffled is popped from, so
+        # it has to be copied. Shuffled ones never change
+        pool = None if self.seed is not None else TileArray(self.pool)
+        return TableSnapshot(groups=self.groups, cursor=self.cursor, pool=pool)
+
+    def restore(self, snapshot: TableSnapshot) -> None:
+        """
+        Puts the table back the way it was
+        when the snapshot was taken.
+        """
+        self.groups = snapshot.groups
+        self.cursor = snapshot.cursor
+        if snapshot.pool is not None:
+            self.pool = TileArray(snapshot.pool)
+
+    def replace_groups(self, groups) -> tuple[Group, ...]:
+        """
+        Makes the groups given the table's groups, reusing
+        the table's own Group objects for the ones that
+        didn't change. Returns the old groups.
+        """
+        old_groups = self.groups
+        unchanged = {group.tiles.tobytes(): group for group in old_groups}
+
+        self.groups = tuple(unchanged.get(group.tiles.tobytes(), group) for group in groups)
+        return old_groups
+
+    def pool_size(self) -> int:
+        """
+        Returns how many tiles are left to draw.
+        """
+        if self.seed is not None:
+            return len(self.pool) - self.cursor
+        return len(self.pool)
+
+    def draw(self) -> Tile:
+        """
+        Takes a tile out of the pool.
+
+        For shuffled pools this is just moving the
+        cursor along, otherwise it's a random pop.
+        """
+        if self.seed is not None:
+            if self.cursor >= len(self.pool):
+                raise IndexError("There are no tiles left in the pool.")
+
+            tile = self.pool[self.cursor]
+            self.cursor += 1
+            return tile
+
+        return self.pool.pop(random.randint(0, len(self.pool) - 1))
 
 
 @dataclass
-@to_json
 class IngameRow:
     """
     Stores the hands of each player
@@ -429,20 +484,6 @@ class IngameRow:
     #     # if it's any of the accepted types
     #     return
 
-    def construct_from_db(self, data: str) -> None:
-        """
-        Updates this object to match the database.
-        """
-        # copying from the ER diagram:
-        # userID, gameID, turnNumber, and hand
-        self.user_id = data[0]
-        self.game_id = data[1]
-        self.turn_number = data[2]
-        hand = Hand()
-        data_parsed = convert_bools_for_json(data[3])
-        hand.construct_from_db(data_parsed)
-        self.hand = hand
-
     def set_hand(self, d: dict) -> Hand:
         """
         Converts a (properly formatted) dictionary
@@ -464,7 +505,6 @@ class IngameRow:
 
 
 @dataclass
-@to_json
 class GameSettings:
     """
     Create custom settings for a game.
@@ -491,6 +531,11 @@ class GameSettings:
     max_tile: int = 13
     min_tile: int = 1
 
+    # shuffle the pool once when the game starts
+    # and draw from it in order (see Table)
+    # instead of popping random tiles every draw
+    shuffled_pool: bool = True
+
     def initialize(self):
         # clamp the max player count between 4 and 6
         if self.max_players < MIN_POSSIBLE_PLAYERS or self.max_players > MAX_POSSIBLE_PLAYERS:
@@ -522,9 +567,15 @@ class GameSettings:
         if self.expected_tile_count > MAX_TILE_COUNT:
             raise ValueError(f"The tile count {self.expected_tile_count} is higher than the maximum count of {MAX_TILE_COUNT}.")
 
+    def meld_table(self) -> MeldTable:
+        """
+        Returns the table of valid melds for these settings.
+        It's only built once per tile range.
+        """
+        return get_meld_table(self.min_tile, self.max_tile, len(COLORS))
+
 
 @dataclass
-@to_json
 class Game:
     """
     A class that stores statistics and values
@@ -549,11 +600,19 @@ class Game:
     # and 10 days for ONGOING games.
     # I don't know if I'll delete ENDED games yet
     # as I may just archive them.
-    last_active: str = str(datetime.date(datetime.now()))
+    # unix timestamp, in seconds
+    last_active: int = field(default_factory=lambda: int(time()))
+
+    # when the current turn runs out (unix timestamp, in
+    # seconds), None if it isn't being timed. Kept apart from
+    # last_active so turns running out don't count as activity
+    turn_deadline: int | None = None
+    # how many turns in a row ran out, back to 0 once someone plays
+    timeouts: int = 0
 
     # the user can pass a GameSettings obj
     # if they'd like custom game data
-    game_data: GameSettings = GameSettings()
+    game_data: GameSettings = field(default_factory=GameSettings)
 
     def __post_init__(self):
         """
@@ -567,60 +626,6 @@ class Game:
 
         self.game_data.initialize()
 
-    def construct_from_db(self, contents: tuple[str] | list[str], columns: tuple[str] | list[str]) -> None:
-        """
-        Updates the object to match a game from the database.
-        Requires a Game object to be created already so it can
-        more easily be manipulated.
-
-        Arguments: the raw responses from the server
-        """
-        game_dict = dict()
-
-        for i, cl in enumerate(columns):
-            # only converts the item in the list
-            # to JSON if it's valid JSON
-            # (i.e., not a string such as a UUID or game state)
-            try:
-                game_dict[cl] = json.loads(contents[i])
-            except JSONDecodeError:
-                game_dict[cl] = contents[i]
-
-        # game-specific attributes
-        self.id = game_dict["gameID"]
-        self.game_state = game_dict["gameState"]
-        self.last_active = game_dict["lastActive"]
-        self.current_player_turn = game_dict["currentPlayerTurn"]
-
-        # setting up the table
-        table = game_dict["tableContents"]
-
-        # convert from Pythonic true/falses
-        # to JSON compatible t/f (so, lowercase)
-        # I can't believe this is necessary
-        # later: nevermind, it's user error - converting
-        # an object to JSON manually can have its
-        # consequences...
-        if not isinstance(table, dict):
-            try:
-                table = json.loads(table)
-            except JSONDecodeError:
-                table = convert_bools_for_json(table)
-                table = json.loads(table)
-
-        self.table.pool = table["pool"]
-        self.table.groups = table["groups"]
-
-        # setting up game_data
-        self.game_data.turn_time_limit = game_dict["gameData"]["turn_time_limit"]
-        self.game_data.starting_hand_count = game_dict["gameData"]["starting_hand_count"]
-        self.game_data.min_entry_meld_score = game_dict["gameData"]["min_entry_meld_score"]
-        self.game_data.max_players = game_dict["gameData"]["max_players"]
-        self.game_data.joker_count = game_dict["gameData"]["joker_count"]
-        self.game_data.max_tile = game_dict["gameData"]["max_tile"]
-        self.game_data.min_tile = game_dict["gameData"]["min_tile"]
-        self.game_data.expected_tile_count = game_dict["gameData"]["expected_tile_count"]
-
     def db_list(self) -> list[str]:
         """
         Prepares a list that reflects the
@@ -634,7 +639,9 @@ class Game:
             self.last_active,
             self.current_player_turn,
             self.table,
-            self.game_data
+            self.game_data,
+            self.turn_deadline,
+            self.timeouts,
         ]
 
     def start(self) -> bool:
@@ -656,27 +663,45 @@ class Game:
         if self.game_data.expected_tile_count > MAX_TILE_COUNT:
             raise ValueError(f"The tile count {self.game_data.expected_tile_count} is higher than the maximum count of {MAX_TILE_COUNT}.")
 
+        if self.game_data.shuffled_pool:
+            # each game gets its own seed so the
+            # deck can be rebuilt from it later
+            self.table.seed = random.getrandbits(63)
+            self.table.cursor = 0
+            self.table.pool = self.build_pool(random.Random(self.table.seed))
+        else:
+            self.table.pool = self.build_pool(random)
+
+        return True
+
+    def build_pool(self, rng: random.Random) -> TileArray:
+        """
+        Returns every tile in the game.
+
+        If the pool is shuffled, they're shuffled by the given
+        random number generator, so the same seed always gives
+        the same deck. The rng also picks the jokers' colors.
+        """
         # so to make the tile count appropriate to the amount of players
         # (which the tile count should be tiered to reflect), but not have
         # only a portion of the colors, you need either 2 sets of all colors
         # (8 total sets) or 3 sets of all colors (12 total sets of 1 - 13, if color is ignored)
         set_count = 8 if self.game_data.max_players < 5 else 12
+        codes = list()
 
         for _ in range(int(set_count / 4)):
             for color in COLORS.values():
-                for num in range(self.game_data.min_tile, self.game_data.max_tile):
-                    self.table.pool.append(Tile(number=num, color=color))
+                for num in range(self.game_data.min_tile, self.game_data.max_tile + 1):
+                    codes.append(encode_tile(num, color, False))
 
         # add the right amount of jokers with random colors
         for _ in range(self.game_data.joker_count):
-            self.table.pool.append(
-                Tile(
-                    color=random.choice(list(COLORS.values())),
-                    joker=True
-                )
-            )
+            codes.append(encode_tile(0, rng.choice(COLOR_BY_INDEX), True))
 
-        return True
+        if self.game_data.shuffled_pool:
+            rng.shuffle(codes)
+
+        return TileArray.from_codes(codes)
 
     def dole_out_hands(self, players: list[IngameRow]) -> list[Hand]:
         """
@@ -691,10 +716,8 @@ class Game:
 
         for i in range(len(players)):
             for _ in range(self.game_data.starting_hand_count):
-                # the pool size but to be used as an index
-                pool_size_index = len(self.table.pool) - 1
-                # take a random tile from the pool
-                tile: Tile = self.table.pool.pop(random.randint(0, pool_size_index))
+                # take a tile from the pool
+                tile: Tile = self.draw_tile()
                 # put it in the player's hand
                 players[i].hand.tiles.append(tile)
             # appending this to be returned
@@ -708,6 +731,4 @@ class Game:
         """
         Draws a tile from the pool.
         """
-        current_tile_count = len(self.table.pool)
-
-        return self.table.pool.pop(random.randint(0, current_tile_count - 1))
+        return self.table.draw()
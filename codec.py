@@ -0,0 +1,433 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Turns game objects into what's stored in the
+database (and sent to clients) and back again.
+
+Each class has a schema (the fields that get saved,
+in order) and exactly one encode and one decode
+function built from it. This replaces the old
+to_json decorator, which printed __dict__ and swapped
+quote characters, and the "try json.loads, fix the
+True/Falses, try again" dance in every construct_from_db.
+
+The hand and tableContents columns can also be stored
+in a compact binary format (see BINARY_COLUMNS). Rows
+are read back the same way no matter which format they
+were written in, including rows written by the old
+to_json code (see read_legacy()).
+"""
+
+import sys
+import json
+import random
+import zlib
+import struct
+from array import array
+from json import JSONDecodeError
+
+from classes import Tile, TileArray, Hand, Group, Table, GameSettings, Game, IngameRow, TILE_CODE_TYPE
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# store hands and tables as binary blobs instead of JSON.
+# off by default so the database stays readable by hand
+BINARY_COLUMNS = False
+
+# binary columns start with these so they can be
+# told apart from JSON (which always starts with "{")
+HAND_MAGIC = b"RKH1"
+TABLE_MAGIC = b"RKT1"
+
+# score, tile count
+HAND_HEADER = struct.Struct("<iH")
+# has seed, seed, cursor, pool size, group count
+TABLE_HEADER = struct.Struct("<BqHHH")
+GROUP_HEADER = struct.Struct("<H")
+
+# compact JSON, no spaces
+SEPARATORS = (",", ":")
+
+# archives are written once and read rarely, so
+# they might as well be as small as they can be
+ARCHIVE_COMPRESSION = 9
+
+# the fields saved for each class, in order
+SETTINGS_SCHEMA = (
+    "turn_time_limit",
+    "starting_hand_count",
+    "min_entry_meld_score",
+    "max_players",
+    "joker_count",
+    "max_tile",
+    "min_tile",
+    "expected_tile_count",
+    "shuffled_pool",
+)
+
+# column -> Game attribute
+GAME_SCHEMA = {
+    "gameID": "id",
+    "gameState": "game_state",
+    "lastActive": "last_active",
+    "currentPlayerTurn": "current_player_turn",
+    "tableContents": "table",
+    "gameData": "game_data",
+    "turnDeadline": "turn_deadline",
+    "timeouts": "timeouts",
+}
+
+
+##################
+# DICT ENCODINGS #
+##################
+# what the objects look like as JSON
+
+
+def tile_to_dict(tile: Tile) -> dict:
+    return {"number": tile.number, "color": tile.color, "joker": tile.joker}
+
+
+def tile_from_dict(data: dict) -> Tile:
+    return Tile.from_db(data)
+
+
+# tile code -> tile dict, since there are only a few dozen
+# different tiles. Don't modify what comes out of here!
+_TILE_DICTS: dict[int, dict] = dict()
+
+
+def tiles_to_list(tiles: TileArray) -> list[dict]:
+    dicts = _TILE_DICTS
+    out = list()
+
+    for code in tiles.codes:
+        data = dicts.get(code)
+        if data is None:
+            data = dicts[code] = tile_to_dict(Tile.from_code(code))
+        out.append(data)
+
+    return out
+
+
+def hand_to_dict(hand: Hand) -> dict:
+    return {"score": hand.score, "tiles": tiles_to_list(hand.tiles)}
+
+
+def hand_from_dict(data: dict) -> Hand:
+    return Hand(score=data["score"], tiles=TileArray(tile_from_dict(t) for t in data["tiles"]))
+
+
+def group_to_dict(group: Group) -> dict:
+    return {"tiles": tiles_to_list(group.tiles)}
+
+
+def group_from_dict(data: dict) -> Group:
+    return Group(tiles=TileArray(tile_from_dict(t) for t in data["tiles"]))
+
+
+def table_to_dict(table: Table) -> dict:
+    """
+    Shuffled pools don't need the tiles
+    themselves saved, just the seed and cursor.
+    """
+    data = {"groups": [group_to_dict(g) for g in table.groups]}
+
+    if table.seed is not None:
+        data["seed"] = table.seed
+        data["cursor"] = table.cursor
+    else:
+        data["pool"] = tiles_to_list(table.pool)
+
+    return data
+
+
+def table_from_dict(data: dict) -> Table:
+    """
+    NOTE: a shuffled pool still has to be rebuilt
+    from the seed afterwards, see Game.build_pool().
+    """
+    return Table(
+        pool=TileArray(tile_from_dict(t) for t in data.get("pool", [])),
+        groups=[group_from_dict(g) for g in data["groups"]],
+        seed=data.get("seed"),
+        cursor=data.get("cursor", 0),
+    )
+
+
+def settings_to_dict(settings: GameSettings) -> dict:
+    return {key: getattr(settings, key) for key in SETTINGS_SCHEMA if hasattr(settings, key)}
+
+
+def settings_from_dict(data: dict) -> GameSettings:
+    settings = GameSettings()
+
+    for key in SETTINGS_SCHEMA:
+        if key in data:
+            setattr(settings, key, data[key])
+
+    # games from before shuffled pools existed
+    # don't have this and use the old pool
+    if "shuffled_pool" not in data:
+        settings.shuffled_pool = False
+
+    return settings
+
+
+####################
+# BINARY ENCODINGS #
+####################
+
+
+def _codes_to_bytes(tiles: TileArray) -> bytes:
+    """
+    Tile codes as little-endian bytes.
+    """
+    if sys.byteorder == "big":
+        tiles = array(TILE_CODE_TYPE, tiles.codes)
+        tiles.byteswap()
+    return tiles.tobytes()
+
+
+def _codes_from_bytes(data: bytes, offset: int, count: int) -> tuple[TileArray, int]:
+    """
+    Reads count tile codes from data, starting
+    at offset. Returns them and the new offset.
+    """
+    end = offset + count * 2
+    tiles = TileArray()
+    tiles.frombytes(data[offset:end])
+
+    if sys.byteorder == "big":
+        tiles.byteswap()
+
+    return tiles, end
+
+
+def hand_to_bytes(hand: Hand) -> bytes:
+    return HAND_MAGIC + HAND_HEADER.pack(hand.score, len(hand.tiles)) + _codes_to_bytes(hand.tiles)
+
+
+def hand_from_bytes(data: bytes) -> Hand:
+    score, count = HAND_HEADER.unpack_from(data, len(HAND_MAGIC))
+    tiles, _ = _codes_from_bytes(data, len(HAND_MAGIC) + HAND_HEADER.size, count)
+    return Hand(score=score, tiles=tiles)
+
+
+def table_to_bytes(table: Table) -> bytes:
+    has_seed = table.seed is not None
+    # shuffled pools are rebuilt from the seed
+    pool = TileArray() if has_seed else table.pool
+
+    parts = [
+        TABLE_MAGIC,
+        TABLE_HEADER.pack(has_seed, table.seed or 0, table.cursor, len(pool), len(table.groups)),
+        _codes_to_bytes(pool),
+    ]
+
+    for group in table.groups:
+        parts.append(GROUP_HEADER.pack(len(group.tiles)))
+        parts.append(_codes_to_bytes(group.tiles))
+
+    return b"".join(parts)
+
+
+def table_from_bytes(data: bytes) -> Table:
+    offset = len(TABLE_MAGIC)
+    has_seed, seed, cursor, pool_size, group_count = TABLE_HEADER.unpack_from(data, offset)
+    pool, offset = _codes_from_bytes(data, offset + TABLE_HEADER.size, pool_size)
+
+    groups = list()
+    for _ in range(group_count):
+        (count,) = GROUP_HEADER.unpack_from(data, offset)
+        tiles, offset = _codes_from_bytes(data, offset + GROUP_HEADER.size, count)
+        groups.append(Group(tiles=tiles))
+
+    return Table(pool=pool, groups=groups, seed=seed if has_seed else None, cursor=cursor)
+
+
+#############
+# MIGRATION #
+#############
+
+
+def read_legacy(data: str) -> dict:
+    """
+    Parses a column written by the old to_json decorator.
+
+    Those were Python dict strings with the quotes swapped,
+    and didn't always have their True/False/None fixed up.
+    """
+    try:
+        return json.loads(data)
+    except JSONDecodeError:
+        data = data.replace("True", "true").replace("False", "false").replace("None", "null")
+        return json.loads(data)
+
+
+def _read_json(data) -> dict:
+    """
+    Returns the column as a dict, whatever it was stored as.
+    """
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode()
+    return read_legacy(data)
+
+
+##############
+# COLUMN API #
+##############
+# use these to read and write database columns
+
+
+def dumps(data) -> str:
+    return json.dumps(data, separators=SEPARATORS)
+
+
+def encode_hand(hand: Hand) -> str | bytes:
+    if BINARY_COLUMNS:
+        return hand_to_bytes(hand)
+    return dumps(hand_to_dict(hand))
+
+
+def decode_hand(data) -> Hand:
+    if isinstance(data, bytes) and data.startswith(HAND_MAGIC):
+        return hand_from_bytes(data)
+    return hand_from_dict(_read_json(data))
+
+
+def encode_table(table: Table) -> str | bytes:
+    if BINARY_COLUMNS:
+        return table_to_bytes(table)
+    return dumps(table_to_dict(table))
+
+
+def decode_table(data) -> Table:
+    if isinstance(data, bytes) and data.startswith(TABLE_MAGIC):
+        return table_from_bytes(data)
+    return table_from_dict(_read_json(data))
+
+
+def encode_settings(settings: GameSettings) -> str:
+    return dumps(settings_to_dict(settings))
+
+
+def decode_settings(data) -> GameSettings:
+    return settings_from_dict(_read_json(data))
+
+
+# type -> column encoder, see encode_column()
+ENCODERS = {
+    Hand: encode_hand,
+    Table: encode_table,
+    GameSettings: encode_settings,
+}
+
+
+def encode_column(value):
+    """
+    Returns the value as it should be stored in the database.
+    Anything that isn't a game object is stored as is.
+    """
+    encoder = ENCODERS.get(type(value))
+    return encoder(value) if encoder is not None else value
+
+
+def game_to_row(game: Game) -> list:
+    """
+    The games table row for a game, in column order.
+    """
+    return [encode_column(getattr(game, attribute)) for attribute in GAME_SCHEMA.values()]
+
+
+def game_from_row(row: tuple | list, columns: tuple[str] | list[str]) -> Game:
+    """
+    Builds a Game from a games table row.
+    """
+    data = dict(zip(columns, row))
+
+    game = Game(
+        id=data["gameID"],
+        game_state=data["gameState"],
+        last_active=int(data["lastActive"]),
+        current_player_turn=int(data["currentPlayerTurn"]),
+        game_data=decode_settings(data["gameData"]),
+        turn_deadline=data["turnDeadline"],
+        timeouts=int(data["timeouts"]),
+    )
+    game.table = decode_table(data["tableContents"])
+
+    # the shuffled deck isn't saved, only its seed
+    if game.table.seed is not None:
+        game.table.pool = game.build_pool(random.Random(game.table.seed))
+
+    return game
+
+
+# type -> dict encoder, see game_to_dict()
+DICT_ENCODERS = {
+    Table: table_to_dict,
+    GameSettings: settings_to_dict,
+}
+
+
+def game_to_dict(game: Game) -> dict:
+    """
+    A game as a dictionary of column -> JSON-ready value,
+    i.e. what its games row looks like as JSON.
+    """
+    data = dict()
+
+    for column, attribute in GAME_SCHEMA.items():
+        value = getattr(game, attribute)
+        encoder = DICT_ENCODERS.get(type(value))
+        data[column] = encoder(value) if encoder is not None else value
+
+    return data
+
+
+def ingame_row_from_db(row: tuple | list) -> IngameRow:
+    """
+    Builds an IngameRow from an ingame table row:
+    userID, gameID, turnNumber, and hand.
+    """
+    return IngameRow(user_id=row[0], game_id=row[1], turn_number=row[2], hand=decode_hand(row[3]))
+
+
+############
+# ARCHIVES #
+############
+# see server.archive_ended_games
+
+
+def encode_archive(game: Game, rows: list[IngameRow], usernames: dict[str, str]) -> bytes:
+    """
+    Everything about a finished game in one compressed
+    record: its games row (as JSON) and every player's
+    final hand (and score), turn number and username.
+    """
+    record = {
+        "game": game_to_dict(game),
+        "players": [
+            {
+                "userID": row.user_id,
+                "username": usernames.get(row.user_id),
+                "turnNumber": row.turn_number,
+                "hand": hand_to_dict(row.hand),
+            }
+            for row in sorted(rows, key=lambda r: r.turn_number)
+        ],
+    }
+
+    return zlib.compress(dumps(record).encode(), ARCHIVE_COMPRESSION)
+
+
+def decode_archive(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Async access to the database, so that the server's
+event loop never waits on SQLite (and, in turn, the disk).
+
+Every query is run on a thread instead of the event loop:
+
+- writes all go through ONE writer thread, so they're
+  applied one at a time, in the order they were sent
+- reads are spread over a small pool of reader threads,
+  each with their own connection
+
+The database is put in WAL mode so that readers don't
+wait on the writer (or vice versa).
+
+The methods are the same operations as in functions.py,
+just awaitable and without passing a connection around.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import queries
+import functions
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+DEFAULT_READERS = 4
+
+
+###########
+# CLASSES #
+###########
+
+
+class AsyncDatabase:
+    """
+    Runs database commands on worker threads.
+    """
+
+    def __init__(self, path: str, readers: int = DEFAULT_READERS):
+        self.path = path
+        # each worker thread keeps its own connection in here
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = list()
+        self._connections_lock = threading.Lock()
+
+        self._writer = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="db-writer",
+            initializer=self._connect,
+        )
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers,
+            thread_name_prefix="db-reader",
+            initializer=self._connect,
+        )
+
+    def _connect(self) -> None:
+        """
+        Opens the connection for the current worker thread.
+        """
+        # check_same_thread is off only so close() can close them
+        con = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=queries.STATEMENT_CACHE_SIZE,
+        )
+        con.execute("PRAGMA journal_mode=WAL;")
+        # WAL only needs a sync on checkpoints to be safe
+        con.execute("PRAGMA synchronous=NORMAL;")
+        self._local.con = con
+
+        with self._connections_lock:
+            self._connections.append(con)
+
+    def _run(self, func, *args):
+        """
+        Calls func with this thread's connection.
+        Only ever called on a worker thread.
+        """
+        return func(self._local.con, *args)
+
+    def _run_and_commit(self, func, *args):
+        """
+        Same as _run() but commits afterwards
+        (or rolls back if func fails).
+        """
+        con = self._local.con
+
+        try:
+            result = func(con, *args)
+        except Exception:
+            con.rollback()
+            raise
+
+        con.commit()
+        return result
+
+    async def read(self, func, *args):
+        """
+        Runs func(connection, *args) on a reader thread.
+        Meant for the read functions in queries.py.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run, func, *args)
+
+    async def write(self, func, *args):
+        """
+        Runs func(connection, *args) on the writer thread
+        and commits. Meant for the write functions in queries.py.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_and_commit, func, *args)
+
+    ##############
+    # OPERATIONS #
+    ##############
+
+    async def run_db_command(self, command: str, params: tuple | list = ()) -> list:
+        """
+        Returns the response from the database.
+
+        SELECTs are sent to the readers, anything
+        else to the writer. There is NO VALIDATION
+        so use this carefully.
+        """
+        if command.lstrip()[:6].upper() == "SELECT":
+            return await self.read(functions.run_db_command, command, params)
+        return await self.write(functions.run_db_command, command, params)
+
+    async def update_db(self, command: str, params: tuple | list = ()) -> None:
+        await self.write(functions.update_db, command, params)
+
+    async def insert_into_table(self, table_name: str, data: list | str) -> None:
+        await self.write(functions.insert_into_table, table_name, data)
+
+    async def get_game_data(self, gameID: str) -> tuple:
+        return await self.read(queries.game_by_id, gameID)
+
+    async def get_games_with_player(self, userID: str) -> list:
+        return await self.read(queries.games_with_player, userID)
+
+    async def get_players_in_game(self, gameID: str) -> list:
+        return await self.read(queries.players_in_game, gameID)
+
+    def close(self) -> None:
+        """
+        Waits for any queued writes and closes every connection.
+        """
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+        with self._connections_lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
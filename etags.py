@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Conditional GETs (ETag / If-None-Match) for routes whose
+responses only change when the game they're about does.
+
+A route opts in by putting an async function in its opt:
+
+@get("/{game_id:str}", opt={"etag": game_etag})
+
+which gets the route's path parameters and the session ID
+(from the cookie) and returns the ETag its response would
+have right now, or None if it can't tell. It should be cheap,
+e.g. made from a game's fingerprint (see fingerprint.py).
+
+ConditionalGetMiddleware works that out BEFORE the session
+middleware runs (so put it before that one), and if the client
+already has that version it answers 304 right away; nothing
+else runs, not even loading the session. Otherwise the request
+goes through as usual and the ETag is added to the response.
+
+The ETag is worked out before the route runs on purpose: if
+the game changes in the meantime, the client ends up with
+a newer response under an older ETag, which only means
+it gets the whole thing again next time. The other way
+around it could be told an old response is up to date.
+"""
+
+import os
+from hashlib import blake2b
+from typing import Awaitable, Callable
+
+from litestar.enums import ScopeType
+from litestar.connection import ASGIConnection
+from litestar.middleware import ASGIMiddleware
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# ETags are keyed with this so that they don't give away
+# anything about the game (e.g. its fingerprint).
+# new every time the server starts, which just means
+# clients get everything again once after a restart
+SECRET = os.urandom(16)
+
+# the opt key routes put their ETag function under
+OPT_KEY = "etag"
+
+# path parameters, session ID -> ETag (or None)
+EtagFunction = Callable[[dict, str | None], Awaitable[str | None]]
+
+
+#########
+# ETAGS #
+#########
+
+
+def make_etag(*parts) -> str:
+    """
+    A (strong) ETag for whatever the parts are.
+    """
+    digest = blake2b("\0".join(map(str, parts)).encode(), key=SECRET, digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header includes the ETag.
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # weak comparison, which is what If-None-Match uses
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+###########
+# CLASSES #
+###########
+
+
+class ConditionalGetMiddleware(ASGIMiddleware):
+    """
+    Answers GETs with 304 Not Modified when the client
+    already has the current version, see above.
+    """
+    scopes = (ScopeType.HTTP,)
+
+    def __init__(self, session_cookie: str = "session"):
+        self.session_cookie = session_cookie
+
+        # how many requests got a 304
+        self.not_modified = 0
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send, next_app: ASGIApp) -> None:
+        etag_function: EtagFunction | None = scope["route_handler"].opt.get(OPT_KEY)
+
+        if etag_function is None or scope["method"] != "GET":
+            await next_app(scope, receive, send)
+            return
+
+        connection = ASGIConnection(scope)
+        etag = await etag_function(scope["path_params"], connection.cookies.get(self.session_cookie))
+
+        if etag is None:
+            await next_app(scope, receive, send)
+            return
+
+        if etag_matches(connection.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode())],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message["headers"] = [*message.get("headers", ()), (b"etag", etag.encode())]
+            await send(message)
+
+        await next_app(scope, receive, send_with_etag)
@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+A 64-bit fingerprint of a game's state: the groups on
+the table, the pool cursor, every player's hand, the
+turn and the game state. If any of those change, so does
+the fingerprint (barring a 1 in 2^64 collision).
+
+It's Zobrist hashing, more or less. Every "tile X in player
+Y's hand", "turn N" etc. gets a fixed random 64-bit key and the
+fingerprint is all of the keys added up (mod 2^64), so moving a
+tile is subtracting one key and adding another instead of going
+over the whole game again. Added up instead of XORed, since a
+hand can have both copies of a tile and those would cancel out.
+
+The groups on the table are the exception: rearranging the same
+tiles into different groups has to change the fingerprint, so each
+group gets a hash of its own (its tile keys added up, then mixed)
+and those are added up instead. Only the groups a move changed are
+hashed again, see replace_groups().
+
+NOTE: the keys are the same every time (see SEED) so a saved
+fingerprint still means the same thing after a restart. That
+also means anyone could work out what a fingerprint changed by,
+e.g. which tile a player drew, so it's never sent to clients as is.
+"""
+
+from collections import Counter
+
+from classes import STATES, Game, Group
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+MASK = (1 << 64) - 1
+
+# changing this changes every fingerprint
+SEED = 0x5EED_2024_C0DE_0001
+
+# what each key is for, so e.g. "turn 3" and
+# "cursor 3" never get the same key
+HAND = 1
+TABLE = 2
+CURSOR = 3
+TURN = 4
+STATE = 5
+GROUP = 6
+
+
+###########
+# HASHING #
+###########
+
+
+def mix(x: int) -> int:
+    """
+    splitmix64's finalizer: scrambles the bits of x
+    so that similar inputs give very different outputs.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+# (kind, a, b) -> key, they're used over and over
+_KEYS: dict[tuple[int, int, int], int] = dict()
+
+
+def key(kind: int, a: int, b: int = 0) -> int:
+    """
+    The random (but always the same) key for something.
+    """
+    k = _KEYS.get((kind, a, b))
+
+    if k is None:
+        k = _KEYS[(kind, a, b)] = mix(mix(mix(SEED ^ kind) ^ (a & MASK)) ^ (b & MASK))
+
+    return k
+
+
+def group_hash(group: Group) -> int:
+    """
+    The same for groups with the same tiles,
+    whatever order they're in.
+    """
+    total = 0
+    for code in group.tiles.codes:
+        total += key(TABLE, code)
+    return mix(key(GROUP, total & MASK))
+
+
+def to_signed(value: int) -> int:
+    """
+    SQLite integers are signed 64-bit.
+    """
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed(value: int) -> int:
+    return value & MASK
+
+
+###########
+# CLASSES #
+###########
+
+
+class Fingerprint:
+    """
+    A game's fingerprint, kept up to date by telling
+    it what changed instead of working it out again.
+    """
+
+    def __init__(self, value: int = 0):
+        self.value = value
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Fingerprint):
+            return self.value == other.value
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Fingerprint({self.value:#018x})"
+
+    @classmethod
+    def of(cls, game: Game, rows) -> "Fingerprint":
+        """
+        Works the fingerprint out from scratch.
+        rows: the IngameRows of the game's players.
+        """
+        fingerprint = cls()
+
+        for row in rows:
+            fingerprint.add_tiles(row.turn_number, row.hand.tiles.codes)
+
+        fingerprint.replace_groups((), game.table.groups)
+        fingerprint.set_cursor(None, game.table.cursor)
+        fingerprint.set_turn(None, game.current_player_turn)
+        fingerprint.set_state(None, game.game_state)
+
+        return fingerprint
+
+    def _add(self, k: int) -> None:
+        self.value = (self.value + k) & MASK
+
+    def _subtract(self, k: int) -> None:
+        self.value = (self.value - k) & MASK
+
+    def add_tiles(self, player: int, codes) -> None:
+        """
+        Tiles went into the hand of the player with that turn number.
+        """
+        for code in codes:
+            self._add(key(HAND, player, code))
+
+    def remove_tiles(self, player: int, codes) -> None:
+        for code in codes:
+            self._subtract(key(HAND, player, code))
+
+    def replace_groups(self, old_groups, new_groups) -> None:
+        """
+        The table's groups went from old_groups to new_groups.
+
+        Groups that are in both (the same objects, see
+        Table.replace_groups()) cancel out without being hashed.
+        """
+        unchanged = Counter(map(id, old_groups))
+
+        for group in new_groups:
+            if unchanged[id(group)] > 0:
+                unchanged[id(group)] -= 1
+            else:
+                self._add(group_hash(group))
+
+        for group in old_groups:
+            if unchanged[id(group)] > 0:
+                unchanged[id(group)] -= 1
+                self._subtract(group_hash(group))
+
+    def set_cursor(self, old: int | None, new: int) -> None:
+        if old is not None:
+            self._subtract(key(CURSOR, old))
+        self._add(key(CURSOR, new))
+
+    def set_turn(self, old: int | None, new: int) -> None:
+        if old is not None:
+            self._subtract(key(TURN, old))
+        self._add(key(TURN, new))
+
+    def set_state(self, old: str | None, new: str) -> None:
+        if old is not None:
+            self._subtract(key(STATE, STATES.index(old)))
+        self._add(key(STATE, STATES.index(new)))
@@ -30,10 +30,11 @@ crazy password (your stats..?), so that'll be my advice.
 
 import random
 import logging
-from uuid import UUID
 from sqlite3 import Connection
 
+import queries
 from classes import *
+from codec import encode_column
 
 
 LOGGING_FORMAT = "%(asctime)s \t %(levelname)s \t [%(filename)s] -> %(message)s"
@@ -56,9 +57,169 @@ from an entry in the Games table, one way or another.
 Ingame Table:
 
 NOTE: This table stores WHO is in a game and WHAT games they're in.
+
+###########
+
+Profiles Table:
+
+NOTE: the username of each session, so the usernames of a whole
+game can be looked up at once instead of reading every player's
+session (see profiles.py). The session still has it too.
+
+###########
+
+Archive Tables:
+
+NOTE: games that ended a while ago, moved out of games and ingame
+(see server.archive_ended_games). Each one is a single compressed
+record (see codec.encode_archive) and they're never changed after.
+archive_players says which games each player was in.
 """
 
 
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# bump this (and add to MIGRATIONS) whenever the tables change.
+# stored in the database itself with PRAGMA user_version
+SCHEMA_VERSION = 5
+
+# the columns of each table, used both to create
+# them and to rebuild them while migrating
+TABLE_COLUMNS = {
+    # gameData is things like time
+    # for a turn, each player's score,
+    # the placement of each player, etc.
+    # table should store stuff like
+    # the sets and runs on the table
+    # and the pool of remaning tiles
+    # lastActive is a unix timestamp (seconds)
+    # fingerprint is a hash of the game's state, see fingerprint.py
+    # turnDeadline is when the current turn runs out (a unix
+    # timestamp), NULL if nothing's timing it. timeouts is
+    # how many turns in a row have run out
+    "games": """gameID TEXT,
+        gameState TEXT,
+        lastActive INTEGER,
+        currentPlayerTurn INT,
+        tableContents TEXT,
+        gameData TEXT,
+        fingerprint INTEGER NOT NULL DEFAULT 0,
+        turnDeadline INTEGER,
+        timeouts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(gameID DESC)""",
+
+    # a player can only be in a game once,
+    # so the pair of them is the key
+    "ingame": """userID TEXT NOT NULL,
+        gameID TEXT NOT NULL,
+        turnNumber INT,
+        hand TEXT,
+        PRIMARY KEY(gameID, userID),
+        FOREIGN KEY(gameID) REFERENCES games(gameID)""",
+
+    # userID is the session ID, same as in ingame
+    "profiles": """userID TEXT NOT NULL,
+        username TEXT NOT NULL,
+        PRIMARY KEY(userID)""",
+
+    # endedAt is a unix timestamp (the game's last lastActive)
+    "archive": """gameID TEXT NOT NULL,
+        endedAt INTEGER NOT NULL,
+        record BLOB NOT NULL,
+        PRIMARY KEY(gameID)""",
+
+    "archive_players": """userID TEXT NOT NULL,
+        gameID TEXT NOT NULL,
+        PRIMARY KEY(userID, gameID)""",
+}
+
+# every query looks games up by gameID (the games key),
+# ingame rows by gameID (the front of the ingame key)
+# or by userID, old games by lastActive and
+# ended games by their state, then lastActive
+INDEXES = {
+    "ingame_userID": "CREATE INDEX IF NOT EXISTS ingame_userID ON ingame(userID);",
+    "games_lastActive": "CREATE INDEX IF NOT EXISTS games_lastActive ON games(lastActive);",
+    "games_gameState_lastActive": "CREATE INDEX IF NOT EXISTS games_gameState_lastActive ON games(gameState, lastActive);",
+}
+
+# schema version -> how to get an existing database there
+# from the version before it. Each one is run as a single
+# transaction, so a failed migration changes nothing
+MIGRATIONS = {
+    # ingame gets its (gameID, userID) key and
+    # lastActive goes from a date string to a timestamp.
+    # SQLite can't add keys or change column types in place,
+    # so both tables are rebuilt and swapped in.
+    # (the games columns as they were at the time,
+    # later migrations add to them)
+    1: f"""
+    CREATE TABLE games_migrating(gameID TEXT,
+        gameState TEXT,
+        lastActive INTEGER,
+        currentPlayerTurn INT,
+        tableContents TEXT,
+        gameData TEXT,
+        PRIMARY KEY(gameID DESC));
+    INSERT INTO games_migrating
+        SELECT gameID, gameState,
+        COALESCE(CAST(strftime('%s', lastActive) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+        currentPlayerTurn, tableContents, gameData
+        FROM games;
+    DROP TABLE games;
+    ALTER TABLE games_migrating RENAME TO games;
+
+    CREATE TABLE ingame_migrating({TABLE_COLUMNS["ingame"]});
+    -- there were no keys before, so drop any duplicate players
+    INSERT OR IGNORE INTO ingame_migrating
+        SELECT userID, gameID, turnNumber, hand
+        FROM ingame
+        WHERE userID IS NOT NULL AND gameID IS NOT NULL;
+    DROP TABLE ingame;
+    ALTER TABLE ingame_migrating RENAME TO ingame;
+    """,
+
+    # games get a fingerprint. 0 until they're next saved,
+    # the cache works it out itself when it loads a game
+    2: """
+    ALTER TABLE games ADD COLUMN fingerprint INTEGER NOT NULL DEFAULT 0;
+    """,
+
+    # usernames get a table of their own. It starts out empty,
+    # sessions from before are looked up (and added) as needed
+    3: """
+    CREATE TABLE IF NOT EXISTS profiles(userID TEXT NOT NULL,
+        username TEXT NOT NULL,
+        PRIMARY KEY(userID));
+    """,
+
+    # ended games get archived. Both tables start out
+    # empty, the games are moved over in the background
+    4: """
+    CREATE TABLE IF NOT EXISTS archive(gameID TEXT NOT NULL,
+        endedAt INTEGER NOT NULL,
+        record BLOB NOT NULL,
+        PRIMARY KEY(gameID));
+    CREATE TABLE IF NOT EXISTS archive_players(userID TEXT NOT NULL,
+        gameID TEXT NOT NULL,
+        PRIMARY KEY(userID, gameID));
+    """,
+
+    # the turn timer gets columns of its own instead of going by
+    # lastActive, which is only for players doing something now.
+    # Games being played get the deadline they had before
+    # (untimed games don't get one at all)
+    5: """
+    ALTER TABLE games ADD COLUMN turnDeadline INTEGER;
+    ALTER TABLE games ADD COLUMN timeouts INTEGER NOT NULL DEFAULT 0;
+    UPDATE games SET turnDeadline = lastActive + json_extract(gameData, '$.turn_time_limit')
+        WHERE gameState == 'ONGOING' AND json_extract(gameData, '$.turn_time_limit') > 0;
+    """,
+}
+
+
 ####################
 # INTERNAL METHODS #
 ####################
@@ -76,21 +237,8 @@ def initialize_db_and_tables(con: Connection) -> None:
     logger.info("Server started. Checking tables.")
 
     req_tables_and_queries = {
-        "games": """CREATE TABLE IF NOT EXISTS games(
-        gameID TEXT,
-        gameState TEXT,
-        lastActive TEXT,
-        currentPlayerTurn INT,
-        tableContents TEXT,
-        gameData TEXT,
-        PRIMARY KEY(gameID DESC));""",
+        tb: f"CREATE TABLE IF NOT EXISTS {tb}({columns});" for tb, columns in TABLE_COLUMNS.items()
         # TODO: Should I store current player uuid or position?
-        # gameData is things like time
-        # for a turn, each player's score,
-        # the placement of each player, etc.
-        # table should store stuff like
-        # the sets and runs on the table
-        # and the pool of remaning tiles
 
         # # rest in peace, users table
         # "users": """CREATE TABLE IF NOT EXISTS users(
@@ -102,13 +250,6 @@ def initialize_db_and_tables(con: Connection) -> None:
         # losses INTEGER,
         # lastLogon TEXT,
         # PRIMARY KEY(userID DESC));""",
-
-        "ingame": """CREATE TABLE IF NOT EXISTS ingame(
-        userID TEXT,
-        gameID TEXT,
-        turnNumber INT,
-        hand TEXT,
-        FOREIGN KEY(gameID) REFERENCES games(gameID));""",
     }
 
     cur = con.cursor()
@@ -127,6 +268,15 @@ def initialize_db_and_tables(con: Connection) -> None:
     # up again. it's a sanity check.
     logger.info("Tables in database: %s", tables)
 
+    # databases from before there was a schema version are 0
+    version = cur.execute("PRAGMA user_version;").fetchone()[0]
+
+    # a brand new database doesn't need migrating
+    if not any(tb in tables for tb in req_tables_and_queries):
+        version = SCHEMA_VERSION
+
+    migrate_db(con, version)
+
     for tb in req_tables_and_queries:
         # if the table doesn't exist,
         # create it.
@@ -140,26 +290,36 @@ def initialize_db_and_tables(con: Connection) -> None:
             logger.warning(msg=f"Table {tb} does not exist. Creating.")
             cur.execute(req_tables_and_queries[tb])
 
+    for index in INDEXES.values():
+        cur.execute(index)
+
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
     con.commit()
     cur.close()
 
 
-def valid_uuid(id: str) -> bool:
-    try:
-        UUID(id, version=4)
-    except ValueError:
-        if id.isalnum():
-            # if it's alphanumeric but NOT
-            # a UUID, it's probably a session ID
-            return True
-        # if none of those...
-        # seems like someone is trying
-        # a SQL injection or fiddling with
-        # their client in some way...
-        logger.warning(f"Strange UUID request from client, potential SQL injection attack. ID: {id}")
-        return False
-
-    return True
+def migrate_db(con: Connection, version: int) -> None:
+    """
+    Brings a database at the given schema version up
+    to SCHEMA_VERSION, one migration at a time.
+    """
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        logger.warning(msg=f"Migrating database from schema version {target - 1} to {target}.")
+
+        # executescript() doesn't run inside of a transaction on
+        # its own, hence the BEGIN/COMMIT. The version is bumped
+        # in the same transaction, so this never runs twice
+        try:
+            con.executescript(f"""
+            BEGIN;
+            {MIGRATIONS[target]}
+            PRAGMA user_version = {target};
+            COMMIT;
+            """)
+        except Exception:
+            con.rollback()
+            raise
 
 
 def insert_into_table(con: Connection, table_name, data: list | str) -> None:
@@ -173,24 +333,29 @@ def insert_into_table(con: Connection, table_name, data: list | str) -> None:
 
     A list is probably easier. See the attached ER diagram for
     how to format each specific table.
+
+    Game objects (Hands, Tables, etc.) in a list
+    are encoded with the codec before being stored.
     """
     cur = con.cursor()
 
     if isinstance(data, str):
         query = f"INSERT INTO {table_name} VALUES({data});"
+        params = ()
     else:
-        # put quotes around everything for the query
-        data = [f"'{x}'" for x in data]
-        query = f"INSERT INTO {table_name} VALUES({', '.join(data)});"
+        # bound parameters instead of quoting everything,
+        # so quotes (and binary columns) in the data are fine
+        params = [encode_column(x) for x in data]
+        query = f"INSERT INTO {table_name} VALUES({', '.join('?' * len(params))});"
 
-    res = cur.execute(query)
+    res = cur.execute(query, params)
     cur.close()
     res.close()
     con.commit()
     logger.debug(f"Added entry to {table_name}.")
 
 
-def run_db_command(con: Connection, command: str) -> list:
+def run_db_command(con: Connection, command: str, params: tuple | list = ()) -> list:
     """
     Returns the response from the database.
 
@@ -198,7 +363,7 @@ def run_db_command(con: Connection, command: str) -> list:
     """
     cur = con.cursor()
 
-    res = cur.execute(command)
+    res = cur.execute(command, params)
     data = res.fetchall()
     res.close()
     cur.close()
@@ -207,22 +372,20 @@ def run_db_command(con: Connection, command: str) -> list:
     return data
 
 
-def update_db(con: Connection, command: str) -> None:
+def update_db(con: Connection, command: str, params: tuple | list = ()) -> None:
     """
     Same as the run_db_command function but is
     intended for changes that don't return anything,
     namely UPDATE commands.
     """
     cur = con.cursor()
-    res = cur.execute(command)
+    res = cur.execute(command, params)
     res.close()
     cur.close()
     con.commit()
 
 
-# TODO: potentially modify this to have a bit more of
-# a universal method like the one below
-def get_game_data(con: Connection, gameID: UUID) -> tuple:
+def get_game_data(con: Connection, gameID: str) -> tuple:
     """
     Gets data for the specified game ID.
     Basically pre-generates a nice command for you
@@ -230,72 +393,25 @@ def get_game_data(con: Connection, gameID: UUID) -> tuple:
 
     Returns: game_data, columns
     """
-    # if the ID is suspicious...
-    if not valid_uuid(gameID):
-        # return a simple "nothing"
-        return None, None
-
-    cur = con.cursor()
-
-    query = f"SELECT * FROM games WHERE gameID == '{gameID}';"
-
-    game_data_res = cur.execute(query)
-    game_data = game_data_res.fetchone()
-    game_data_res.close()
-    cur.close()
-
-    columns = [item[0] for item in game_data_res.description]
-
-    return game_data, columns
-
-
-def _get_game_or_player(con: Connection, ID: str, get_games: bool) -> list | None:
-    """
-    A kind of "internal" method that calls similar code
-    regarding the join table "ingame". This consolidates the two
-    functions into one instead of writing the code twice.
-
-    "games" is a bool meaning "get games a player is in"
-    """
-    if not valid_uuid(ID):
-        return None
-
-    cur = con.cursor()
-
-    if get_games:
-        # get the games a player is in
-        query = f"SELECT gameID FROM ingame WHERE userID == '{ID}';"
-    else:
-        # get the players in a game
-        query = f"SELECT userID FROM ingame WHERE gameID == '{ID}';"
-
-    games_data_res = cur.execute(query)
-    games_data = games_data_res.fetchall()
-    games_data_res.close()
-    cur.close()
-
-    # "flattening" the table
-    users = [item[0] for item in games_data]
-
-    return users
+    return queries.game_by_id(con, gameID)
 
 
-def get_games_with_player(con: Connection, userID: str) -> list | None:
+def get_games_with_player(con: Connection, userID: str) -> list:
     """
     Gets the game IDs from the join table "ingame".
 
     In other words: gets all the games a player is in.
     """
-    return _get_game_or_player(con, userID, True)
+    return queries.games_with_player(con, userID)
 
 
-def get_players_in_game(con: Connection, gameID: str) -> list | None:
+def get_players_in_game(con: Connection, gameID: str) -> list:
     """
     Gets the player IDs from the join table "ingame".
 
     In other words: gets all the players in a game.
     """
-    return _get_game_or_player(con, gameID, False)
+    return queries.players_in_game(con, gameID)
 
 
 def shuffle(players: list[IngameRow] | tuple[IngameRow], human_readable: bool = False) -> list | tuple:
@@ -311,7 +427,7 @@ def shuffle(players: list[IngameRow] | tuple[IngameRow], human_readable: bool =
     # start from 0 if human_readable is False,
     # otherwise start from 1 (1st, 2nd, 3rd, etc
     # instead of 0 meaning 1st, 1 meaning 2nd, and so on).
-    order = tuple(range(max_players)) if not human_readable else tuple(range(1, max_players + 1))
+    order = list(range(max_players)) if not human_readable else list(range(1, max_players + 1))
     # although it would be good to keep things consistent
     # and to always start at 0, I plan to just compare values
     # for which is lesser or greater or to sort the list-UUID pairs
@@ -329,7 +445,7 @@ def shuffle(players: list[IngameRow] | tuple[IngameRow], human_readable: bool =
     # but I realize it doesn't really matter
     # so long as it's consistent, which
     # it should be if I leave it as-is
-    players.sort()
+    players.sort(key=lambda pl: pl.user_id)
 
     for i, pl in enumerate(players):
         pl.turn_number = order[i]
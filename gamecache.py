@@ -0,0 +1,411 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Keeps the games being played in memory, so that
+a request doesn't have to read the games row, parse
+the table and rebuild the Game every single time.
+
+The Games in here are THE game state while they're
+cached: requests change them directly and mark them
+as dirty, and the changes are saved to the database
+afterwards (write-behind), every flush interval and
+when the server shuts down. The ingame rows (hands)
+of each game are kept with it, so a turn's changes
+are always saved together in one transaction.
+
+Only ONGOING games are kept around; anything else
+is read from the database as needed.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import codec
+import queries
+from classes import Game, Group, IngameRow, Tile, TableSnapshot
+from fingerprint import Fingerprint
+from database import AsyncDatabase
+
+
+logger = logging.getLogger(__name__)
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# how many games are kept in memory.
+# the least recently used ones are dropped after that
+DEFAULT_CAPACITY = 1024
+
+# in seconds. This is also the most amount
+# of time that would be lost if the server crashed
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+# how many validated groups each game remembers
+# before starting over from what's on its table
+MAX_VALID_GROUPS = 512
+
+
+###########
+# CLASSES #
+###########
+
+
+@dataclass
+class LiveGame:
+    """
+    A game and the ingame rows of its players, by userID.
+    """
+    game: Game
+    rows: dict[str, IngameRow] = field(default_factory=dict)
+
+    # whether the games row has to be saved
+    game_dirty: bool = False
+    # the players whose hands have to be saved
+    dirty_hands: set[str] = field(default_factory=set)
+
+    # the table as it was when the current turn started
+    # (cheap, see Table.snapshot()). Whatever's saved is
+    # always from the start of a turn, so that's the default
+    turn_start: TableSnapshot | None = None
+
+    # see fingerprint.py. Kept up to date by the methods
+    # below, so change the game through those
+    fingerprint: Fingerprint | None = None
+
+    # Group.content_key() -> that group, already validated
+    # (and put in order). Only groups that aren't in here are
+    # validated when a move is made, see validate_groups()
+    valid_groups: dict[tuple[int, ...], Group] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.turn_start is None:
+            self.turn_start = self.game.table.snapshot()
+        if self.fingerprint is None:
+            self.fingerprint = Fingerprint.of(self.game, self.rows.values())
+
+        self._remember_table()
+
+    def _remember_table(self) -> None:
+        # everything on the table was validated when it was put there
+        self.valid_groups = {group.content_key(): group for group in self.game.table.groups}
+
+    def validate_groups(self, groups) -> tuple[Group, ...] | None:
+        """
+        Returns the groups given as validated groups (the
+        same ones as earlier moves where possible), or None
+        if any of them isn't valid.
+
+        Only groups that haven't been seen in this game yet are
+        actually validated, so a move costs about the same no
+        matter how many groups are on the table.
+        """
+        settings = self.game.game_data
+        validated = list()
+
+        for group in groups:
+            key = group.content_key()
+            known = self.valid_groups.get(key)
+
+            if known is None:
+                # this puts the tiles in order, which
+                # is why the group itself is remembered
+                if not group.is_valid(settings.max_tile, settings.min_tile):
+                    return None
+
+                if len(self.valid_groups) >= MAX_VALID_GROUPS:
+                    self._remember_table()
+
+                known = self.valid_groups[key] = group
+
+            validated.append(known)
+
+        return tuple(validated)
+
+    @property
+    def dirty(self) -> bool:
+        return self.game_dirty or len(self.dirty_hands) > 0
+
+    def mark_dirty(self, *user_ids: str) -> None:
+        """
+        Marks the game (and the hands of the
+        players given) as changed.
+        """
+        self.game_dirty = True
+        self.dirty_hands.update(user_ids)
+
+    #########
+    # MOVES #
+    #########
+
+    def draw_tile(self, row: IngameRow) -> Tile:
+        """
+        Moves a tile from the pool to the player's hand.
+        """
+        table = self.game.table
+        cursor = table.cursor
+
+        tile = self.game.draw_tile()
+        row.hand.tiles.append(tile)
+
+        self.fingerprint.add_tiles(row.turn_number, (tile.code,))
+        self.fingerprint.set_cursor(cursor, table.cursor)
+        return tile
+
+    def place_groups(self, row: IngameRow, groups: tuple[Group, ...], hand, used_codes) -> tuple[Group, ...]:
+        """
+        The player put down the tiles (codes) used: the
+        groups given become the table's and hand theirs.
+        Returns the old groups.
+        """
+        old_groups = self.game.table.replace_groups(groups)
+        row.hand = hand
+
+        self.fingerprint.remove_tiles(row.turn_number, used_codes)
+        self.fingerprint.replace_groups(old_groups, self.game.table.groups)
+        return old_groups
+
+    def restore_turn_start(self) -> None:
+        """
+        Puts the table back how it was when the turn started.
+        """
+        table = self.game.table
+        groups, cursor = table.groups, table.cursor
+
+        table.restore(self.turn_start)
+
+        self.fingerprint.replace_groups(groups, table.groups)
+        self.fingerprint.set_cursor(cursor, table.cursor)
+
+    def next_turn(self, game_state: str | None = None) -> None:
+        """
+        Moves the turn counter on (and changes
+        the game state, if one is given).
+        """
+        game = self.game
+
+        self.fingerprint.set_turn(game.current_player_turn, game.current_player_turn + 1)
+        game.current_player_turn += 1
+
+        if game_state is not None and game_state != game.game_state:
+            self.fingerprint.set_state(game.game_state, game_state)
+            game.game_state = game_state
+
+    ##########
+    # SAVING #
+    ##########
+
+    def save(self, changes: queries.UnitOfWork) -> None:
+        """
+        Adds whatever changed to the changes and
+        marks everything as saved.
+        """
+        if self.game_dirty:
+            queries.save_game(changes, self.game, self.fingerprint.value)
+
+        for user_id in self.dirty_hands:
+            row = self.rows.get(user_id)
+            # they could have been removed from the game
+            if row is not None:
+                queries.set_hand(changes, self.game.id, user_id, row.hand)
+
+        self.game_dirty = False
+        self.dirty_hands.clear()
+
+
+class GameCache:
+    """
+    An LRU cache of LiveGames with write-behind saving.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        capacity: int = DEFAULT_CAPACITY,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.db = db
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+
+        # most recently used last
+        self._games: OrderedDict[str, LiveGame] = OrderedDict()
+        self._flusher: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def stats(self) -> dict:
+        return {
+            "games": len(self._games),
+            "dirty": sum(1 for live in self._games.values() if live.dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def game_ids(self) -> list[str]:
+        return list(self._games)
+
+    def peek(self, game_id: str) -> LiveGame | None:
+        """
+        The game if it's cached, without loading it
+        or counting it as being used.
+        """
+        return self._games.get(game_id)
+
+    async def get(self, game_id: str) -> LiveGame | None:
+        """
+        Returns the game with that ID, loading it from the
+        database if it isn't cached (or None if there isn't one).
+
+        NOTE: games that aren't ONGOING aren't kept, so
+        changing those does nothing; save them yourself.
+        """
+        live = self._games.get(game_id)
+
+        if live is not None:
+            self.hits += 1
+            self._games.move_to_end(game_id)
+            return live
+
+        self.misses += 1
+        return await self._load(game_id)
+
+    async def _load(self, game_id: str) -> LiveGame | None:
+        row, columns = await self.db.read(queries.game_by_id, game_id)
+        if row is None:
+            return None
+
+        ingame_rows = await self.db.read(queries.ingame_rows_by_game, game_id)
+
+        # another request may have loaded (and
+        # changed) it while these were running
+        if game_id in self._games:
+            return self._games[game_id]
+
+        live = LiveGame(
+            game=codec.game_from_row(row, columns),
+            rows={r.user_id: r for r in map(codec.ingame_row_from_db, ingame_rows)},
+        )
+
+        if live.game.game_state == "ONGOING":
+            self._add(game_id, live)
+
+        return live
+
+    def add(self, game: Game, rows: list[IngameRow], fingerprint: Fingerprint | None = None) -> LiveGame:
+        """
+        Caches a game that was just saved, e.g. when it starts.
+        """
+        live = LiveGame(game=game, rows={row.user_id: row for row in rows}, fingerprint=fingerprint)
+        self._add(game.id, live)
+        return live
+
+    def _add(self, game_id: str, live: LiveGame) -> None:
+        self._games[game_id] = live
+        self._games.move_to_end(game_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Drops the least recently used games until
+        there are at most capacity of them.
+
+        Games with unsaved changes are skipped (so there can be
+        a few too many until the next flush), otherwise
+        they could be loaded again before they're saved.
+        """
+        if len(self._games) <= self.capacity:
+            return
+
+        for game_id in list(self._games):
+            if len(self._games) <= self.capacity:
+                break
+            if not self._games[game_id].dirty:
+                del self._games[game_id]
+
+    def discard(self, game_id: str) -> None:
+        """
+        Forgets a game WITHOUT saving it.
+        """
+        self._games.pop(game_id, None)
+
+    async def flush(self, *game_ids: str) -> None:
+        """
+        Saves the changes of the games given
+        (or all of them) in one transaction.
+        """
+        if game_ids:
+            games = [self._games[g] for g in game_ids if g in self._games]
+        else:
+            games = list(self._games.values())
+
+        games = [live for live in games if live.dirty]
+        if not games:
+            return
+
+        # remembered in case saving fails
+        unsaved = [(live, set(live.dirty_hands)) for live in games]
+
+        changes = queries.UnitOfWork()
+        for live in games:
+            live.save(changes)
+
+        try:
+            await self.db.write(changes.flush)
+        except Exception:
+            # try again next time
+            for live, user_ids in unsaved:
+                live.mark_dirty(*user_ids)
+            raise
+
+        # anything that isn't being played
+        # anymore doesn't need to stay around
+        for live in games:
+            if live.game.game_state != "ONGOING" and not live.dirty:
+                self.discard(live.game.id)
+
+        self._evict()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to save cached games.")
+
+    async def start(self) -> None:
+        """
+        Starts saving games in the background.
+        """
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """
+        Stops the background saving and
+        saves whatever hasn't been saved yet.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        await self.flush()
+        logger.info("Game cache closed: %s", self.stats())
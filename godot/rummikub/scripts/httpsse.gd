@@ -3,6 +3,11 @@ extends Node
 var http_event_source: HTTPEventSource
 var board: Dictionary
 var game_id: String
+# sequence number of the last event applied to the board
+var last_seq: int = 0
+# which numbering last_seq is in. The server starts the numbers
+# over (in a new epoch) when it restarts or forgets a game
+var epoch: String = ""
 
 # board should be as follows:
 # "game": game,
@@ -11,6 +16,8 @@ var game_id: String
 ## (a dictionary
 ## of username : len(hand))
 # "pool_size": pool_size,
+# "epoch": the numbering seq is in
+# "seq": the last event the board includes
 
 
 func _ready() -> void:
@@ -28,11 +35,11 @@ func _ready() -> void:
 	http_event_source.event.connect(func(ev: ServerSentEvent):
 		# when an event is received from the server,
 		# update the board.
-		print("-- TYPE --")
-		print(ev.type)
-		print("-- DATA --")
-		print(ev.data)
-		print("--      --\n")
+		var json = JSON.new()
+		if json.parse(ev.data) != OK:
+			update_board_dict()
+			return
+		apply_event(ev.type, json.get_data())
 	)
 
 
@@ -40,6 +47,60 @@ func _process(delta: float) -> void:
 	http_event_source.poll()
 
 
+func apply_event(type: String, data: Dictionary) -> void:
+	"""
+	Applies the changes an event carries to the board,
+	or gets the whole board again if an event was missed.
+	"""
+	var seq = int(data.get("seq", 0))
+
+	# sent after reconnecting if too much was missed
+	# (or the server restarted and the numbers started over)
+	if type == "snapshot":
+		update_board_dict()
+		return
+
+	# the numbers started over since the board was
+	# grabbed, so they can't be compared with last_seq
+	if not board.is_empty() and str(data.get("epoch", "")) != epoch:
+		update_board_dict()
+		return
+
+	# already part of the board
+	if seq <= last_seq and not board.is_empty():
+		return
+
+	# missed one (or there isn't a board yet),
+	# so the changes can't be applied on top of it
+	if board.is_empty() or seq != last_seq + 1:
+		update_board_dict()
+		return
+
+	last_seq = seq
+
+	match type:
+		"move":
+			board["pool_size"] = data["pool_size"]
+			board["game"]["current_player_turn"] = data["current_player_turn"]
+			board["game"]["game_state"] = data["game_state"]
+
+			for player in board["player_data"]:
+				if player["turn_number"] == data["player"]:
+					player["len_tiles"] = data["len_tiles"]
+
+			# only the groups that changed are sent, by index
+			if data.has("groups"):
+				var groups: Array = board["game"]["table"]["groups"]
+				groups.resize(data["group_count"])
+				for index in data["groups"]:
+					groups[int(index)] = data["groups"][index]
+		"ping":
+			pass
+		_:
+			# starting and ending change too much
+			update_board_dict()
+
+
 func update_board_dict():
 	"""
 	Updates the whole dictionary.
@@ -72,6 +133,8 @@ func update_board_dict():
 			var json = JSON.new()
 			json.parse(body.get_string_from_utf8())
 			board = json.get_data()
+			last_seq = int(board.get("seq", 0))
+			epoch = str(board.get("epoch", ""))
 		)
 	#
 	# End of board-data anonymous function
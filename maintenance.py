@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Runs cleanup jobs (deleting expired sessions, old games etc.)
+in the background every so often, instead of in a request.
+
+A job is an async function that returns how many things it
+removed. Jobs run one at a time, each every `interval` seconds,
+and anything they do to the database should go in batches (see
+in_batches()) so that no single write holds up everyone else's
+for long and a job's run time only grows with how much there is
+to clean up, not with the size of the database.
+"""
+
+import asyncio
+import logging
+from time import monotonic, perf_counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# how many rows a job handles per write
+DEFAULT_BATCH_SIZE = 500
+
+# in seconds, between batches, so whatever
+# else is waiting to write gets a turn
+BATCH_PAUSE = 0.01
+
+# in seconds, so a restart doesn't
+# also mean a bunch of cleanup
+STARTUP_DELAY = 60
+
+
+###########
+# CLASSES #
+###########
+
+
+@dataclass
+class Job:
+    name: str
+    # in seconds
+    interval: float
+    run: Callable[[], Awaitable[int]]
+    # monotonic() time
+    next_run: float = 0.0
+
+    runs: int = 0
+    failures: int = 0
+    removed: int = 0
+    # of the last run, in seconds
+    last_duration: float | None = None
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "removed": self.removed,
+            "last_duration": self.last_duration,
+            "next_run_in": max(0.0, self.next_run - monotonic()),
+        }
+
+
+class Maintenance:
+    """
+    The jobs and the task that runs them.
+    """
+
+    def __init__(self, startup_delay: float = STARTUP_DELAY):
+        self.startup_delay = startup_delay
+        self._jobs: dict[str, Job] = dict()
+        self._runner: asyncio.Task | None = None
+
+        # so a run asked for by hand never
+        # overlaps with a scheduled one
+        self._lock = asyncio.Lock()
+
+    def add(self, name: str, interval: float, run: Callable[[], Awaitable[int]]) -> None:
+        self._jobs[name] = Job(
+            name=name,
+            interval=interval,
+            run=run,
+            next_run=monotonic() + min(interval, self.startup_delay),
+        )
+
+    def stats(self) -> dict:
+        return {name: job.stats() for name, job in self._jobs.items()}
+
+    async def run(self, name: str) -> int:
+        """
+        Runs a job now, returns how many things it removed.
+        """
+        job = self._jobs[name]
+
+        async with self._lock:
+            start = perf_counter()
+
+            try:
+                removed = await job.run()
+            except Exception:
+                job.failures += 1
+                logger.exception("Maintenance job %s failed.", name)
+                removed = 0
+
+            job.runs += 1
+            job.removed += removed
+            job.last_duration = perf_counter() - start
+            job.next_run = monotonic() + job.interval
+
+        if removed:
+            logger.info("Maintenance job %s removed %s in %.2fs.", name, removed, job.last_duration)
+
+        return removed
+
+    async def _run(self) -> None:
+        while True:
+            if not self._jobs:
+                return
+
+            job = min(self._jobs.values(), key=lambda j: j.next_run)
+            await asyncio.sleep(max(0.0, job.next_run - monotonic()))
+            await self.run(job.name)
+
+    async def start(self) -> None:
+        """
+        Starts running the jobs in the background.
+        """
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+
+###########
+# BATCHES #
+###########
+
+
+async def in_batches(fetch: Callable, batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[list]:
+    """
+    Goes over something a batch at a time, e.g.
+
+    async for user_ids in in_batches(lambda after, limit: db.read(queries.ingame_user_ids, after, limit)):
+
+    fetch(after, limit) returns up to limit things that come after
+    `after` (the last thing of the batch before, None at first),
+    in order, so nothing is read twice even if things are
+    deleted (or added) along the way. Pauses between batches.
+    """
+    after = None
+
+    while True:
+        batch = await fetch(after, batch_size)
+
+        if batch:
+            yield batch
+
+        if len(batch) < batch_size:
+            return
+
+        after = batch[-1]
+        await asyncio.sleep(BATCH_PAUSE)
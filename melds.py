@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+A lookup engine for validating melds (runs and sets).
+
+Instead of sorting a group and walking the gaps
+between tiles every time it's validated, every valid
+meld for a given tile range is generated ONCE and stored
+in a dictionary keyed on a "canonical key", which is:
+
+- a bitmask of which (color, number) tiles are in the group
+- plus the amount of jokers in the group
+
+Validating a group is then just building its key (one pass
+over the tiles, no sorting) and a dictionary lookup. The
+value stored for each key is the order the tiles should
+be displayed in, so the server can still reorder groups
+for the client like it did before.
+
+Groups on the server are validated with order_codes(),
+which works on tile codes through a per-code lookup table
+instead of decoding every tile (see code_table()).
+
+NOTE: a group can never contain the same (color, number)
+tile twice - sets need different colors and runs need
+different numbers - so a bitmask is enough to describe
+the non-joker tiles of any valid group.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# the most jokers that can be in one group.
+# default games have 2 or 4 jokers in total, so
+# there's no point in generating more than this
+MAX_GROUP_JOKERS = 4
+
+# sets can only be as big as the amount of colors
+# but never smaller than three, same as runs
+MIN_GROUP_SIZE = 3
+
+# used in canonical orderings to mark
+# where a joker should be placed
+JOKER_SLOT = -1
+
+# a tile that's outside of a table's range,
+# see MeldTable.code_table()
+NO_SLOT = -2
+
+
+###########
+# CLASSES #
+###########
+
+
+class MeldTable:
+    """
+    Stores every valid meld for a tile range
+    and answers whether a group is one of them.
+
+    Should be built once per min_tile/max_tile pair,
+    see get_meld_table() below.
+    """
+
+    def __init__(self, min_tile: int, max_tile: int, color_count: int, max_jokers: int = MAX_GROUP_JOKERS):
+        self.min_tile = min_tile
+        self.max_tile = max_tile
+        self.color_count = color_count
+        self.max_jokers = max_jokers
+
+        # how many numbers there are per color
+        self.span = max_tile - min_tile + 1
+        # the joker count is stored above all
+        # of the (color, number) bits
+        self.joker_shift = self.span * color_count
+
+        # key -> tuple of slot indexes in display order
+        # (JOKER_SLOT where a joker goes)
+        self.melds: dict[int, tuple[int, ...]] = dict()
+
+        # runs first, so that if a group could be
+        # either (e.g. one tile and two jokers),
+        # it's displayed as a run
+        self._add_runs()
+        self._add_sets()
+
+        # key -> where each tile of the group goes once it's
+        # sorted by slot (jokers first), see order_codes()
+        self.placements: dict[int, tuple[int, ...]] = dict()
+        # most melds share a placement, so only keep one of each
+        shared = dict()
+
+        for key, meld in self.melds.items():
+            placement = self._placement(meld)
+            self.placements[key] = shared.setdefault(placement, placement)
+
+    def slot(self, color_index: int, number: int) -> int:
+        """
+        Returns the bit index of a (color, number) tile.
+        """
+        return color_index * self.span + (number - self.min_tile)
+
+    def _add_runs(self) -> None:
+        """
+        Generates every run: for every color, every
+        stretch of at least three numbers, with
+        any of those numbers swapped out for a joker.
+        """
+        for color_index in range(self.color_count):
+            for start in range(self.min_tile, self.max_tile + 1):
+                for end in range(start + MIN_GROUP_SIZE - 1, self.max_tile + 1):
+                    slots = [self.slot(color_index, n) for n in range(start, end + 1)]
+
+                    # at least one tile has to be a real tile
+                    for jokers in range(min(self.max_jokers, len(slots) - 1) + 1):
+                        for replaced in combinations(slots, jokers):
+                            numbered = [s for s in slots if s not in replaced]
+                            key = self._key_from_slots(numbered, jokers)
+
+                            if key not in self.melds:
+                                self.melds[key] = self._run_order(numbered, jokers)
+
+    def _run_order(self, numbered: list[int], jokers: int) -> tuple[int, ...]:
+        """
+        Returns the display order of a run.
+
+        Jokers fill any gaps first. Any extras go
+        at the end of the run if there's space,
+        and otherwise at the beginning.
+        """
+        order = list()
+
+        for i, s in enumerate(numbered):
+            if i > 0:
+                # fill the gap between this tile and the last
+                gap = s - numbered[i - 1] - 1
+                order.extend([JOKER_SLOT] * gap)
+                jokers -= gap
+            order.append(s)
+
+        # how much space there is after the highest tile
+        highest = numbered[-1] % self.span + self.min_tile
+        at_end = min(jokers, self.max_tile - highest)
+
+        return tuple([JOKER_SLOT] * (jokers - at_end) + order + [JOKER_SLOT] * at_end)
+
+    def _add_sets(self) -> None:
+        """
+        Generates every set: for every number, every
+        combination of distinct colors, topped up
+        with jokers to three or four tiles.
+        """
+        for number in range(self.min_tile, self.max_tile + 1):
+            slots = [self.slot(c, number) for c in range(self.color_count)]
+
+            for size in range(MIN_GROUP_SIZE, self.color_count + 1):
+                for jokers in range(min(self.max_jokers, size - 1) + 1):
+                    for numbered in combinations(slots, size - jokers):
+                        key = self._key_from_slots(numbered, jokers)
+
+                        if key not in self.melds:
+                            self.melds[key] = tuple(numbered) + (JOKER_SLOT,) * jokers
+
+    def _placement(self, meld: tuple[int, ...]) -> tuple[int, ...]:
+        """
+        Turns a display order into indexes of a group that's
+        sorted by slot, which puts the jokers first and then
+        every other tile in the order it's displayed in
+        (both runs and sets go up in slot).
+        """
+        jokers = meld.count(JOKER_SLOT)
+        joker_index = 0
+        tile_index = jokers
+        placement = list()
+
+        for s in meld:
+            if s == JOKER_SLOT:
+                placement.append(joker_index)
+                joker_index += 1
+            else:
+                placement.append(tile_index)
+                tile_index += 1
+
+        return tuple(placement)
+
+    def _key_from_slots(self, slots, jokers: int) -> int:
+        """
+        Builds a key out of slot indexes.
+        Only used while generating the table.
+        """
+        mask = 0
+        for s in slots:
+            mask |= 1 << s
+        return mask | (jokers << self.joker_shift)
+
+    def code_table(self, decode, code_count: int) -> tuple[list[int], list[int]]:
+        """
+        (bits, slots) of every tile code below code_count, for
+        order_codes(). decode(code) gives the tile's
+        (color_index, number, joker), like order() takes.
+
+        bits: what the tile adds to a group's key, i.e. its
+        slot's bit, one more joker for jokers, or a bit that
+        no key has for tiles outside of this table's range.
+        slots: its slot, JOKER_SLOT or NO_SLOT the same way.
+        """
+        bits = list()
+        slots = list()
+        # above the joker count, which never gets that high
+        no_bit = 1 << (self.joker_shift + 16)
+
+        for code in range(code_count):
+            color_index, number, joker = decode(code)
+
+            if joker:
+                bits.append(1 << self.joker_shift)
+                slots.append(JOKER_SLOT)
+            elif self.min_tile <= number <= self.max_tile and 0 <= color_index < self.color_count:
+                bits.append(1 << self.slot(color_index, number))
+                slots.append(self.slot(color_index, number))
+            else:
+                bits.append(no_bit)
+                slots.append(NO_SLOT)
+
+        return bits, slots
+
+    def order_codes(self, codes: list[int], code_table: tuple[list[int], list[int]]) -> list[int] | None:
+        """
+        Like order(), but takes tile codes and the table of
+        what they stand for (see code_table()) and returns
+        the codes themselves in the order they should be
+        displayed, or None if they aren't a valid meld.
+
+        Nothing is decoded and there's no Python loop
+        over the tiles: the key is a sum of each code's bit
+        and the reordering is a sort by slot.
+        """
+        bits, slots = code_table
+
+        try:
+            placement = self.placements.get(sum(map(bits.__getitem__, codes)))
+        # a code past the highest tile
+        except IndexError:
+            return None
+
+        # the same tile twice carries into the next bit up
+        # instead of adding a tile, so any key it makes is
+        # for a meld with less tiles than the group has
+        if placement is None or len(placement) != len(codes):
+            return None
+
+        ordered = sorted(codes, key=slots.__getitem__)
+        return list(map(ordered.__getitem__, placement))
+
+    def order(self, tiles) -> list[int] | None:
+        """
+        Takes an iterable of (color_index, number, joker)
+        tuples and returns the indexes of those tiles in
+        the order they should be displayed.
+
+        Returns None if they don't make a valid meld.
+
+        This is a single pass over the tiles; no sorting.
+        """
+        mask = 0
+        # slot -> index of the tile in the given group
+        positions = dict()
+        joker_positions = list()
+
+        # local copies; this is the hot loop
+        min_tile, max_tile = self.min_tile, self.max_tile
+        span, color_count = self.span, self.color_count
+
+        for i, (color_index, number, joker) in enumerate(tiles):
+            if joker:
+                joker_positions.append(i)
+                continue
+
+            # tiles outside of this game's range
+            if number < min_tile or number > max_tile:
+                return None
+            if color_index < 0 or color_index >= color_count:
+                return None
+
+            s = color_index * span + (number - min_tile)
+
+            # the same tile twice can't be a valid group
+            if mask >> s & 1:
+                return None
+
+            mask |= 1 << s
+            positions[s] = i
+
+        meld = self.melds.get(mask | (len(joker_positions) << self.joker_shift))
+
+        if meld is None:
+            return None
+
+        return [joker_positions.pop() if s == JOKER_SLOT else positions[s] for s in meld]
+
+    def is_valid(self, tiles) -> bool:
+        """
+        Same as order() but only returns whether or
+        not the tiles make a valid meld.
+        """
+        return self.order(tiles) is not None
+
+
+@lru_cache(maxsize=16)
+def get_meld_table(min_tile: int, max_tile: int, color_count: int) -> MeldTable:
+    """
+    Returns the MeldTable for the given tile range,
+    building it the first time it's asked for.
+    """
+    return MeldTable(min_tile, max_tile, color_count)
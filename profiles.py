@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Looks up players' usernames, a whole game's worth at once.
+
+The username of a session used to only be in the session
+itself, so showing a game's players meant reading (and
+parsing) the session file of every one of them, on every
+request. Now they're also kept in the profiles table (keyed
+by session ID), and the ones that have been looked up lately
+are kept in memory, so most lookups don't touch the disk
+at all and the rest are one query for the whole game.
+
+Sessions from before the profiles table don't have a row
+in it yet; those are read from the session store once (see
+fallback) and added, so they don't have to be read again.
+
+NOTE: a profile sticks around until maintenance removes it
+(once its session has expired and they aren't in a game anymore).
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import queries
+from database import AsyncDatabase
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# how many usernames are kept in memory.
+# the least recently used ones are dropped after that
+DEFAULT_CAPACITY = 16384
+
+# session ID -> its username (or None), for sessions
+# that aren't in the profiles table
+Fallback = Callable[[str], Awaitable[str | None]]
+
+
+###########
+# CLASSES #
+###########
+
+
+class PlayerProfiles:
+    """
+    Session ID -> username, in memory in front of the profiles table.
+    """
+
+    def __init__(self, db: AsyncDatabase, fallback: Fallback | None = None, capacity: int = DEFAULT_CAPACITY):
+        self.db = db
+        self.fallback = fallback
+        self.capacity = capacity
+
+        # session ID -> username, or None if they don't have one
+        # (so that's not looked up over and over either)
+        self._usernames: OrderedDict[str, str | None] = OrderedDict()
+
+        # goes up whenever anyone's username changes. Anything
+        # built from usernames (e.g. a board) can use it to
+        # tell whether it's out of date
+        self.changes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._usernames),
+            "hits": self.hits,
+            "misses": self.misses,
+            "changes": self.changes,
+        }
+
+    def _remember(self, user_id: str, username: str | None) -> None:
+        self._usernames[user_id] = username
+        self._usernames.move_to_end(user_id)
+
+        while len(self._usernames) > self.capacity:
+            self._usernames.popitem(last=False)
+
+    async def get_usernames(self, user_ids) -> dict[str, str]:
+        """
+        user ID -> username, for every one of
+        the IDs that has a username.
+        """
+        usernames = dict()
+        missing = list()
+
+        for user_id in user_ids:
+            if user_id in self._usernames:
+                self.hits += 1
+                self._usernames.move_to_end(user_id)
+                if self._usernames[user_id] is not None:
+                    usernames[user_id] = self._usernames[user_id]
+            else:
+                self.misses += 1
+                missing.append(user_id)
+
+        if not missing:
+            return usernames
+
+        # if a username changes while this is looking it up, what
+        # it found might be from before, so it isn't kept around
+        changes = self.changes
+        found = await self.db.read(queries.usernames_by_ids, missing)
+
+        for user_id in missing:
+            if user_id not in found and self.fallback is not None:
+                username = await self.fallback(user_id)
+
+                if username is not None and changes == self.changes:
+                    found[user_id] = username
+                    await self.db.write(queries.set_username, user_id, username)
+
+        # dropping in the meantime is fine, it just means they're read again
+        if changes == self.changes:
+            for user_id in missing:
+                self._remember(user_id, found.get(user_id))
+
+        for user_id in missing:
+            if user_id in found:
+                usernames[user_id] = found[user_id]
+
+        return usernames
+
+    async def set_username(self, user_id: str, username: str) -> None:
+        """
+        Saves a session's (new) username.
+        """
+        await self.db.write(queries.set_username, user_id, username)
+        self.changes += 1
+        # it's read from the table again the next time
+        self._usernames.pop(user_id, None)
+
+    async def forget(self, user_ids) -> None:
+        """
+        Removes the profiles of the sessions, e.g. once they've expired.
+        """
+        user_ids = list(user_ids)
+        await self.db.write(queries.delete_profiles, user_ids)
+        self.changes += 1
+
+        for user_id in user_ids:
+            self._usernames.pop(user_id, None)
@@ -0,0 +1,549 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Every query the server makes, as named,
+parameterized statements.
+
+The SQL text of each statement never changes (the values
+are bound as parameters instead of formatted into the string),
+so SQLite only has to compile each one once per connection;
+sqlite3 keeps the compiled statements in a per-connection
+cache (see STATEMENT_CACHE_SIZE) and reuses them after that.
+Binding parameters also means nothing a client sends can
+end up as SQL.
+
+None of these commit: reads don't need to and writes are
+committed by whoever runs them (see database.AsyncDatabase.write).
+
+The write functions can also be given a UnitOfWork instead of
+a connection, which holds on to the writes of a whole game action
+(e.g. every player's hand plus the game row when a game starts)
+and applies them in one transaction, so there's one commit (and
+one fsync) per action and a crash can never leave half of a
+turn saved.
+"""
+
+import json
+from sqlite3 import Connection
+
+import codec
+from classes import Game, Hand
+from fingerprint import from_signed, to_signed
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# comfortably more than the amount of statements below,
+# so none of them ever get pushed out of the cache
+STATEMENT_CACHE_SIZE = 256
+
+GAME_COLUMNS = ["gameID", "gameState", "lastActive", "currentPlayerTurn", "tableContents", "gameData", "turnDeadline", "timeouts"]
+INGAME_COLUMNS = ["userID", "gameID", "turnNumber", "hand"]
+
+
+##############
+# STATEMENTS #
+##############
+
+# ----------
+# games
+
+GAME_BY_ID = f"SELECT {', '.join(GAME_COLUMNS)} FROM games WHERE gameID == :game_id;"
+GAME_STATE_BY_ID = "SELECT gameState FROM games WHERE gameID == :game_id;"
+GAME_VERSION_BY_ID = "SELECT gameState, fingerprint FROM games WHERE gameID == :game_id;"
+GAME_IDS_BY_STATE = "SELECT gameID FROM games WHERE gameState == :game_state;"
+# the oldest games first, a batch at a time: (lastActive, gameID)
+# is the last one of the batch before, so nothing's read twice
+# (ended games are archived instead, see ENDED_GAMES)
+INACTIVE_GAMES = """SELECT lastActive, gameID FROM games
+    WHERE lastActive < :cutoff AND gameState != 'ENDED' AND (lastActive, gameID) > (:after_active, :after_id)
+    ORDER BY lastActive, gameID LIMIT :limit;"""
+# the same, for games that ended before the cutoff
+ENDED_GAMES = """SELECT lastActive, gameID FROM games
+    WHERE gameState == 'ENDED' AND lastActive < :cutoff AND (lastActive, gameID) > (:after_active, :after_id)
+    ORDER BY lastActive, gameID LIMIT :limit;"""
+GAMES_BY_IDS = f"SELECT {', '.join(GAME_COLUMNS)} FROM games WHERE gameID IN (SELECT value FROM json_each(:game_ids));"
+# games whose turns aren't being timed don't have a deadline
+TURN_DEADLINES_BY_STATE = """SELECT gameID, currentPlayerTurn, turnDeadline
+    FROM games WHERE gameState == :game_state AND turnDeadline IS NOT NULL;"""
+
+INSERT_GAME = f"INSERT INTO games ({', '.join(GAME_COLUMNS)}) VALUES ({', '.join('?' * len(GAME_COLUMNS))});"
+
+# everything that changes while a game is played
+# (gameData is set when it's created and stays that way)
+SAVE_GAME = """UPDATE games SET
+    gameState = :game_state,
+    lastActive = :last_active,
+    tableContents = :table,
+    currentPlayerTurn = :current_player_turn,
+    turnDeadline = :turn_deadline,
+    timeouts = :timeouts,
+    fingerprint = :fingerprint
+    WHERE gameID == :game_id;"""
+
+SET_GAME_STATE = "UPDATE games SET gameState = :game_state WHERE gameID == :game_id;"
+# only starts a game that hasn't been started yet and still has the
+# players it was dealt for, so of two starts at once (or a start
+# and a join) only one goes through, see start_game()
+START_GAME = """UPDATE games SET gameState = 'ONGOING'
+    WHERE gameID == :game_id AND gameState == 'PREGAME'
+    AND (SELECT COUNT(*) FROM ingame WHERE gameID == :game_id) == :player_count;"""
+# any amount of IDs, as a JSON array (see USERNAMES_BY_IDS)
+DELETE_GAMES = "DELETE FROM games WHERE gameID IN (SELECT value FROM json_each(:game_ids));"
+
+# ----------
+# ingame
+
+PLAYERS_IN_GAME = "SELECT userID FROM ingame WHERE gameID == :game_id;"
+GAMES_WITH_PLAYER = "SELECT gameID FROM ingame WHERE userID == :user_id;"
+INGAME_ROWS_BY_GAME = f"SELECT {', '.join(INGAME_COLUMNS)} FROM ingame WHERE gameID == :game_id;"
+INGAME_ROWS_BY_GAMES = f"""SELECT {', '.join(INGAME_COLUMNS)} FROM ingame
+    WHERE gameID IN (SELECT value FROM json_each(:game_ids));"""
+INGAME_ROW = f"SELECT {', '.join(INGAME_COLUMNS)} FROM ingame WHERE gameID == :game_id AND userID == :user_id;"
+# a batch at a time, after the last ID of the batch before
+INGAME_GAME_IDS = "SELECT DISTINCT gameID FROM ingame WHERE gameID > :after ORDER BY gameID LIMIT :limit;"
+INGAME_USER_IDS = "SELECT DISTINCT userID FROM ingame WHERE userID > :after ORDER BY userID LIMIT :limit;"
+# the ones (of a JSON array) there's no games row for
+MISSING_GAME_IDS = "SELECT value FROM json_each(:game_ids) WHERE value NOT IN (SELECT gameID FROM games);"
+
+INSERT_PLAYER = f"INSERT INTO ingame ({', '.join(INGAME_COLUMNS)}) VALUES (?, ?, ?, ?);"
+# the same, but only into a game that hasn't started, isn't full
+# and doesn't have them already, see join_game()
+JOIN_GAME = f"""INSERT OR IGNORE INTO ingame ({', '.join(INGAME_COLUMNS)})
+    SELECT :user_id, :game_id, :turn_number, :hand
+    WHERE EXISTS (SELECT 1 FROM games WHERE gameID == :game_id AND gameState == 'PREGAME')
+    AND (SELECT COUNT(*) FROM ingame WHERE gameID == :game_id) < :max_players;"""
+
+SET_HAND = "UPDATE ingame SET hand = :hand WHERE gameID == :game_id AND userID == :user_id;"
+SET_TURN_AND_HAND = """UPDATE ingame SET
+    turnNumber = :turn_number,
+    hand = :hand
+    WHERE gameID == :game_id AND userID == :user_id;"""
+
+DELETE_PLAYERS_OF_GAMES = "DELETE FROM ingame WHERE gameID IN (SELECT value FROM json_each(:game_ids));"
+# except for the games given and ended games
+# (which are archived along with their players)
+DELETE_PLAYERS = """DELETE FROM ingame
+    WHERE userID IN (SELECT value FROM json_each(:user_ids))
+    AND gameID NOT IN (SELECT value FROM json_each(:keep_game_ids))
+    AND NOT EXISTS (SELECT 1 FROM games WHERE games.gameID == ingame.gameID AND gameState == 'ENDED');"""
+
+
+# ----------
+# profiles
+
+# any amount of IDs, given as a JSON array, so
+# that it's still the same statement every time
+USERNAMES_BY_IDS = """SELECT userID, username FROM profiles
+    WHERE userID IN (SELECT value FROM json_each(:user_ids));"""
+# only players that aren't in any game (anymore), the
+# ones that are still need their usernames
+PROFILE_USER_IDS = """SELECT userID FROM profiles
+    WHERE userID > :after AND NOT EXISTS (SELECT 1 FROM ingame WHERE ingame.userID == profiles.userID)
+    ORDER BY userID LIMIT :limit;"""
+
+SET_USERNAME = """INSERT INTO profiles (userID, username) VALUES (:user_id, :username)
+    ON CONFLICT(userID) DO UPDATE SET username = excluded.username;"""
+DELETE_PROFILES = "DELETE FROM profiles WHERE userID IN (SELECT value FROM json_each(:user_ids));"
+
+# ----------
+# archive (only ever added to)
+
+ARCHIVE_BY_ID = "SELECT record FROM archive WHERE gameID == :game_id;"
+ARCHIVED_GAMES_BY_PLAYER = """SELECT archive.gameID, archive.endedAt FROM archive_players
+    JOIN archive ON archive.gameID == archive_players.gameID
+    WHERE archive_players.userID == :user_id
+    ORDER BY archive.endedAt DESC;"""
+
+INSERT_ARCHIVE = "INSERT OR IGNORE INTO archive (gameID, endedAt, record) VALUES (?, ?, ?);"
+INSERT_ARCHIVED_PLAYER = "INSERT OR IGNORE INTO archive_players (userID, gameID) VALUES (?, ?);"
+
+# ----------
+# sessions (these are in a database of their own, see sessionstore.py)
+
+# expiresAt is a unix timestamp, NULL if it never expires.
+# namespace is "" for the top level, see sessionstore.SQLiteStore
+SESSION_TABLE = """CREATE TABLE IF NOT EXISTS sessions(namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expiresAt REAL,
+    PRIMARY KEY(namespace, key));"""
+# so expired sessions can be deleted without going over all of them
+SESSION_EXPIRY_INDEX = "CREATE INDEX IF NOT EXISTS sessions_expiresAt ON sessions(expiresAt);"
+
+SESSION_BY_KEY = "SELECT value, expiresAt FROM sessions WHERE namespace == :namespace AND key == :key;"
+# the ones of the keys (a JSON array) that haven't expired
+LIVE_SESSION_KEYS = """SELECT key FROM sessions
+    WHERE namespace == :namespace AND key IN (SELECT value FROM json_each(:keys))
+    AND (expiresAt IS NULL OR expiresAt > :now);"""
+
+SET_SESSION = """INSERT INTO sessions (namespace, key, value, expiresAt)
+    VALUES (:namespace, :key, :value, :expires_at)
+    ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, expiresAt = excluded.expiresAt;"""
+DELETE_SESSION = "DELETE FROM sessions WHERE namespace == :namespace AND key == :key;"
+# a namespace and everything under it
+DELETE_SESSION_NAMESPACE = """DELETE FROM sessions
+    WHERE namespace == :namespace OR substr(namespace, 1, length(:prefix)) == :prefix;"""
+# a batch at a time
+DELETE_EXPIRED_SESSIONS = """DELETE FROM sessions WHERE rowid IN (
+    SELECT rowid FROM sessions WHERE expiresAt <= :now LIMIT :limit);"""
+
+
+#########
+# READS #
+#########
+
+
+def game_by_id(con: Connection, game_id: str) -> tuple[tuple | None, list[str]]:
+    """
+    Returns the games row for the ID (or None) and its columns.
+    """
+    return con.execute(GAME_BY_ID, {"game_id": game_id}).fetchone(), GAME_COLUMNS
+
+
+def game_state(con: Connection, game_id: str) -> str | None:
+    row = con.execute(GAME_STATE_BY_ID, {"game_id": game_id}).fetchone()
+    return row[0] if row is not None else None
+
+
+def game_version(con: Connection, game_id: str) -> tuple[str, int] | None:
+    """
+    The game's state and fingerprint (see fingerprint.py),
+    or None if there's no such game.
+    """
+    row = con.execute(GAME_VERSION_BY_ID, {"game_id": game_id}).fetchone()
+    return (row[0], from_signed(row[1])) if row is not None else None
+
+
+def game_ids_by_state(con: Connection, state: str) -> list[str]:
+    return [row[0] for row in con.execute(GAME_IDS_BY_STATE, {"game_state": state})]
+
+
+def inactive_games(con: Connection, cutoff: int, after: tuple[int, str] | None, limit: int) -> list[tuple[int, str]]:
+    """
+    (lastActive, gameID) of up to limit games that haven't been
+    active since the cutoff (a unix timestamp), oldest first,
+    starting after the last one of the batch before.
+    """
+    after_active, after_id = after if after is not None else (-1, "")
+    return con.execute(INACTIVE_GAMES, {
+        "cutoff": cutoff,
+        "after_active": after_active,
+        "after_id": after_id,
+        "limit": limit,
+    }).fetchall()
+
+
+def ended_games(con: Connection, cutoff: int, after: tuple[int, str] | None, limit: int) -> list[tuple[int, str]]:
+    """
+    Same as inactive_games(), for games that ended before the cutoff.
+    """
+    after_active, after_id = after if after is not None else (-1, "")
+    return con.execute(ENDED_GAMES, {
+        "cutoff": cutoff,
+        "after_active": after_active,
+        "after_id": after_id,
+        "limit": limit,
+    }).fetchall()
+
+
+def games_by_ids(con: Connection, game_ids: list[str]) -> tuple[list[tuple], list[str]]:
+    """
+    The games rows of the IDs (the ones that exist) and their columns.
+    """
+    return con.execute(GAMES_BY_IDS, {"game_ids": json.dumps(game_ids)}).fetchall(), GAME_COLUMNS
+
+
+def turn_deadlines(con: Connection) -> list[tuple[str, int, float]]:
+    """
+    (gameID, currentPlayerTurn, deadline) of every ongoing
+    game whose turn is being timed, i.e. when its current
+    turn runs out. (untimed games, and ones the timer gave
+    up on, don't have a deadline, see server.schedule_turn)
+    """
+    return con.execute(TURN_DEADLINES_BY_STATE, {"game_state": "ONGOING"}).fetchall()
+
+
+def players_in_game(con: Connection, game_id: str) -> list[str]:
+    return [row[0] for row in con.execute(PLAYERS_IN_GAME, {"game_id": game_id})]
+
+
+def games_with_player(con: Connection, user_id: str) -> list[str]:
+    return [row[0] for row in con.execute(GAMES_WITH_PLAYER, {"user_id": user_id})]
+
+
+def ingame_rows_by_game(con: Connection, game_id: str) -> list[tuple]:
+    """
+    Every ingame row of a game: userID, gameID, turnNumber, hand.
+    """
+    return con.execute(INGAME_ROWS_BY_GAME, {"game_id": game_id}).fetchall()
+
+
+def ingame_rows_by_games(con: Connection, game_ids: list[str]) -> list[tuple]:
+    """
+    Every ingame row of each of the games, same as ingame_rows_by_game().
+    """
+    return con.execute(INGAME_ROWS_BY_GAMES, {"game_ids": json.dumps(game_ids)}).fetchall()
+
+
+def ingame_row(con: Connection, game_id: str, user_id: str) -> tuple | None:
+    """
+    One player's ingame row: userID, gameID, turnNumber, hand.
+    """
+    return con.execute(INGAME_ROW, {"game_id": game_id, "user_id": user_id}).fetchone()
+
+
+def ingame_game_ids(con: Connection, after: str | None, limit: int) -> list[str]:
+    """
+    Up to limit gameIDs that have players, in order,
+    starting after the last one of the batch before.
+    """
+    return [row[0] for row in con.execute(INGAME_GAME_IDS, {"after": after or "", "limit": limit})]
+
+
+def missing_game_ids(con: Connection, game_ids: list[str]) -> list[str]:
+    """
+    The ones that aren't in the games table.
+    """
+    return [row[0] for row in con.execute(MISSING_GAME_IDS, {"game_ids": json.dumps(game_ids)})]
+
+
+def ingame_user_ids(con: Connection, after: str | None, limit: int) -> list[str]:
+    """
+    Up to limit userIDs that are in a game, in order,
+    starting after the last one of the batch before.
+    """
+    return [row[0] for row in con.execute(INGAME_USER_IDS, {"after": after or "", "limit": limit})]
+
+
+def usernames_by_ids(con: Connection, user_ids: list[str]) -> dict[str, str]:
+    """
+    userID -> username, for the IDs that have one.
+    """
+    return dict(con.execute(USERNAMES_BY_IDS, {"user_ids": json.dumps(user_ids)}))
+
+
+def profile_user_ids(con: Connection, after: str | None, limit: int) -> list[str]:
+    """
+    Same as ingame_user_ids(), for the profiles
+    of players that aren't in a game.
+    """
+    return [row[0] for row in con.execute(PROFILE_USER_IDS, {"after": after or "", "limit": limit})]
+
+
+def archived_game(con: Connection, game_id: str) -> bytes | None:
+    """
+    An archived game's record (see codec.decode_archive), or None.
+    """
+    row = con.execute(ARCHIVE_BY_ID, {"game_id": game_id}).fetchone()
+    return row[0] if row is not None else None
+
+
+def archived_games_by_player(con: Connection, user_id: str) -> list[tuple[str, int]]:
+    """
+    (gameID, endedAt) of every archived game the player was in, latest first.
+    """
+    return con.execute(ARCHIVED_GAMES_BY_PLAYER, {"user_id": user_id}).fetchall()
+
+
+def session_by_key(con: Connection, namespace: str, key: str) -> tuple[bytes, float | None] | None:
+    """
+    A session's value and when it expires (or None), expired or not.
+    """
+    return con.execute(SESSION_BY_KEY, {"namespace": namespace, "key": key}).fetchone()
+
+
+def live_session_keys(con: Connection, namespace: str, keys: list[str], now: float) -> set[str]:
+    """
+    The ones of the keys that have a session that hasn't expired by now.
+    """
+    return {row[0] for row in con.execute(LIVE_SESSION_KEYS, {"namespace": namespace, "keys": json.dumps(keys), "now": now})}
+
+
+###########
+# CLASSES #
+###########
+
+
+class UnitOfWork:
+    """
+    Collects writes so they can be applied all at once.
+
+    It has the same execute() as a Connection, so it can be
+    passed to any of the write functions below in place of
+    one. Nothing touches the database until flush(), e.g.
+
+    changes = UnitOfWork()
+    set_hand(changes, game_id, user_id, hand)
+    save_game(changes, game, fingerprint)
+    await db.write(changes.flush)
+
+    NOTE: every run of the same statement is applied together
+    (with executemany), in the order the statements were first
+    added, so don't add two different statements that
+    change the same column of the same row.
+    """
+
+    def __init__(self):
+        # statement -> the parameters of each time it's run
+        self.statements: dict[str, list] = dict()
+
+    def execute(self, statement: str, params: tuple | list | dict = ()) -> None:
+        self.statements.setdefault(statement, list()).append(params)
+
+    def flush(self, con: Connection) -> None:
+        """
+        Runs every collected write on the connection.
+        Doesn't commit, same as the write functions.
+        """
+        for statement, params in self.statements.items():
+            con.executemany(statement, params)
+
+        self.statements.clear()
+
+
+# anything the write functions can be given
+Executor = Connection | UnitOfWork
+
+
+##########
+# WRITES #
+##########
+
+
+def insert_game(con: Executor, game: Game) -> None:
+    con.execute(INSERT_GAME, codec.game_to_row(game))
+
+
+def insert_player(con: Executor, user_id: str, game_id: str, turn_number: int, hand: Hand) -> None:
+    con.execute(INSERT_PLAYER, (user_id, game_id, turn_number, codec.encode_hand(hand)))
+
+
+def join_game(con: Connection, user_id: str, game_id: str, turn_number: int, hand: Hand, max_players: int) -> bool:
+    """
+    Adds a player to a game, as long as it hasn't started, has
+    less than max_players and they aren't in it already, all
+    checked in the same statement. Returns whether they were added.
+    """
+    return con.execute(JOIN_GAME, {
+        "user_id": user_id,
+        "game_id": game_id,
+        "turn_number": turn_number,
+        "hand": codec.encode_hand(hand),
+        "max_players": max_players,
+    }).rowcount == 1
+
+
+def start_game(con: Connection, game_id: str, player_count: int, changes: UnitOfWork) -> bool:
+    """
+    Marks a game as started and applies the changes that start it
+    (dealing the hands etc.), but only if it hadn't been started yet
+    and still has player_count players. Returns whether it was.
+    """
+    if con.execute(START_GAME, {"game_id": game_id, "player_count": player_count}).rowcount != 1:
+        return False
+
+    changes.flush(con)
+    return True
+
+
+def save_game(con: Executor, game: Game, fingerprint: int) -> None:
+    """
+    Saves the state of a game that's being played,
+    and its fingerprint (see fingerprint.py).
+    (a shuffled pool is saved as just its seed and cursor)
+    """
+    con.execute(SAVE_GAME, {
+        "game_id": game.id,
+        "game_state": game.game_state,
+        "last_active": game.last_active,
+        "table": codec.encode_table(game.table),
+        "current_player_turn": game.current_player_turn,
+        "turn_deadline": game.turn_deadline,
+        "timeouts": game.timeouts,
+        "fingerprint": to_signed(fingerprint),
+    })
+
+
+def set_game_state(con: Executor, game_id: str, state: str) -> None:
+    con.execute(SET_GAME_STATE, {"game_id": game_id, "game_state": state})
+
+
+def delete_games(con: Executor, game_ids: list[str]) -> None:
+    """
+    Deletes the games and their ingame rows.
+    """
+    game_ids = json.dumps(game_ids)
+    con.execute(DELETE_PLAYERS_OF_GAMES, {"game_ids": game_ids})
+    con.execute(DELETE_GAMES, {"game_ids": game_ids})
+
+
+def set_hand(con: Executor, game_id: str, user_id: str, hand: Hand) -> None:
+    con.execute(SET_HAND, {"game_id": game_id, "user_id": user_id, "hand": codec.encode_hand(hand)})
+
+
+def set_turn_and_hand(con: Executor, game_id: str, user_id: str, turn_number: int, hand: Hand) -> None:
+    con.execute(SET_TURN_AND_HAND, {
+        "game_id": game_id,
+        "user_id": user_id,
+        "turn_number": turn_number,
+        "hand": codec.encode_hand(hand),
+    })
+
+
+def delete_players(con: Connection, user_ids: list[str], keep_game_ids: list[str]) -> int:
+    """
+    Takes the players out of every game but the ones in keep_game_ids
+    (and ended ones, see DELETE_PLAYERS). Returns how many rows it deleted.
+    """
+    return con.execute(
+        DELETE_PLAYERS,
+        {"user_ids": json.dumps(user_ids), "keep_game_ids": json.dumps(keep_game_ids)},
+    ).rowcount
+
+
+
+def set_username(con: Executor, user_id: str, username: str) -> None:
+    con.execute(SET_USERNAME, {"user_id": user_id, "username": username})
+
+
+def delete_profiles(con: Executor, user_ids: list[str]) -> None:
+    con.execute(DELETE_PROFILES, {"user_ids": json.dumps(user_ids)})
+
+
+def insert_archive(con: Executor, game_id: str, ended_at: int, record: bytes, user_ids: list[str]) -> None:
+    """
+    Archives a game (see codec.encode_archive) and who played in it.
+    """
+    con.execute(INSERT_ARCHIVE, (game_id, ended_at, record))
+    for user_id in user_ids:
+        con.execute(INSERT_ARCHIVED_PLAYER, (user_id, game_id))
+
+
+def create_session_table(con: Executor) -> None:
+    con.execute(SESSION_TABLE)
+    con.execute(SESSION_EXPIRY_INDEX)
+
+
+def set_session(con: Executor, namespace: str, key: str, value: bytes, expires_at: float | None) -> None:
+    con.execute(SET_SESSION, {"namespace": namespace, "key": key, "value": value, "expires_at": expires_at})
+
+
+def delete_session(con: Executor, namespace: str, key: str) -> None:
+    con.execute(DELETE_SESSION, {"namespace": namespace, "key": key})
+
+
+def delete_session_namespace(con: Executor, namespace: str, prefix: str) -> None:
+    con.execute(DELETE_SESSION_NAMESPACE, {"namespace": namespace, "prefix": prefix})
+
+
+def delete_expired_sessions(con: Connection, now: float, limit: int) -> int:
+    """
+    Deletes up to limit sessions that expired by
+    now, returns how many there were.
+    """
+    return con.execute(DELETE_EXPIRED_SESSIONS, {"now": now, "limit": limit}).rowcount
@@ -13,16 +13,19 @@ for a Linux machine.
 
 # default imports
 import os
-import asyncio
+import copy
+import json
 import sqlite3
-from pathlib import Path
-from json import JSONDecodeError
+from time import time
+from contextlib import closing
 
 # broad litestar imports
 from litestar.logging import LoggingConfig
-from litestar import Litestar, status_codes
+from litestar import Litestar, Response, status_codes
+from litestar.enums import MediaType
 from litestar.config.cors import CORSConfig
 from litestar.exceptions import HTTPException
+from litestar.serialization import encode_json, get_serializer
 from litestar.middleware.session.base import ONE_DAY_IN_SECONDS
 
 # requests and responses
@@ -30,7 +33,6 @@ from litestar.connection import Request
 from litestar.response.sse import ServerSentEventMessage, ServerSentEvent
 
 # handling clients and sessions
-from litestar.stores.file import FileStore
 from litestar.middleware.rate_limit import RateLimitConfig
 from litestar.middleware.session.server_side import ServerSideSessionConfig, ServerSideSessionBackend
 
@@ -40,7 +42,20 @@ from litestar.controller import Controller
 from litestar.handlers import get, post, put
 
 # custom imports
+import codec
 from functions import *
+from database import AsyncDatabase
+from gamecache import GameCache, LiveGame
+from broadcast import HEARTBEAT, Broadcaster, StreamLimitReached
+from turntimer import TurnTimer
+from tablediff import diff_table
+from fingerprint import Fingerprint
+from etags import ConditionalGetMiddleware, make_etag
+from singleflight import SingleFlight
+from profiles import PlayerProfiles
+from sessionstore import SQLiteStore
+from authcache import AuthCache
+from maintenance import Maintenance, in_batches
 
 """
 NOTE: make sure to close each connection after it's
@@ -51,12 +66,11 @@ served its purpose. This should hopefully save on resources.
 # CONST VARIABLES #
 ###################
 
-# a set of the queues for each game
-# NOTE: IMPLEMENT something to remove
-# a game from this set if it's been
-# ended or deleted in some way
-QUEUES: dict[asyncio.Queue] = dict()
-ONGOING_GAMES = set()
+# sends the notifications of each game to every
+# client listening to it, see broadcast.py
+# (channels are cleaned up once nobody's listening,
+# and games once nothing has happened in a while)
+BROADCASTER = Broadcaster()
 
 
 ###
@@ -68,19 +82,35 @@ UNAUTHORIZED_RESPONSE = {
     "detail": "User is not authorized."
 }
 
+# tiles are stored as codes (see classes.TileArray),
+# so they're turned back into Tiles on the way out
+TYPE_ENCODERS = {TileArray: list}
+# for the responses that are encoded by hand, see board_info()
+SERIALIZER = get_serializer(TYPE_ENCODERS)
+
 
 ###
 # database stuff
 ###
 
 DAYS_UNTIL_GAME_DELETED = 2
+# ended games are archived after this many seconds
+# (so players can still look at the end of the game)
+SECONDS_UNTIL_GAME_ARCHIVED = 60 * 60
+
+# how often each cleanup job runs, in seconds (see MAINTENANCE)
+EXPIRED_SESSIONS_INTERVAL = 10 * 60
+OLD_GAMES_INTERVAL = 60 * 60
+ARCHIVE_INTERVAL = 10 * 60
+LEFTOVER_PLAYERS_INTERVAL = 10 * 60
 
 DATA_FOLDER = os.path.normpath(os.path.abspath("./data"))
 DATA_DB = os.path.join(DATA_FOLDER, "data.db")
 
-SESSION_FOLDER = os.path.join(DATA_FOLDER, "sessions")
+# sessions have a database of their own, see sessionstore.py
+SESSION_DB = os.path.join(DATA_FOLDER, "sessions.db")
 # create all folders if they don't exist already.
-os.makedirs(SESSION_FOLDER, exist_ok=True)
+os.makedirs(DATA_FOLDER, exist_ok=True)
 
 SESSION_CONFIG = ServerSideSessionConfig(
     # TODO: figure out why this isn't working.
@@ -91,7 +121,14 @@ SESSION_CONFIG = ServerSideSessionConfig(
 )
 
 SESSION_BACKEND = ServerSideSessionBackend(SESSION_CONFIG)
-SESSION_FILE_STORE = FileStore(path=Path(SESSION_FOLDER))
+# any Store with delete_expired(), existing(), stats() and on_delete() works here,
+# e.g. litestar's MemoryStore or FileStore (one file per session)
+SESSION_STORE = SQLiteStore(SESSION_DB)
+
+# sessions that were just checked don't get looked up again
+# for a bit, see authcache.py (and forgotten once deleted)
+AUTH_CACHE = AuthCache(SESSION_STORE)
+SESSION_STORE.on_delete(AUTH_CACHE.forget)
 
 
 ###
@@ -113,17 +150,350 @@ lgr = LoggingConfig(
 #############################
 
 
-con = sqlite3.connect(DATA_DB)
-initialize_db_and_tables(con)
+# this connection is only used while starting up,
+# everything after goes through db (see database.py)
+with closing(sqlite3.connect(DATA_DB)) as con:
+    initialize_db_and_tables(con)
+
+    # when the turn of each ongoing game runs out,
+    # so the turn timer picks up where it left off
+    turn_deadlines = queries.turn_deadlines(con)
+
+db = AsyncDatabase(DATA_DB)
+# ongoing games are read and changed here, not in
+# the database, see gamecache.py
+games = GameCache(db)
+
+
+async def username_from_session(session_id: str) -> str | None:
+    """
+    The username in a session, for sessions
+    that don't have a profile yet.
+    """
+    # this has multiple steps:
+    # 1. get session contents
+    # 2. convert from bytes to dict
+    # 3. get the username from the dict
+    session = await SESSION_BACKEND.get(session_id, SESSION_STORE)
+
+    # if there isn't a session anymore
+    if session is None:
+        return None
+
+    return json.loads(session).get("username")
+
+
+# every player's username, see profiles.py
+PROFILES = PlayerProfiles(db, fallback=username_from_session)
+
+
+##############
+# TURN TIMER #
+##############
+
+
+# how many rounds (of max_players turns) can run out in a row
+# before the timer stops moving a game along by itself. Nobody's
+# played in all that time, so the game's most likely been left,
+# and it stays on that turn until somebody plays again (or it's
+# old enough to be deleted, see remove_old_games)
+MAX_TIMED_OUT_ROUNDS = 3
+
+
+def turn_timer_gave_up(game: Game) -> bool:
+    """
+    Whether enough turns in a row have run
+    out to stop timing the game's turns.
+    """
+    rounds = game.timeouts / game.game_data.max_players
+
+    # without any tiles left to draw, a turn that runs
+    # out doesn't change anything, so one round of that
+    # is all it takes
+    if game.table.pool_size() <= 0:
+        return rounds >= 1
+
+    return rounds >= MAX_TIMED_OUT_ROUNDS
+
+
+def turn_deadline(game: Game) -> int | None:
+    """
+    When the game's current turn runs out if it starts now.
+
+    None if it doesn't: games with a turn_time_limit of 0
+    (or less) aren't timed at all, and neither are the
+    ones the timer gave up on (see turn_timer_gave_up()).
+    """
+    if game.game_data.turn_time_limit <= 0 or turn_timer_gave_up(game):
+        return None
+
+    return int(time()) + game.game_data.turn_time_limit
+
+
+def schedule_turn(game: Game) -> None:
+    """
+    Starts timing the game's current turn, which starts now.
+    (if it's timed at all, see turn_deadline())
+    """
+    game.turn_deadline = turn_deadline(game)
+
+    if game.turn_deadline is None:
+        TURN_TIMER.cancel(game.id)
+    else:
+        TURN_TIMER.schedule(game.id, game.current_player_turn, game.turn_deadline)
+
+
+async def expire_turn(game_id: str, turn: int) -> None:
+    """
+    Ends a turn that ran out of time: the player gets
+    a tile from the pool (if there are any left) and
+    it's the next player's turn.
+
+    The table is put back the way it was when the turn
+    started first, in case anything was changed since.
+
+    NOTE: running out of time isn't activity, so this
+    doesn't touch lastActive (see finish_turn()).
+    """
+    live = await games.get(game_id)
+
+    # it was played (or the game ended) just in time
+    if live is None or live.game.game_state != "ONGOING" or live.game.current_player_turn != turn:
+        return
+
+    game = live.game
+    cycle = turn % game.game_data.max_players
+    row = next((r for r in live.rows.values() if r.turn_number == cycle), None)
+
+    # with less than max_players, some turns
+    # don't belong to anyone. Those are skipped
+    # (and count as running out, so a round is
+    # always max_players turns)
+    if row is None:
+        live.next_turn()
+        game.timeouts += 1
+        schedule_turn(game)
+        live.mark_dirty()
+        return
+
+    live.restore_turn_start()
+
+    if game.table.pool_size() > 0:
+        live.draw_tile(row)
+
+    GameController.finish_turn(live, row.user_id, timed_out=True)
+
+    # the player's own hand changed too, so this isn't
+    # a "move" that clients could apply by themselves
+    BROADCASTER.publish(game_id, "timeout", GameController.move_delta(live, row.user_id))
+
 
-# initializing the ONGOING GAMES
-# list to hold all ongoing games
-ongoing = run_db_command(con, command="SELECT gameID FROM games WHERE gameState == 'ONGOING';")
+TURN_TIMER = TurnTimer(expire_turn)
 
-for x in ongoing:
-    # get the first of each item from the list,
-    # because it always returns a list
-    ONGOING_GAMES.add(x[0])
+for game_id, turn, deadline in turn_deadlines:
+    TURN_TIMER.schedule(game_id, turn, deadline)
+
+
+########################
+# CONDITIONAL REQUESTS #
+########################
+
+# answers If-None-Match with a 304 before
+# the session is even loaded, see etags.py
+CONDITIONAL_GET = ConditionalGetMiddleware(session_cookie=SESSION_CONFIG.key)
+
+# builds each version of a board once, however
+# many players ask for it at the same time
+BOARDS = SingleFlight()
+
+async def game_version(game_id: str) -> tuple[str, int] | None:
+    """
+    The game's state and fingerprint, from the cache if it's
+    there and the games row otherwise (which is up to date
+    for anything that isn't cached, see GameCache._evict).
+    """
+    live = games.peek(game_id)
+    if live is not None:
+        return live.game.game_state, live.fingerprint.value
+
+    return await db.read(queries.game_version, game_id)
+
+
+async def game_etag(path_params: dict, _: str | None) -> str | None:
+    """
+    The ETag of /game/{game_id}, the same for everyone.
+    """
+    game_id = path_params["game_id"]
+    version = await game_version(game_id)
+    if version is None:
+        return None
+
+    return make_etag("game", game_id, version[1])
+
+
+async def board_etag(path_params: dict, session_id: str | None) -> str | None:
+    """
+    The ETag of /game/{game_id}/board, different for
+    each player since it has their hand in it.
+    """
+    game_id = path_params["game_id"]
+    version = await game_version(game_id)
+
+    # players join before a game starts, which
+    # doesn't change the fingerprint
+    if version is None or session_id is None or version[0] == "PREGAME":
+        return None
+
+    # the board says which event it's up to as well
+    return make_etag(
+        "board", game_id, version[1], session_id,
+        # boards show usernames but fingerprints don't include them
+        BROADCASTER.last_event_id(game_id), PROFILES.changes,
+    )
+
+
+###############
+# MAINTENANCE #
+###############
+
+# cleans up after everything in the background,
+# a batch at a time, see maintenance.py
+MAINTENANCE = Maintenance()
+
+
+async def sessions_gone(user_ids: list[str]) -> list[str]:
+    """
+    The ones whose sessions don't exist anymore.
+    (one lookup for all of them, see SQLiteStore.existing())
+    """
+    existing = await SESSION_STORE.existing(user_ids)
+    return [user_id for user_id in user_ids if user_id not in existing]
+
+
+async def remove_expired_sessions() -> int:
+    # the session store's expiry is indexed, so this is
+    # a few range deletes (of a batch each) no matter what
+    return await SESSION_STORE.delete_expired() or 0
+
+
+async def remove_old_games() -> int:
+    """
+    Deletes games that haven't been active
+    in DAYS_UNTIL_GAME_DELETED days.
+    (ended games are archived instead)
+    """
+    removed = 0
+    cutoff = int(time()) - DAYS_UNTIL_GAME_DELETED * ONE_DAY_IN_SECONDS
+
+    # lastActive is indexed, so SQLite finds the old games itself
+    async for batch in in_batches(lambda after, limit: db.read(queries.inactive_games, cutoff, after, limit)):
+        old_games = list()
+
+        for _, game_id in batch:
+            # the cached copy might have been played since it was saved
+            live = games.peek(game_id)
+            if live is not None and live.game.last_active >= cutoff:
+                continue
+
+            # end anyone's stream to it
+            BROADCASTER.close(game_id)
+            TURN_TIMER.cancel(game_id)
+            games.discard(game_id)
+            old_games.append(game_id)
+
+        if old_games:
+            # and their ingame rows with them
+            await db.write(queries.delete_games, old_games)
+            removed += len(old_games)
+
+    # ingame rows of games that were deleted
+    # before the rows went along with them
+    async for game_ids in in_batches(lambda after, limit: db.read(queries.ingame_game_ids, after, limit)):
+        missing = await db.read(queries.missing_game_ids, game_ids)
+
+        if missing:
+            await db.write(queries.delete_games, missing)
+            removed += len(missing)
+
+    return removed
+
+
+async def archive_ended_games() -> int:
+    """
+    Moves games that ended a while ago (and their ingame rows)
+    to the archive, see codec.encode_archive. That way games and
+    ingame only ever hold the games that are still around.
+    """
+    archived = 0
+    cutoff = int(time()) - SECONDS_UNTIL_GAME_ARCHIVED
+
+    async for batch in in_batches(lambda after, limit: db.read(queries.ended_games, cutoff, after, limit)):
+        # ended games are only cached until they're saved
+        game_ids = [game_id for _, game_id in batch if game_id not in games]
+        if not game_ids:
+            continue
+
+        game_rows, columns = await db.read(queries.games_by_ids, game_ids)
+        players = dict()
+        for row in map(codec.ingame_row_from_db, await db.read(queries.ingame_rows_by_games, game_ids)):
+            players.setdefault(row.game_id, list()).append(row)
+
+        # their profiles might be gone by the time anyone looks
+        usernames = await PROFILES.get_usernames(row.user_id for rows in players.values() for row in rows)
+
+        # archived and deleted in the same transaction,
+        # so a game is always in exactly one of the two
+        changes = queries.UnitOfWork()
+        for game in (codec.game_from_row(row, columns) for row in game_rows):
+            rows = players.get(game.id, [])
+
+            # scores are only ever worked out at the end
+            for row in rows:
+                row.hand.update_score()
+
+            record = codec.encode_archive(game, rows, usernames)
+            queries.insert_archive(changes, game.id, game.last_active, record, [row.user_id for row in rows])
+
+        queries.delete_games(changes, game_ids)
+        await db.write(changes.flush)
+        archived += len(game_ids)
+
+    return archived
+
+
+async def remove_leftover_players() -> int:
+    """
+    Takes players whose sessions have expired out
+    of their games, and deletes their profiles
+    once they aren't in any.
+    """
+    removed = 0
+
+    async for user_ids in in_batches(lambda after, limit: db.read(queries.ingame_user_ids, after, limit)):
+        gone = await sessions_gone(user_ids)
+
+        if gone:
+            # games being played (i.e. cached) keep their players,
+            # the game still has them and would be left without.
+            # ended games keep theirs until they're archived
+            removed += await db.write(queries.delete_players, gone, games.game_ids())
+
+    # only the profiles of players that aren't in a game, so ended
+    # games still have their usernames when they're archived
+    async for user_ids in in_batches(lambda after, limit: db.read(queries.profile_user_ids, after, limit)):
+        gone = await sessions_gone(user_ids)
+
+        if gone:
+            await PROFILES.forget(gone)
+            removed += len(gone)
+
+    return removed
+
+
+MAINTENANCE.add("expired_sessions", EXPIRED_SESSIONS_INTERVAL, remove_expired_sessions)
+MAINTENANCE.add("old_games", OLD_GAMES_INTERVAL, remove_old_games)
+MAINTENANCE.add("leftover_players", LEFTOVER_PLAYERS_INTERVAL, remove_leftover_players)
+MAINTENANCE.add("archive", ARCHIVE_INTERVAL, archive_ended_games)
 
 
 ###############################
@@ -165,16 +535,9 @@ async def is_authenticated(req: Request):
         return False
 
     # if the client has a session not on the server side
-    # NOTE: this throws an error because it's not awaited,
-    # but I really don't know how they expect me to do this
-    exists = await SESSION_FILE_STORE.exists(req.get_session_id())
-
-    if exists:
-        return True
-    else:
-        # delete expired in case it's an expired session
-        SESSION_FILE_STORE.delete_expired()
-        return False
+    # (only asks the store every so often, see authcache.py)
+    # (expired sessions are deleted in the background, see MAINTENANCE)
+    return await AUTH_CACHE.check(req.get_session_id())
 
 
 ##########################
@@ -213,13 +576,7 @@ class GameController(Controller):
         game = Game()
 
         # then, add it to the database
-        insert_into_table(
-            con=con,
-            table_name="games",
-            data=game.db_list(),
-        )
-
-        ONGOING_GAMES.add(game.id)
+        await db.write(queries.insert_game, game)
 
         # TODO: handle custom settings if the client
         # adds them here? For the time being,
@@ -236,7 +593,7 @@ class GameController(Controller):
     # but can be in any state
     #####
 
-    @get(path="/{game_id:str}")
+    @get(path="/{game_id:str}", opt={"etag": game_etag})
     async def get_game(self, request: Request, game_id: str) -> Game | dict:
         """
         Returns most information about a game,
@@ -252,37 +609,28 @@ class GameController(Controller):
         auth = await is_authenticated(request)
         await authed(auth)
 
-        data, columns = get_game_data(con, game_id)
+        live = await games.get(game_id)
 
         # if no data is found for the game ID,
         # the game does not exist; return a 404
-        if data is None:
+        if live is None:
             raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="There is no game with that ID.")
-        elif columns is None:
-            logger.critical("Game data received from database is not None but columns returns None.")
-            raise HTTPException(status_code=500, detail="There seems to be an issue with the database. Code: game-columns")
 
         # preparing a dictionary so the
         # data sent to the client is more
         # verbose and easier to parse through
-        # instead of just a list
-        dictionary = dict()
-
-        for i, cl in enumerate(columns):
-            # only converts the item in the list
-            # to JSON if it's valid JSON
-            # (i.e., not a string such as a UUID or game state)
-            try:
-                dictionary[cl] = json.loads(data[i])
-            except JSONDecodeError:
-                dictionary[cl] = data[i]
+        # (same as the games row)
+        dictionary = codec.game_to_dict(live.game)
 
         # NOTE: DELETES THE POOL
         # the client should not see
         # what tiles remain, so
         # this removes them from the dict
         # before sending it out.
-        del dictionary["tableContents"]["pool"]
+        dictionary["tableContents"].pop("pool", None)
+        # the seed of a shuffled pool gives
+        # the pool away just the same
+        dictionary["tableContents"].pop("seed", None)
 
         return dictionary
 
@@ -298,7 +646,7 @@ class GameController(Controller):
 
         # --------------------
         # getting player data from the server
-        players = get_players_in_game(con, game_id)
+        players = await db.get_players_in_game(game_id)
         session_id = request.get_session_id()
 
         # NOTE: this returns an AUTH ALSO
@@ -326,17 +674,16 @@ class GameController(Controller):
         # --------------------
         # db game to object
 
-        # grabbing the game data
-        # both game_str and columns should be lists
-        game_str, columns = get_game_data(con, game_id)
+        # (games that haven't started aren't cached,
+        # so this comes straight from the database)
+        live = await games.get(game_id)
 
-        # if the game or columns don't exist
-        if game_str is None or columns is None:
+        # if the game doesn't exist
+        if live is None:
             raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="There is no game with that ID.")
 
         # get game details
-        game = Game()
-        game.construct_from_db(game_str, columns)
+        game = live.game
 
         if game.game_state != "PREGAME":
             raise HTTPException(
@@ -350,29 +697,22 @@ class GameController(Controller):
                 detail="The server failed to start the game! Please try creating a new one!"
             )
 
-        ingame_rows = run_db_command(
-            con=con,
-            command=f"SELECT * FROM ingame WHERE gameID == '{game_id}';"
-        )
-
         game.game_state = "ONGOING"
         # --------------------
 
         # --------------------
         # grabbing the rows from Ingame
-        rows = list()
-
-        for igr in ingame_rows:
-            # create a dummy row
-            row = IngameRow(0, 0, "0", 0,)
-            row.construct_from_db(igr)
-            rows.append(row)
+        rows = list(live.rows.values())
 
         # modifying the rows
         rows = shuffle(rows)
         hands = game.dole_out_hands(rows)
         row_to_send = None
 
+        # every row and the game are saved together,
+        # see queries.UnitOfWork
+        changes = queries.UnitOfWork()
+
         # ----------------
         # saving changed rows to db
         for i, row in enumerate(rows):
@@ -380,22 +720,37 @@ class GameController(Controller):
             if row.user_id == session_id:
                 row_to_send = row
 
-            update_db(
-                con=con,
-                command=f"UPDATE ingame SET turnNumber = {row.turn_number}, hand = '{row.hand}' WHERE userID == '{row.user_id}';"
-            )
+            queries.set_turn_and_hand(changes, game_id, row.user_id, row.turn_number, row.hand)
 
         # ----------------
         # saving changed game to db
-        today = datetime.date(datetime.now())
-        update_db(
-            con=con,
-            command=f"UPDATE games SET gameState = '{game.game_state}', lastActive = '{today}', tableContents = '{game.table}', currentPlayerTurn = {game.current_player_turn + 1} WHERE gameID == '{game.id}';"
-        )
+        game.current_player_turn += 1
+        game.last_active = int(time())
+        # the first turn's deadline is saved along with it
+        game.turn_deadline = turn_deadline(game)
+        fingerprint = Fingerprint.of(game, rows)
+        queries.save_game(changes, game, fingerprint.value)
+
+        # starting is saved right away, from here on the game
+        # lives in the cache. Everything above happened on a copy
+        # read from the database, so if anyone else started the
+        # game (or joined it) in the meantime, none of it is saved
+        # (see queries.start_game) and this start doesn't count
+        if not await db.write(queries.start_game, game_id, len(rows), changes):
+            raise HTTPException(
+                status_code=status_codes.HTTP_409_CONFLICT,
+                detail="The game has been already started!"
+            )
+
+        games.add(game, rows, fingerprint)
 
-        ONGOING_GAMES.add(game_id)
+        if game.turn_deadline is not None:
+            TURN_TIMER.schedule(game_id, game.current_player_turn, game.turn_deadline)
 
-        self.notify_clients_without_turn_increment(request, game_id, message="start")
+        await self.notify_clients_without_turn_increment(request, game_id, message="start", data={
+            "current_player_turn": game.current_player_turn,
+            "pool_size": game.table.pool_size(),
+        })
 
         return row_to_send
 
@@ -407,29 +762,14 @@ class GameController(Controller):
         auth = await is_authenticated(request)
         await authed(auth)
 
-        player_sessions = get_players_in_game(con, game_id)
+        player_sessions = await db.get_players_in_game(game_id)
 
         if player_sessions is not None and len(player_sessions) >= 1:
-            players = list()
-            for session in player_sessions:
-                # this has multiple steps:
-                # 1. get session contents
-                # 2. convert from bytes to dict
-                # 3. get the username from the dict
-                username = await SESSION_BACKEND.get(session, SESSION_FILE_STORE)
-                # if there isn't a session anymore,
-                # skip this user.
-                if username is None:
-                    continue
-
-                try:
-                    username = json.loads(username)["username"]
-                except KeyError:
-                    # if there somehow isn't a username,
-                    # just skip them
-                    # NOTE: keep an eye on this.
-                    continue
-                players.append(username)
+            # one lookup for all of them, see profiles.py.
+            # players without a username (or a session
+            # anymore) aren't in it, so they're skipped
+            usernames = await PROFILES.get_usernames(player_sessions)
+            players = [usernames[session] for session in player_sessions if session in usernames]
             return players
         else:
             return []
@@ -457,7 +797,7 @@ class GameController(Controller):
             "detail": "That game does not exist."
         }
 
-        first_resulting_game = get_game_data(con, game_id)[0]
+        first_resulting_game = (await db.get_game_data(game_id))[0]
 
         if first_resulting_game is None:
             raise HTTPException(**does_not_exist)
@@ -470,19 +810,13 @@ class GameController(Controller):
         if not game_exists:
             raise HTTPException(**does_not_exist)
 
-        current_game_players = get_players_in_game(con=con, gameID=game_id)
+        current_game_players = await db.get_players_in_game(game_id)
 
-        game_state = run_db_command(
-            con=con,
-            command=f"SELECT gameState FROM games WHERE gameID == '{game_id}';"
-        )
+        game_state = await db.read(queries.game_state, game_id)
 
         # if the game doesn't exist, this doesn't really matter
-        if len(game_state) < 1:
+        if game_state is None:
             game_state = "NONEXISTANT"
-        # otherwise, get its state
-        else:
-            game_state = game_state[0][0]
 
         at_max_players = len(current_game_players) >= MAX_POSSIBLE_PLAYERS
 
@@ -491,23 +825,32 @@ class GameController(Controller):
         # ONLY IF THE GAME IS IN THE PREGAME STATE; other game states
         # such as ONGOING or ENDED shouldn't allow them to join, for obvious reasons
         if not at_max_players and game_exists and (request.get_session_id() not in current_game_players) and (game_state == "PREGAME"):
-            insert_into_table(
-                con,
-                "ingame",
-                [
-                    # "userID" in the ER diagram
-                    request.get_session_id(),
-                    game_id,
-                    # this (turnNumber) actually doesn't matter right now
-                    0,
-                    Hand()
-                ]
+            # all of that is checked again while they're added, in
+            # case the game filled up or started in the meantime
+            joined = await db.write(
+                queries.join_game,
+                # "userID" in the ER diagram
+                request.get_session_id(),
+                game_id,
+                # this (turnNumber) actually doesn't matter right now
+                0,
+                Hand(),
+                MAX_POSSIBLE_PLAYERS,
             )
-            return {
-                "status_code": status_codes.HTTP_200_OK,
-                "detail": "Success"
-            }
-        elif not game_exists:
+
+            if joined:
+                return {
+                    "status_code": status_codes.HTTP_200_OK,
+                    "detail": "Success"
+                }
+
+            # it did, so look again to tell them which
+            current_game_players = await db.get_players_in_game(game_id)
+            game_state = await db.read(queries.game_state, game_id) or "NONEXISTANT"
+            game_exists = game_state != "NONEXISTANT"
+            at_max_players = len(current_game_players) >= MAX_POSSIBLE_PLAYERS
+
+        if not game_exists:
             raise HTTPException(**does_not_exist)
         elif game_state != "PREGAME" and game_state != "NONEXISTANT":
             raise HTTPException(
@@ -540,80 +883,133 @@ class GameController(Controller):
     # games that already exist and are ongoing
     ######
 
-    async def increment_turn(self, game_id) -> None:
-        """
-        Increments the turn for the given game ID.
-        """
-        update_db(
-            con=con,
-            command=f"UPDATE games SET currentPlayerTurn = currentPlayerTurn + 1 WHERE gameID == '{game_id}';"
-        )
-
-    async def notify_clients_without_turn_increment(self, _: Request, game_id: str, message: str = "move") -> None:
+    async def notify_clients_without_turn_increment(
+        self,
+        _: Request,
+        game_id: str,
+        message: str = "move",
+        data: dict | None = None,
+    ) -> None:
         """
         Notifies clients **without** incrementing the turn counter
         that a change has been made in a game. Useful for starting
         games and similar situations.
 
-        Message: the message to be sent to the client.
+        Message: the type of event sent to the client.
+        Data: what changed, if anything.
         """
-        # in case I forgot to add it, add it to the set
-        # shouldn't create a duplicate because it's a set
-        ONGOING_GAMES.add(game_id)
-
-        if game_id not in QUEUES:
-            QUEUES[game_id] = asyncio.Queue()
-
-        await QUEUES[game_id].put(message)
+        BROADCASTER.publish(game_id, message, data)
 
-    async def notify_clients_of_move(self, req: Request, game_id: str) -> None:
+    async def notify_clients_of_move(self, req: Request, game_id: str, delta: dict, won: bool = False) -> None:
         """
-        Adds a message to the queue for the given game ID.
-        To be used to notify clients that a move has been completed.
+        Sends the changes a move made (see move_delta())
+        to every client in the given game.
 
-        NOTE: **Increments the turn counter for the game given.**
+        NOTE: the turn counter (and the game ending, if
+        the move won it) is saved with the move itself,
+        see finish_turn(). This only tells the clients.
         """
         # update the clients
-        ONGOING_GAMES.add(game_id)
+        BROADCASTER.publish(game_id, "move", delta)
 
-        if game_id not in QUEUES:
-            QUEUES[game_id] = asyncio.Queue()
+        if won:
+            # the player who won is whoever's turn it ends on
+            await self.notify_clients_without_turn_increment(req, game_id, "end", {"winner": delta["player"]})
+            # and end everyone's stream (once they get the "end")
+            BROADCASTER.close(game_id)
 
-        await QUEUES[game_id].put("move")
+    @staticmethod
+    async def get_live_game(game_id: str, session_id: str) -> tuple[LiveGame, IngameRow]:
+        """
+        Returns the (cached) ongoing game and the
+        player's ingame row, if they're playing in it.
+        """
+        live = await games.get(game_id)
 
-        # update the game turn
-        self.increment_turn(game_id)
+        # NOTE: this returns an AUTH ALSO
+        # spent some time debugging this
+        # if the user isn't in the game, tell them
+        if live is None or session_id not in live.rows:
+            raise HTTPException(
+                status_code=status_codes.HTTP_403_FORBIDDEN,
+                detail="User is not a part of this game or the game does not exist."
+            )
 
-        if self.check_for_win(req, game_id):
-            # update the game to be ended
-            update_db(
-                con=con,
-                command=f"UPDATE game SET gameState = 'ENDED' WHERE gameID == '{game_id}';"
+        if live.game.game_state != "ONGOING":
+            raise HTTPException(
+                status_code=status_codes.HTTP_409_CONFLICT,
+                detail="The game isn't being played."
             )
-            # the player who won is whoever's turn it ends on
-            await self.notify_clients_without_turn_increment(req, game_id, "end")
-            # remove it from ongoing games
-            ONGOING_GAMES.remove(game_id)
 
-    async def check_for_win(self, req: Request, game_id: str) -> bool:
+        return live, live.rows[session_id]
+
+    @staticmethod
+    def move_delta(live: LiveGame, session_id: str, old_groups: tuple[Group, ...] | None = None) -> dict:
+        """
+        What a move by the player changed, for the clients
+        to apply to their copy of the board instead of
+        grabbing all of it again.
+
+        If the table was changed, old_groups should be
+        the groups from before; only the ones that are
+        different now get sent (by index).
         """
-        Check if a player has won the game or not.
-        One wins by emptying their hand of all tiles.
+        game = live.game
+        row = live.rows[session_id]
+
+        delta = {
+            # players are only ever shown by turn number
+            "player": row.turn_number,
+            "len_tiles": len(row.hand.tiles),
+            "pool_size": game.table.pool_size(),
+            "current_player_turn": game.current_player_turn,
+            "game_state": game.game_state,
+        }
+
+        if old_groups is not None:
+            groups = game.table.groups
+            delta["group_count"] = len(groups)
+            delta["groups"] = {
+                i: codec.group_to_dict(group)
+                for i, group in enumerate(groups)
+                if i >= len(old_groups) or group != old_groups[i]
+            }
+
+        return delta
+
+    @staticmethod
+    def finish_turn(live: LiveGame, session_id: str, timed_out: bool = False) -> bool:
         """
-        user_id = req.get_session_id()
+        Ends the player's turn: the turn counter goes up
+        and, if the player emptied their hand of all tiles
+        (i.e. won), the game ends. Otherwise the next
+        turn's timer starts.
 
-        hand_str = run_db_command(
-            con=con,
-            command=f"SELECT hand FROM ingame WHERE userID == '{user_id}' AND gameID == '{game_id}';"
-        )[0]
+        timed_out: the turn ran out instead of being played
+        (see expire_turn()), which isn't activity.
 
-        hand = Hand()
-        hand.construct_from_db(hand_str)
+        Returns whether they won.
+        """
+        game = live.game
+        won = len(live.rows[session_id].hand.tiles) == 0
+
+        live.next_turn("ENDED" if won else None)
 
-        if len(hand.tiles) == 0:
-            return True
+        if timed_out:
+            game.timeouts += 1
         else:
-            return False
+            game.timeouts = 0
+            game.last_active = int(time())
+
+        if won:
+            game.turn_deadline = None
+            TURN_TIMER.cancel(game.id)
+        else:
+            live.turn_start = game.table.snapshot()
+            schedule_turn(game)
+
+        live.mark_dirty(session_id)
+        return won
 
     @put("/{game_id:str}/groups")
     async def make_groups(self, request: Request, game_id: str, data: Table) -> Hand:
@@ -627,45 +1023,18 @@ class GameController(Controller):
         auth = await is_authenticated(request)
         await authed(auth)
 
-        for group in data.groups:
-            if not group.is_valid():
-                raise HTTPException(
-                    status_code=status_codes.HTTP_400_BAD_REQUEST,
-                    detail="At least one group is invalid!"
-                )
-
         # -----------------------
         # player validation
-        players = get_players_in_game(con, game_id)
         session_id = request.get_session_id()
-
-        # NOTE: this returns an AUTH ALSO
-        # spent some time debugging this
-        # if the user isn't in the game, tell them
-        if session_id not in players:
-            raise HTTPException(
-                status_code=status_codes.HTTP_403_FORBIDDEN,
-                detail="User is not a part of this game or the game does not exist."
-            )
+        live, ingame_row = await self.get_live_game(game_id, session_id)
+        game = live.game
         # ------------------------
 
         # ------------------------
         # make sure it's the player's turn
-        ingame_from_db = run_db_command(
-            con=con,
-            command=f"SELECT turnNumber, hand FROM ingame WHERE gameID == '{game_id}' AND userID == '{session_id}';"
-        )[0]
-
-        hand_from_db = Hand()
-        player_hand_str = ingame_from_db[1]
-        hand_from_db.construct_from_db(player_hand_str)
-
-        game_str, _ = get_game_data(con, game_id)
-        game = Game()
-        game.construct_from_db(game_str)
 
         # section copied from draw_tile()
-        this_players_turn = ingame_from_db[0]
+        this_players_turn = ingame_row.turn_number
 
         # for explanation of cycle, ctrl + F cycle
         cycle = game.current_player_turn % game.game_data.max_players
@@ -678,74 +1047,68 @@ class GameController(Controller):
         # end of section
         # -------------------------
 
+        # validated against this game's tile range, which
+        # is why it has to happen after the game is loaded.
+        # (only the groups that are new to this game, see LiveGame)
+        proposed_groups = live.validate_groups(data.groups)
+        if proposed_groups is None:
+            raise HTTPException(
+                status_code=status_codes.HTTP_400_BAD_REQUEST,
+                detail="At least one group is invalid!"
+            )
+
         # -------------------------
         # more data validation
 
-        # check the difference between
-        # the proposed table and the current table
-        # and see if we can "make up" that
-        # difference with tiles in their hand
-
-        # all tiles in the new groups that are NOT in the old groups
-        new_tiles_diff = [x for x in data.groups if x not in game.table.groups]
-
-        new_table_total_tiles = 0
-        old_table_total_tiles = 0
-
-        # set the variables to their correct amounts
-        for group in game.table.groups:
-            old_table_total_tiles += len(group.tiles)
-        for group in data.groups:
-            new_table_total_tiles += len(group.tiles)
+        # the difference between the proposed table and the
+        # current one, tile by tile (see tablediff.py), and
+        # whether their hand can "make up" that difference
+        diff = diff_table(game.table.groups, proposed_groups, ingame_row.hand.tiles)
 
         # if there are tiles that were on the old table but not the new one
-        if new_table_total_tiles < old_table_total_tiles:
+        if diff.missing:
             raise HTTPException(
                 status_code=status_codes.HTTP_400_BAD_REQUEST,
                 detail="The table provided is missing pieces. You're tweaking with requests, aren't you?\
                     Your IP address has been noted."  # it hasn't been. This is just to dissuade people
             )
-        # if they are the same in length, either no tiles were placed
-        # or some were placed and some were (at least attempted to be) "picked up"
-        elif new_table_total_tiles == old_table_total_tiles:
+        # only rearranged (or nothing changed at all)
+        if not diff.added:
             raise HTTPException(
                 status_code=status_codes.HTTP_409_CONFLICT,
                 detail="User has to place down at least one tile."
             )
 
         # ALL new tiles MUST be from the user's hand
-        for tile in new_tiles_diff:
-            if tile not in hand_from_db.tiles:
-                raise HTTPException(
-                    status_code=status_codes.HTTP_403_FORBIDDEN,
-                    detail=f"User does not have all of the required tiles: {new_tiles_diff}"
-                )
-
-            # remove the tile with that number/color
-            # from their hand so it won't be referenced again
-            # i.e. "use" the tile
-            hand_from_db.tiles.remove(tile)
+        if diff.not_in_hand:
+            raise HTTPException(
+                status_code=status_codes.HTTP_403_FORBIDDEN,
+                detail=f"User does not have all of the required tiles: {diff.not_in_hand}"
+            )
+
+        # a new hand, so that the cached hand is only
+        # changed if the whole move turns out valid
+        hand_from_db = Hand(score=ingame_row.hand.score, tiles=diff.remaining_hand)
 
         # --------------------------
-        # add to game table
-        game.table.groups.append(group)
+        # the proposed groups become the table's.
+        # nothing was changed before this point, so a
+        # move that isn't valid leaves the table as it was.
+        # (the old groups are kept for the clients, see move_delta)
+        #
+        # this updates the (cached) game to reflect these changes,
+        # they're saved to the database with the next flush
+        old_groups = live.place_groups(ingame_row, proposed_groups, hand_from_db, diff.added.codes)
         # --------------------------
 
-        # --------------------------
-        # update the database to reflect these changes
-        # update game table
-        update_db(
-            con=con,
-            command=f"UPDATE game SET tableContents = '{game.table}' WHERE gameID == '{game_id}';"
-        )
+        won = self.finish_turn(live, session_id)
 
-        # update ingame table to reflect hand
-        update_db(
-            con=con,
-            command=f"UPDATE ingame SET hand = '{hand_from_db}' WHERE gameID == '{game_id}' AND userID == '{session_id}';"
-        )
+        # a finished game is saved right away
+        if won:
+            await games.flush(game_id)
 
-        self.notify_clients_of_move(request, game_id=game_id)
+        delta = self.move_delta(live, session_id, old_groups)
+        await self.notify_clients_of_move(request, game_id=game_id, delta=delta, won=won)
         return hand_from_db
 
     @put("/{game_id:str}/ping")
@@ -758,7 +1121,7 @@ class GameController(Controller):
 
         TODO NOTE: DELETE
         """
-        await self.notify_clients_without_turn_increment(request, game_id)
+        await self.notify_clients_without_turn_increment(request, game_id, "ping")
 
     @put("/{game_id:str}/draw")
     async def draw_tile(self, request: Request, game_id: str) -> Hand:
@@ -771,50 +1134,18 @@ class GameController(Controller):
 
         # --------------------
         # player validation
-        players = get_players_in_game(con, game_id)
         session_id = request.get_session_id()
-
-        # NOTE: this returns an AUTH ALSO
-        # spent some time debugging this
-        # if the user isn't in the game, tell them
-        if session_id not in players:
-            raise HTTPException(
-                status_code=status_codes.HTTP_403_FORBIDDEN,
-                detail="User is not a part of this game or the game does not exist."
-            )
-
-        # --------------------
+        live, ingame_row = await self.get_live_game(game_id, session_id)
+        game = live.game
 
         # --------------------
-        # db game to object
-
-        # grabbing the game data
-        # both game_str and columns should be lists
-        game_str, columns = get_game_data(con, game_id)
-
-        # if the game or columns don't exist
-        if game_str is None or columns is None:
-            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="There is no game with that ID.")
-
-        game = Game()
-        game.construct_from_db(game_str, columns)
 
-        if len(game.table.pool) <= 0:
+        if game.table.pool_size() <= 0:
             raise HTTPException(status_code=status_codes.HTTP_410_GONE, detail="There are no tiles left in the pool!")
 
-        # ----------------------
-
-        # ----------------------
-        # db hand to hand object
-
-        ingame_row = run_db_command(
-            con=con,
-            command=f"SELECT * FROM ingame WHERE gameID == '{game_id}' AND userID == '{session_id}';"
-        )
-
         # to validate that it is, in fact, the
         # player's turn before giving them a tile
-        current_turn = ingame_row[0][2]
+        current_turn = ingame_row.turn_number
 
         # cycle = whoever's turn it SHOULD be
         # e.g. if it's turn 20, then whoever has
@@ -825,45 +1156,24 @@ class GameController(Controller):
         if cycle != current_turn:
             raise HTTPException(status_code=status_codes.HTTP_403_FORBIDDEN, detail="It is isn't your turn!")
 
-        # if user isn't in that game or the
-        # game doesn't exist period
-        if len(ingame_row) <= 0:
-            raise HTTPException(
-                status_code=status_codes.HTTP_404_NOT_FOUND,
-                detail="The game and user pair does not exist."
-            )
-
-        hand = Hand()
-
-        # get the first item from the list of ingame rows
-        # and then get the last item in the list, the Hand
-        hand.construct_from_db(ingame_row[0][3])
+        hand = ingame_row.hand
 
         # draw a tile from the game's pool and put
         # it into the player's hand
-        hand.tiles.append(game.draw_tile())
+        live.draw_tile(ingame_row)
 
         # --------------------------
-        # appending changes to database
-
-        # update the game
-        today = datetime.date(datetime.now())
-        run_db_command(
-            con=con,
-            command=f"UPDATE games SET lastActive = '{today}', tableContents = '{game.table}', currentPlayerTurn = {game.current_player_turn + 1} WHERE gameID == '{game.id}';"
-        )
-
-        # update the hand
-        run_db_command(
-            con=con,
-            command=f"UPDATE ingame SET hand = '{hand}';"
-        )
+        # appending changes to the (cached) game,
+        # they're saved with the next flush.
+        # drawing is the whole turn, so this moves it on
+        self.finish_turn(live, session_id)
 
         # have to calle this manually because
         # if I have it called "after_response"
-        # it'll call and increment the turn even if this fails
+        # it'll call even if this fails
         # as well as add the game_id to ongoing games
-        await self.notify_clients_of_move(request, game_id=game_id)
+        delta = self.move_delta(live, session_id)
+        await self.notify_clients_of_move(request, game_id=game_id, delta=delta)
 
         return hand
 
@@ -881,7 +1191,9 @@ class GameController(Controller):
         auth = await is_authenticated(request)
         await authed(auth)
 
-        if game_id not in ONGOING_GAMES:
+        # games that ended don't have anything left to send
+        live = await games.get(game_id)
+        if live is None or live.game.game_state == "ENDED":
             raise HTTPException(
                 status_code=status_codes.HTTP_404_NOT_FOUND,
                 detail=f"A game with ID {game_id} does not exist."
@@ -890,11 +1202,10 @@ class GameController(Controller):
         # player validation
         # now verifies if they are in the game
         # ---------------------
-        players = get_players_in_game(con, game_id)
         session_id = request.get_session_id()
 
         # if the user isn't in the game, tell them
-        if session_id not in players:
+        if session_id not in live.rows:
             raise HTTPException(
                 status_code=status_codes.HTTP_403_FORBIDDEN,
                 detail="The game does not exist or you have not joined it!"
@@ -902,10 +1213,21 @@ class GameController(Controller):
         # ----------------------
         # end player validation
 
-        if QUEUES.get(game_id) is None:
-            QUEUES[game_id] = asyncio.Queue()
+        # sent by clients reconnecting after losing the
+        # connection, so they only get what they missed
+        # ("<epoch>:<seq>", see broadcast.py)
+        last_event_id = request.headers.get("last-event-id")
 
-        q: asyncio.Queue = QUEUES[game_id]
+        # subscribed here so going over the limits is a proper
+        # error. If the stream never starts, the reaper in
+        # broadcast.py closes the subscription eventually
+        try:
+            subscription = BROADCASTER.subscribe(game_id, last_event_id, owner=session_id)
+        except StreamLimitReached as e:
+            raise HTTPException(
+                status_code=status_codes.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e),
+            )
 
         async def sse():
             """
@@ -913,14 +1235,30 @@ class GameController(Controller):
             of Server Side Events (SSEs)
             to the client and await further.
             """
-            while game_id in ONGOING_GAMES:
-                data = await q.get()
-                yield ServerSentEventMessage(data)
+            # always unsubscribed, even when the client disconnects
+            # (that cancels this generator, hence the finally)
+            try:
+                async for event in subscription:
+                    # just a comment line, clients ignore it. If the
+                    # client is gone, sending it fails and ends this
+                    if event is HEARTBEAT:
+                        yield ServerSentEventMessage(comment="heartbeat")
+                        continue
+
+                    # the epoch and sequence number go in the data
+                    # as well, so clients don't have to rely on the id
+                    yield ServerSentEventMessage(
+                        data=codec.dumps({"epoch": event.epoch, "seq": event.seq, **event.data}),
+                        event=event.event,
+                        id=event.id,
+                    )
+            finally:
+                subscription.close()
 
         return ServerSentEvent(sse())
 
-    @get("/{game_id:str}/board")
-    async def board_info(self, request: Request, game_id: str) -> dict:
+    @get("/{game_id:str}/board", opt={"etag": board_etag})
+    async def board_info(self, request: Request, game_id: str) -> Response:
         """
         Returns the board info and user's hand
         if they are authenticated.
@@ -928,106 +1266,115 @@ class GameController(Controller):
         auth = await is_authenticated(request)
         await authed(auth)
 
-        usernames = get_players_in_game(con, game_id)
+        live = await games.get(game_id)
         session_id = request.get_session_id()
 
         # NOTE: this returns an AUTH ALSO
         # spent some time debugging this
         # if the user isn't in the game, tell them
-        if session_id not in usernames:
+        if live is None or session_id not in live.rows:
             raise HTTPException(
                 status_code=status_codes.HTTP_403_FORBIDDEN,
                 detail="User is not a part of this game or the game does not exist."
             )
 
-        # grabbing the game data
-        # both game_str and columns should be lists
-        game_str, columns = get_game_data(con, game_id)
+        # encoded right away, before anything can change it
+        hand = encode_json(live.rows[session_id].hand, SERIALIZER)
+
+        # everything else is the same for every player, and they
+        # all ask for it right after each move, so only one of them
+        # actually builds it, JSON and all (see singleflight.py).
+        # The key is the version of the board, so nobody gets an
+        # older one (a newer one is fine, it says what it's up to)
+        key = (
+            game_id, live.fingerprint.value,
+            BROADCASTER.last_event_id(game_id), PROFILES.changes,
+        )
+        board = await BOARDS.do(key, lambda: self.shared_board(live, game_id))
 
-        # if the game or columns don't exist
-        if game_str is None or columns is None:
-            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="There is no game with that ID.")
+        # the hand goes in front of the rest of the board's object
+        return Response(
+            content=b'{"status_code":200,"hand":' + hand + b"," + board[1:],
+            media_type=MediaType.JSON,
+        )
 
-        game = Game()
-        game.construct_from_db(game_str, columns)
-        pool_size = len(game.table.pool)
+    @staticmethod
+    def board_snapshot(live: LiveGame, game_id: str) -> dict:
+        """
+        The parts of the board that come from the game itself,
+        as they are right now. (cheap, it's all copies of references)
+        """
         # remove the pool before sending it to the client
         # I *could* make a DTO but I feel like that'd needlessly
         # duplicate all other data; it's not like half of the values
         # are sent to client, it's all data, just without the pool
         # specifically, so I think this is wisest, at least for now
+        # (on a copy, the cached game keeps its pool)
+        # moves can happen while the usernames are being looked
+        # up, but they replace the groups tuple of the
+        # cached table instead of changing it, so this copy
+        # stays what the board is at
+        game = copy.copy(live.game)
+        game.table = copy.copy(game.table)
         del game.table.pool
+        # same goes for the seed of a shuffled pool
+        game.table.seed = None
 
-        ingame_row = run_db_command(
-            con=con,
-            command=f"SELECT * FROM ingame WHERE gameID == '{game_id}' AND userID == '{session_id}';"
-        )
-
-        # if user isn't in that game or the
-        # game doesn't exist period
-        if len(ingame_row) <= 0:
-            raise HTTPException(
-                status_code=status_codes.HTTP_404_NOT_FOUND,
-                detail="The game and user pair does not exist."
-            )
-
-        hand = Hand()
+        # the hand size and turn number of each player in
+        # the game, by session (the usernames come later)
+        player_sessions = dict()
+        for user_id, row in live.rows.items():
+            # set the session as the key
+            # and the important information as the values
+            player_sessions[user_id] = {
+                "len_tiles": len(row.hand.tiles),
+                "turn_number": row.turn_number,
+            }
 
-        # get the first item from the list of ingame rows
-        # and then get the last item in the list, the Hand
-        hand.construct_from_db(ingame_row[0][3])
+        return {
+            "game": game,
+            "player_sessions": player_sessions,
+            # for rendering it properly
+            "pool_size": live.game.table.pool_size(),
+            # the last event this board includes, so the client
+            # knows which events to apply on top of it
+            # (and which numbering that is, see broadcast.py)
+            "epoch": BROADCASTER.epoch(game_id),
+            "seq": BROADCASTER.sequence(game_id),
+        }
 
+    @staticmethod
+    async def shared_board(live: LiveGame, game_id: str) -> bytes:
+        """
+        Everything on the board besides the player's
+        own hand as a JSON object, see board_info().
+        """
+        snapshot = GameController.board_snapshot(live, game_id)
 
         # ------------------------------
-        # getting the hand size and username
+        # getting the username
         # of each player in the current game
 
-        hand_rows = run_db_command(
-            con=con,
-            command=f"SELECT userID, hand, turnNumber FROM ingame WHERE gameID == '{game_id}';"
-        )
-
-        player_sessions = dict()
-        for i, row in enumerate(hand_rows):
-            h = Hand()
-            # the first item 
-            # should be the userID (the sessionID)
-            # the second item should be the hand itself
-            h.construct_from_db(row[1])
-            # set the session as the key
-            # and the important information as the values
-            player_sessions[row[0]] = {
-                "len_tiles": len(h.tiles),
-                "turn_number": row[2],
-            }
-
+        player_sessions = snapshot["player_sessions"]
         player_hands = list()
 
         if player_sessions is not None and len(player_sessions) >= 1:
-            for session in player_sessions:
-                # get the username from server session storage
-                username = await SESSION_BACKEND.get(session, SESSION_FILE_STORE)
-
-                # if there isn't a session anymore,
-                # skip this user.
-                if username is None:
-                    continue
+            # all of them at once, see profiles.py
+            usernames = await PROFILES.get_usernames(player_sessions)
 
-                try:
-                    username = json.loads(username)["username"]
-                except KeyError:
-                    # if there somehow isn't a username,
-                    # just skip them
-                    # NOTE: keep an eye on this.
+            for session in player_sessions:
+                # if there isn't a session anymore (or there somehow
+                # isn't a username), skip this user.
+                # NOTE: keep an eye on this.
+                if session not in usernames:
                     continue
 
-
                 # this is a little confusing
                 # basically, append a dictionary to a list of dictionaries
                 # the list is each player and the dictionary containes information
                 # in the ingame row. The turn number can be used a psuedo-identifier
                 # to place the right amount of tiles with each person
-                player_hands.append({"username": username, **player_sessions[session]})
+                player_hands.append({"username": usernames[session], **player_sessions[session]})
 
         else:
             raise HTTPException(
@@ -1039,18 +1386,17 @@ class GameController(Controller):
         # done getting the hand size and usernames
         # ------------------------------
 
-        return {
-            "status_code": status_codes.HTTP_200_OK,
-            "game": game,
-            "hand": hand,
+        return encode_json({
+            "game": snapshot["game"],
             # should output a dictionary
             # of username : len(hand)
             # to help the client render
             # how many tiles each user has
             "player_data": player_hands,
-            # for rendering it properly
-            "pool_size": pool_size,
-        }
+            "pool_size": snapshot["pool_size"],
+            "epoch": snapshot["epoch"],
+            "seq": snapshot["seq"],
+        }, SERIALIZER)
 
 
 ########
@@ -1078,6 +1424,9 @@ class UserController(Controller):
         try:
             session = request.session
             session["username"] = username
+            # the session still has it, but everyone else's
+            # boards etc. look it up in the profiles
+            await PROFILES.set_username(request.get_session_id(), username)
             return {
                 "status_code": status_codes.HTTP_200_OK,
                 "detail": f"Your username was successfully set to {username}.",
@@ -1115,69 +1464,82 @@ class UserController(Controller):
         return default
 
 
-##################
-# GENERIC ROUTES #
-##################
+###########
+# ARCHIVE #
+###########
 
 
-@get("/")
-async def api_base_route() -> dict[str, str]:
+class ArchiveController(Controller):
     """
-    Returns a simple success message indicating the
-    API/server is functioning properly.
+    Games that ended a while ago, see archive_ended_games().
     """
-    return {"detail": "The API is up and running."}
+    path = "/archive"
 
+    @get("/")
+    async def list_archived_games(self, request: Request) -> list:
+        """
+        The archived games the user played in, latest first.
+        """
+        auth = await is_authenticated(request)
+        await authed(auth)
 
-@get("/clear")
-async def api_clear_sessions() -> None:
-    """
-    Clears sessions that have expired.
+        archived = await db.read(queries.archived_games_by_player, request.get_session_id())
+        return [{"gameID": game_id, "endedAt": ended_at} for game_id, ended_at in archived]
 
-    Also, removes users from games if their sesions have expired.
-    """
-    await SESSION_FILE_STORE.delete_expired()
+    @get("/{game_id:str}")
+    async def get_archived_game(self, request: Request, game_id: str) -> dict:
+        """
+        Everything about an archived game: the games row
+        and every player's final hand and score.
+        """
+        auth = await is_authenticated(request)
+        await authed(auth)
 
-    # get all games in ingame
+        record = await db.read(queries.archived_game, game_id)
 
-    # I'm aware this could be problematic but I don't
-    # know of a way to get games past a certain
-    # date when using SQLite (dates are required
-    # to be stored as text) so I have to manually
-    # parse each date and ensure it's valid
-    games = run_db_command(con=con, command="SELECT gameID from ingame;")
+        if record is None:
+            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="There is no archived game with that ID.")
 
-    # get gameID and lastActive from the list of games returned
-    suspected_games = [(x[0], x[2]) for x in games]
-    old_games = list()
+        return codec.decode_archive(record)
 
-    for old_game in suspected_games:
-        current_date = datetime.date(datetime.now())
 
-        if current_date - datetime.date(old_game[1]) > DAYS_UNTIL_GAME_DELETED:
-            # remove this from the list of SSE notifications
-            ONGOING_GAMES.discard(old_game[0])
-            old_games.append(f"'{old_game}'")
+##################
+# GENERIC ROUTES #
+##################
 
-    # convert this to a list of "gameID OR gameID OR gameID..."
-    old_games = " OR ".join(old_games)
 
-    run_db_command(con=con, command=f"DELETE FROM games WHERE gameID == {old_games};")
+@get("/")
+async def api_base_route() -> dict[str, str]:
+    """
+    Returns a simple success message indicating the
+    API/server is functioning properly.
+    """
+    return {"detail": "The API is up and running."}
 
-    players = run_db_command(con=con, command="SELECT userID FROM ingame;")
 
-    # get the first item from the list/tuple response
-    players = [x[0] for x in players]
+@get("/stats")
+async def api_stats(request: Request) -> dict:
+    """
+    How many streams are open and
+    how many games are in memory.
 
-    for pl in players:
-        if not await SESSION_FILE_STORE.exists(pl):
-            run_db_command(
-                con=con,
-                # TODO: figure out why this isn't working
-                # I do need to use the values in here for now,
-                # though, so it's actually good it didn't work
-                command=f"DELETE FROM ingame WHERE userID == '{pl}';"
-            )
+    NOTE: only for clients with a session, since
+    this says a lot about what the server is doing.
+    """
+    auth = await is_authenticated(request)
+    await authed(auth)
+
+    return {
+        "streams": BROADCASTER.stats(),
+        "games": games.stats(),
+        "turns": TURN_TIMER.stats(),
+        "not_modified": CONDITIONAL_GET.not_modified,
+        "boards": BOARDS.stats(),
+        "profiles": PROFILES.stats(),
+        "sessions": SESSION_STORE.stats(),
+        "auth": AUTH_CACHE.stats(),
+        "maintenance": MAINTENANCE.stats(),
+    }
 
 
 @get("/validate")
@@ -1206,12 +1568,17 @@ URL = "http://localhost/"
 cors_config = CORSConfig(allow_origins=[URL])
 rate_limit = RateLimitConfig(rate_limit=("second", 30))
 
-api_base = Router(path="/api", route_handlers=[api_base_route,api_clear_sessions,GameController,UserController])
+api_base = Router(path="/api", route_handlers=[api_base_route,api_stats,GameController,UserController,ArchiveController])
 
 app = Litestar(
     route_handlers=[api_base],
-    stores={"sessions": SESSION_FILE_STORE},
-    middleware=[rate_limit.middleware, SESSION_CONFIG.middleware],
+    stores={"sessions": SESSION_STORE},
+    # 304s are answered before the session is loaded
+    middleware=[rate_limit.middleware, CONDITIONAL_GET, SESSION_CONFIG.middleware],
     logging_config=lgr,
+    on_startup=[games.start, BROADCASTER.start, TURN_TIMER.start, MAINTENANCE.start],
+    # the cache has to save everything before the database closes
+    on_shutdown=[MAINTENANCE.stop, TURN_TIMER.stop, BROADCASTER.shutdown, games.close, db.close, SESSION_STORE.close],
+    type_encoders=TYPE_ENCODERS,
     # cors_config=cors_config,
 )
@@ -0,0 +1,321 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+A Litestar Store for sessions, in SQLite instead of one file each.
+
+With a FileStore, every request checked whether its session's file
+exists, and clearing out expired sessions meant opening every single
+file in the folder to read its expiry time. Here, sessions are rows
+in a table with an (indexed) expiry column, so deleting the expired
+ones is one DELETE of a range of that index, and the sessions that
+were used lately are also kept in memory, so loading a session or
+checking that it exists usually doesn't touch the disk at all.
+
+Sessions have a database of their own (not data.db), so the
+game's writes never wait behind them or the other way around.
+
+The session middleware saves the session at the end of every request,
+and (with renew_on_access) pushes its expiry back every time it's
+loaded, even if nothing else changed. Those only get written once the
+expiry has moved by more than RENEW_SLACK, so a session that's used
+all the time is written about once a minute instead of every request.
+The catch is that the expiry in the database can be that much behind,
+so a session that's dropped from memory before it's saved again can
+be deleted up to RENEW_SLACK seconds early.
+
+NOTE: the in-memory copies assume this is the only process using
+the database, same as the game cache (see gamecache.py).
+"""
+
+import copy
+import sqlite3
+import asyncio
+from time import time
+from datetime import timedelta
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable
+
+from litestar.stores.base import NamespacedStore
+
+import queries
+from database import AsyncDatabase
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# how many sessions are kept in memory.
+# the least recently used ones are dropped after that
+DEFAULT_CAPACITY = 65536
+
+# in seconds, see above
+RENEW_SLACK = 60
+
+# sessions are read far more than they're
+# written, and the writes are tiny
+DEFAULT_READERS = 2
+
+# how many expired sessions are deleted at a time, so
+# other writes don't wait long behind a big cleanup
+EXPIRED_BATCH_SIZE = 1000
+
+
+###########
+# CLASSES #
+###########
+
+
+@dataclass(slots=True)
+class CachedSession:
+    value: bytes
+    # unix timestamps, None if it never expires
+    expires_at: float | None
+    # what the database has, see RENEW_SLACK
+    saved_expires_at: float | None
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+def expiry(expires_in: int | timedelta | None, now: float) -> float | None:
+    """
+    When something that expires in expires_in does.
+    """
+    if isinstance(expires_in, timedelta):
+        expires_in = expires_in.total_seconds()
+
+    # same as the other stores, 0 means it doesn't expire
+    return now + expires_in if expires_in else None
+
+
+class SQLiteStore(NamespacedStore):
+    """
+    Sessions (or anything else) in an SQLite table, see above.
+
+    Use it anywhere a Store goes, e.g. in the session config or
+    the app's stores. with_namespace() gives a store that shares
+    the database and memory but only sees its own keys.
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, readers: int = DEFAULT_READERS):
+        self.path = path
+        # "" is the top level, namespaces below it are "a", "a/b", ...
+        self.namespace = ""
+        self.capacity = capacity
+
+        with closing(sqlite3.connect(path)) as con:
+            queries.create_session_table(con)
+            con.commit()
+
+        self.db = AsyncDatabase(path, readers=readers)
+
+        # (namespace, key) -> the session.
+        # every namespace shares these
+        self._sessions: OrderedDict[tuple[str, str], CachedSession] = OrderedDict()
+        self._counts = {"hits": 0, "misses": 0, "writes": 0, "skipped_writes": 0}
+
+        # see on_delete()
+        self._delete_listeners: list[Callable[[str | None], None]] = list()
+
+    def with_namespace(self, namespace: str) -> "SQLiteStore":
+        child = copy.copy(self)
+        child.namespace = f"{self.namespace}/{namespace}" if self.namespace else namespace
+        return child
+
+    def on_delete(self, listener: Callable[[str | None], None]) -> None:
+        """
+        Calls listener(key) whenever a key is deleted (in any
+        namespace), and listener(None) when a whole namespace is.
+        Expired keys are deleted whenever, so don't count on those.
+        """
+        self._delete_listeners.append(listener)
+
+    def stats(self) -> dict:
+        return {"cached": len(self._sessions), **self._counts}
+
+    def close(self) -> None:
+        self.db.close()
+
+    #############
+    # INTERNALS #
+    #############
+
+    def _remember(self, key: str, session: CachedSession) -> None:
+        self._sessions[(self.namespace, key)] = session
+        self._sessions.move_to_end((self.namespace, key))
+
+        while len(self._sessions) > self.capacity:
+            self._sessions.popitem(last=False)
+
+    async def _load(self, key: str, now: float) -> CachedSession | None:
+        """
+        The session from memory, or from the database if it's not
+        there. None if there isn't one (or it's expired, in which
+        case it's deleted).
+        """
+        session = self._sessions.get((self.namespace, key))
+
+        if session is not None:
+            self._counts["hits"] += 1
+            self._sessions.move_to_end((self.namespace, key))
+        else:
+            self._counts["misses"] += 1
+            row = await self.db.read(queries.session_by_key, self.namespace, key)
+            if row is None:
+                return None
+
+            session = CachedSession(value=row[0], expires_at=row[1], saved_expires_at=row[1])
+            self._remember(key, session)
+
+        if session.expired(now):
+            await self.delete(key)
+            return None
+
+        return session
+
+    async def _save(self, key: str, session: CachedSession, namespace: str | None = None) -> None:
+        self._counts["writes"] += 1
+        session.saved_expires_at = session.expires_at
+        await self.db.write(
+            queries.set_session,
+            self.namespace if namespace is None else namespace,
+            key, session.value, session.expires_at,
+        )
+
+    async def _save_expiry(self, key: str, session: CachedSession) -> None:
+        """
+        Saves a session whose expiry is all that changed,
+        if it changed by enough to be worth it.
+        """
+        new, saved = session.expires_at, session.saved_expires_at
+
+        if new != saved and (new is None or saved is None or abs(new - saved) > RENEW_SLACK):
+            await self._save(key, session)
+        else:
+            self._counts["skipped_writes"] += 1
+
+    #########
+    # STORE #
+    #########
+
+    async def set(self, key: str, value: str | bytes, expires_in: int | timedelta | None = None) -> None:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+
+        expires_at = expiry(expires_in, time())
+        session = self._sessions.get((self.namespace, key))
+
+        # the session middleware saves sessions that didn't change, too
+        if session is not None and session.value == value:
+            session.expires_at = expires_at
+            self._sessions.move_to_end((self.namespace, key))
+            await self._save_expiry(key, session)
+            return
+
+        session = CachedSession(value=value, expires_at=expires_at, saved_expires_at=None)
+        self._remember(key, session)
+        await self._save(key, session)
+
+    async def get(self, key: str, renew_for: int | timedelta | None = None) -> bytes | None:
+        now = time()
+        session = await self._load(key, now)
+
+        if session is None:
+            return None
+
+        # only things that expire get renewed
+        if renew_for and session.expires_at is not None:
+            session.expires_at = expiry(renew_for, now)
+            await self._save_expiry(key, session)
+
+        return session.value
+
+    async def delete(self, key: str) -> None:
+        self._sessions.pop((self.namespace, key), None)
+        for listener in self._delete_listeners:
+            listener(key)
+
+        await self.db.write(queries.delete_session, self.namespace, key)
+
+    async def delete_all(self) -> None:
+        """
+        Deletes everything in this namespace
+        and the namespaces below it.
+        """
+        prefix = f"{self.namespace}/" if self.namespace else ""
+
+        for namespace, key in list(self._sessions):
+            if namespace == self.namespace or namespace.startswith(prefix):
+                del self._sessions[(namespace, key)]
+
+        for listener in self._delete_listeners:
+            listener(None)
+
+        await self.db.write(queries.delete_session_namespace, self.namespace, prefix)
+
+    async def delete_expired(self) -> int:
+        """
+        Deletes every expired session (of every namespace),
+        returns how many were in the database.
+        """
+        now = time()
+
+        for (namespace, key), session in list(self._sessions.items()):
+            if session.expired(now):
+                del self._sessions[(namespace, key)]
+
+            # it was renewed, but the database doesn't know yet
+            elif session.saved_expires_at is not None and session.saved_expires_at <= now:
+                await self._save(key, session, namespace)
+
+        deleted = 0
+
+        while True:
+            batch = await self.db.write(queries.delete_expired_sessions, now, EXPIRED_BATCH_SIZE)
+            deleted += batch
+
+            if batch < EXPIRED_BATCH_SIZE:
+                return deleted
+
+            await asyncio.sleep(0)
+
+    async def exists(self, key: str) -> bool:
+        return await self._load(key, time()) is not None
+
+    async def existing(self, keys) -> frozenset[str]:
+        """
+        The ones of the keys that exist, all looked up at once
+        instead of an exists() each. (the ones that aren't in
+        memory aren't loaded into it, and expired ones are left
+        for delete_expired())
+        """
+        now = time()
+        found = set()
+        missing = list()
+
+        for key in keys:
+            session = self._sessions.get((self.namespace, key))
+
+            if session is None:
+                missing.append(key)
+            elif not session.expired(now):
+                found.add(key)
+
+        if missing:
+            found |= await self.db.read(queries.live_session_keys, self.namespace, missing, now)
+
+        return frozenset(found)
+
+    async def expires_in(self, key: str) -> int | None:
+        now = time()
+        session = await self._load(key, now)
+
+        if session is None or session.expires_at is None:
+            return None
+
+        return int(session.expires_at - now)
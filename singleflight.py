@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Coalesces identical work that's asked for at the same time.
+
+Right after a move is broadcast, every player in the game asks
+for the board at (more or less) the same moment. Most of building
+a board is the same for all of them, so instead of each request
+doing it, the first one starts it and the rest wait for that same
+result. Whatever's left (e.g. each player's own hand) is still
+done per request.
+
+The work runs as a task of its own, so if the request that
+started it goes away (the client disconnected) it still
+finishes for everyone else waiting on it.
+
+Nothing is cached: once the work is done the next
+request with the same key starts it again.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+###########
+# CLASSES #
+###########
+
+
+class SingleFlight:
+    """
+    Key -> the work that's being done for it right now.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = dict()
+
+        # every call, and how many of them
+        # waited on another call's work
+        self.calls = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns work()'s result, sharing it with every
+        other call with the same key while it runs.
+
+        The key should say which version of things the work
+        is for (e.g. a game's fingerprint), so that nobody
+        gets the result of work that started before a change.
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(work())
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.coalesced += 1
+
+        # one caller being cancelled doesn't cancel it for the rest
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+        # if everyone waiting on it was cancelled, nobody else
+        # would look at the exception and asyncio complains
+        if not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Works out what a move changed: which tiles a proposed
+table has that the current one doesn't (and so have to
+come from the player's hand), and which ones it's missing.
+
+Groups can be rearranged however the player likes, so this
+doesn't compare groups at all. It only counts tile codes
+(see classes.TileArray): how many of each tile the proposed
+table has, minus how many the current table has. Rummikub
+has two of every tile, so these are multisets, not sets.
+
+Everything is one pass over each table and the hand.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+from classes import Group, TileArray
+
+
+###########
+# CLASSES #
+###########
+
+
+@dataclass
+class TableDiff:
+    """
+    The difference between the current table
+    (plus a hand) and a proposed table.
+    """
+    # the tiles the proposed table added
+    added: TileArray = field(default_factory=TileArray)
+    # tiles on the current table that the proposed one doesn't have
+    missing: TileArray = field(default_factory=TileArray)
+    # added tiles that aren't in the hand
+    not_in_hand: TileArray = field(default_factory=TileArray)
+    # the hand without the added tiles, in the same order
+    # (only meaningful if not_in_hand is empty)
+    remaining_hand: TileArray = field(default_factory=TileArray)
+
+    @property
+    def valid(self) -> bool:
+        """
+        Whether the move only added tiles,
+        at least one, all from the hand.
+        """
+        return len(self.added) > 0 and len(self.missing) == 0 and len(self.not_in_hand) == 0
+
+
+###########
+# DIFFING #
+###########
+
+
+def count_tiles(groups) -> Counter:
+    """
+    Tile code -> how many of it there are in the groups.
+    """
+    counts = Counter()
+    for group in groups:
+        counts.update(group.tiles.codes)
+    return counts
+
+
+def _expand(counts: Counter) -> TileArray:
+    # sorted so the same diff always reads the same
+    return TileArray.from_codes(sorted(counts.elements()))
+
+
+def diff_table(old_groups: tuple[Group, ...], new_groups: tuple[Group, ...], hand: TileArray) -> TableDiff:
+    """
+    What the new groups changed compared to the old ones,
+    and whether the hand given has the tiles that were added.
+    """
+    delta = count_tiles(new_groups)
+    delta.subtract(count_tiles(old_groups))
+
+    added = Counter({code: n for code, n in delta.items() if n > 0})
+    missing = Counter({code: -n for code, n in delta.items() if n < 0})
+
+    # Counter subtraction drops anything that goes to 0 or less
+    not_in_hand = added - Counter(hand.codes)
+
+    # the hand minus one of each added tile, keeping its order
+    to_use = Counter(added)
+    remaining = list()
+    for code in hand.codes:
+        if to_use[code] > 0:
+            to_use[code] -= 1
+        else:
+            remaining.append(code)
+
+    return TableDiff(
+        added=_expand(added),
+        missing=_expand(missing),
+        not_in_hand=_expand(not_in_hand),
+        remaining_hand=TileArray.from_codes(remaining),
+    )
@@ -0,0 +1,27 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+What the tests share.
+
+server.py sets itself up (database and all) when it's
+imported, so that happens in a temporary directory.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+
+    try:
+        import server
+    finally:
+        os.chdir(cwd)
+
+    return server
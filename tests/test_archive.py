@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Archiving ended games (see server.archive_ended_games
+and codec.encode_archive).
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+import asyncio
+from time import time
+
+import codec
+import queries
+from classes import Game, Hand, IngameRow
+
+
+def ended_game(server) -> tuple[Game, list[IngameRow]]:
+    """
+    A game that ended long enough ago to be archived,
+    won by the player with turn number 0.
+    """
+    game = Game()
+    game.start()
+
+    rows = [IngameRow(game_id=game.id, user_id=f"{game.id}-{i}", hand=Hand(), turn_number=i) for i in range(4)]
+    game.dole_out_hands(rows)
+    rows[0].hand = Hand()
+
+    game.game_state = "ENDED"
+    game.last_active = int(time()) - server.SECONDS_UNTIL_GAME_ARCHIVED - 60
+
+    return game, rows
+
+
+def test_archived_games_have_final_scores(server):
+    game, rows = ended_game(server)
+
+    async def archive() -> bytes:
+        await server.db.write(queries.insert_game, game)
+        for row in rows:
+            await server.db.write(queries.insert_player, row.user_id, game.id, row.turn_number, row.hand)
+
+        await server.archive_ended_games()
+        return await server.db.read(queries.archived_game, game.id)
+
+    record = codec.decode_archive(asyncio.run(archive()))
+    scores = {player["turnNumber"]: player["hand"]["score"] for player in record["players"]}
+
+    # what's left in their hands counts against them (jokers most of all)
+    for row in rows:
+        expected = -sum(tile.number + (30 if tile.joker else 0) for tile in row.hand.tiles)
+        assert scores[row.turn_number] == expected
+
+    assert scores[0] == 0
+    assert all(scores[row.turn_number] < 0 for row in rows[1:])
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Clients reconnecting to a game's stream (see broadcast.py):
+what they're sent depending on the Last-Event-ID they had.
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+import asyncio
+
+import pytest
+
+from broadcast import Broadcaster, GameEvent, event_id, parse_event_id
+
+
+GAME = "game"
+
+
+def received(subscription) -> list[GameEvent]:
+    """
+    Everything the subscription was sent so far.
+    (closing it first, so nothing is waited for)
+    """
+    subscription.close()
+
+    async def drain():
+        messages = list()
+        while (message := await subscription.get()) is not None:
+            messages.append(message)
+        return messages
+
+    return asyncio.run(drain())
+
+
+def broadcaster_with_events(count: int, history_size: int = 8) -> tuple[Broadcaster, list[GameEvent]]:
+    broadcaster = Broadcaster(history_size=history_size)
+    events = [broadcaster.publish(GAME, "move", {"n": n}) for n in range(count)]
+    return broadcaster, events
+
+
+def test_event_ids():
+    assert parse_event_id(event_id("3f2a9c1e.7", 12)) == ("3f2a9c1e.7", 12)
+    assert parse_event_id(None) is None
+    assert parse_event_id("") is None
+    assert parse_event_id("12") == ("", 12)
+    assert parse_event_id("3f2a9c1e.7:twelve") is None
+
+
+def test_new_subscribers_get_nothing_old():
+    broadcaster, _ = broadcaster_with_events(3)
+
+    assert received(broadcaster.subscribe(GAME)) == []
+
+
+def test_reconnecting_replays_what_was_missed():
+    broadcaster, events = broadcaster_with_events(5)
+    subscription = broadcaster.subscribe(GAME, events[1].id)
+
+    assert received(subscription) == events[2:]
+
+
+def test_reconnecting_up_to_date_gets_nothing():
+    broadcaster, events = broadcaster_with_events(5)
+
+    assert received(broadcaster.subscribe(GAME, events[-1].id)) == []
+    assert received(broadcaster.subscribe(GAME, broadcaster.last_event_id(GAME))) == []
+
+
+def test_another_epoch_gets_a_snapshot():
+    broadcaster, events = broadcaster_with_events(5)
+    # the same number, but from before the numbers started over
+    old_id = events[1].id
+    broadcaster.close(GAME)
+    new_events = [broadcaster.publish(GAME, "move") for _ in range(3)]
+
+    assert new_events[1].seq == events[1].seq
+    assert received(broadcaster.subscribe(GAME, old_id)) == [
+        GameEvent(epoch=broadcaster.epoch(GAME), seq=3, event="snapshot"),
+    ]
+
+    # or from another server entirely
+    other_id = event_id(Broadcaster().epoch(GAME), 2)
+    assert [m.event for m in received(broadcaster.subscribe(GAME, other_id))] == ["snapshot"]
+
+
+def test_events_older_than_the_history_get_a_snapshot():
+    broadcaster, events = broadcaster_with_events(10, history_size=4)
+
+    # 6 through 9 are still kept, so 5 is the oldest that can be caught up
+    assert received(broadcaster.subscribe(GAME, events[5].id)) == events[6:]
+    assert received(broadcaster.subscribe(GAME, events[4].id)) == [
+        GameEvent(epoch=broadcaster.epoch(GAME), seq=10, event="snapshot"),
+    ]
+
+
+def test_events_from_the_future_get_a_snapshot():
+    broadcaster, _ = broadcaster_with_events(3)
+    future_id = event_id(broadcaster.epoch(GAME), 7)
+
+    assert [m.event for m in received(broadcaster.subscribe(GAME, future_id))] == ["snapshot"]
+
+
+@pytest.mark.parametrize("last_event_id", ["", "nonsense", ":", "abc:", "abc:1.5", "::::"])
+def test_malformed_ids_are_ignored(last_event_id):
+    broadcaster, _ = broadcaster_with_events(3)
+    subscription = broadcaster.subscribe(GAME, last_event_id)
+    broadcaster.publish(GAME, "draw")
+
+    # nothing about the ID can be trusted, so the client
+    # starts over, and the stream carries on as normal
+    assert [m.event for m in received(subscription)] == ["snapshot", "draw"]
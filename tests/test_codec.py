@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Game objects going into database columns and coming back
+out of them (see codec.py), in both column formats, and
+rows written by the old to_json code.
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+import pytest
+
+import codec
+from classes import COLORS, Tile, Group, Game, GameSettings, Hand, IngameRow
+
+
+RED = COLORS["RED"]
+
+
+@pytest.fixture(params=[False, True], ids=["json", "binary"])
+def binary_columns(request, monkeypatch):
+    monkeypatch.setattr(codec, "BINARY_COLUMNS", request.param)
+    return request.param
+
+
+def ongoing_game(shuffled_pool: bool = True) -> tuple[Game, list[IngameRow]]:
+    """
+    A started game with a group on the table, some tiles drawn,
+    and its players.
+    """
+    game = Game(game_data=GameSettings(shuffled_pool=shuffled_pool))
+    game.start()
+
+    rows = [IngameRow(game_id=game.id, user_id=f"player{i}", hand=Hand(), turn_number=i) for i in range(3)]
+    game.dole_out_hands(rows)
+    rows[0].hand.tiles.append(game.draw_tile())
+
+    game.table.groups = (Group(tiles=[Tile(number=n, color=RED) for n in (4, 5, 6)]),)
+    game.current_player_turn = 2
+    game.turn_deadline = 1234
+    game.timeouts = 1
+
+    return game, rows
+
+
+def round_trip(game: Game) -> Game:
+    return codec.game_from_row(codec.game_to_row(game), list(codec.GAME_SCHEMA))
+
+
+def test_games_round_trip(binary_columns):
+    for shuffled_pool in (True, False):
+        game, _ = ongoing_game(shuffled_pool)
+        decoded = round_trip(game)
+
+        assert decoded.id == game.id
+        assert decoded.game_state == game.game_state
+        assert decoded.last_active == game.last_active
+        assert decoded.current_player_turn == game.current_player_turn
+        assert decoded.turn_deadline == game.turn_deadline
+        assert decoded.timeouts == game.timeouts
+        assert decoded.game_data == game.game_data
+
+        assert [list(g.tiles) for g in decoded.table.groups] == [list(g.tiles) for g in game.table.groups]
+        assert decoded.table.seed == game.table.seed
+        assert decoded.table.cursor == game.table.cursor
+        assert decoded.table.pool_size() == game.table.pool_size()
+
+
+def test_shuffled_pools_are_rebuilt_from_the_seed(binary_columns):
+    game, _ = ongoing_game()
+    decoded = round_trip(game)
+
+    assert game.table.seed is not None
+    # the same tiles left, in the same order
+    assert decoded.table.pool == game.table.pool
+    assert [decoded.draw_tile() for _ in range(5)] == [game.draw_tile() for _ in range(5)]
+
+
+def test_ingame_rows_round_trip(binary_columns):
+    _, rows = ongoing_game()
+
+    for row in rows:
+        row.hand.update_score()
+        column = codec.encode_hand(row.hand)
+
+        assert isinstance(column, bytes) == binary_columns
+
+        decoded = codec.ingame_row_from_db((row.user_id, row.game_id, row.turn_number, column))
+
+        assert decoded == row
+        assert decoded.hand.score < 0
+
+
+def test_legacy_rows_are_read():
+    # what the old to_json decorator wrote:
+    # Python's True/False/None, in JSON quotes
+    hand = '{"score": -11, "tiles": [{"number": 5, "color": "#FF2E17", "joker": False}, {"number": 6, "color": "#FF2E17", "joker": False}]}'
+    table = (
+        '{"pool": [{"number": 0, "color": "#000000", "joker": True}], '
+        '"groups": [{"tiles": [{"number": 1, "color": "#FF2E17", "joker": False}, '
+        '{"number": 2, "color": "#FF2E17", "joker": False}, '
+        '{"number": 3, "color": "#FF2E17", "joker": False}]}]}'
+    )
+    settings = '{"turn_time_limit": 60, "max_players": 4, "joker_count": 2, "max_tile": 13, "min_tile": 1}'
+
+    assert codec.read_legacy(hand)["tiles"][0] == {"number": 5, "color": RED, "joker": False}
+
+    decoded_hand = codec.decode_hand(hand)
+    assert decoded_hand.score == -11
+    assert list(decoded_hand.tiles) == [Tile(number=5, color=RED), Tile(number=6, color=RED)]
+
+    game = codec.game_from_row(
+        ("abc", "ONGOING", "100", "1", table, settings, None, "0"),
+        list(codec.GAME_SCHEMA),
+    )
+
+    assert game.last_active == 100
+    assert game.current_player_turn == 1
+    assert list(game.table.pool) == [Tile(color=COLORS["BLACK"], joker=True)]
+    assert [list(g.tiles) for g in game.table.groups] == [[Tile(number=n, color=RED) for n in (1, 2, 3)]]
+    # games from before shuffled pools keep the old pool
+    assert game.table.seed is None
+    assert not game.game_data.shuffled_pool
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Group validation through the meld lookup engine (see melds.py
+and Group.is_valid()): which groups are valid, and the order
+their tiles are put in when they are.
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+from classes import COLORS, Tile, Group, GameSettings
+from melds import MAX_GROUP_JOKERS
+
+
+SETTINGS = GameSettings()
+
+BLACK = COLORS["BLACK"]
+BLUE = COLORS["BLUE"]
+ORANGE = COLORS["ORANGE"]
+RED = COLORS["RED"]
+
+
+def red(number: int) -> Tile:
+    return Tile(number=number, color=RED)
+
+
+def joker(color: str = BLACK) -> Tile:
+    return Tile(color=color, joker=True)
+
+
+def validate(tiles: list[Tile], max_tile: int = SETTINGS.max_tile, min_tile: int = SETTINGS.min_tile) -> list[Tile] | None:
+    """
+    The group's tiles after validating it,
+    or None if it wasn't valid.
+    """
+    group = Group(tiles=tiles)
+
+    if not group.is_valid(max_tile, min_tile):
+        return None
+
+    return list(group.tiles)
+
+
+def test_groups_in_order_are_left_alone():
+    group = Group(tiles=[red(4), red(5), red(6)])
+    tiles = group.tiles
+
+    assert group.is_valid(SETTINGS.max_tile, SETTINGS.min_tile)
+    assert group.tiles is tiles
+
+
+def test_runs_are_reordered():
+    assert validate([red(6), red(4), red(5)]) == [red(4), red(5), red(6)]
+
+
+def test_extra_jokers_go_at_the_end_of_a_run():
+    assert validate([joker(), red(5), red(6)]) == [red(5), red(6), joker()]
+    assert validate([red(5), joker(BLUE), joker(), red(6)]) == [red(5), red(6), joker(BLUE), joker()]
+
+
+def test_extra_jokers_go_at_the_start_of_a_run_with_no_room_after():
+    assert validate([red(13), red(12), joker()]) == [joker(), red(12), red(13)]
+
+    # one fits after, the other has to go before
+    assert validate([joker(), red(11), joker(BLUE), red(12)]) == [joker(), red(11), red(12), joker(BLUE)]
+
+
+def test_jokers_fill_gaps_in_a_run():
+    assert validate([red(7), joker(), red(5)]) == [red(5), joker(), red(7)]
+    assert validate([red(9), joker(), red(5), joker(BLUE)]) is None
+    assert validate([red(8), joker(), red(5), joker(BLUE)]) == [red(5), joker(), joker(BLUE), red(8)]
+
+
+def test_runs_at_the_edges_of_the_tile_range():
+    assert validate([red(1), red(2), red(3)]) == [red(1), red(2), red(3)]
+    assert validate([red(13), red(11), red(12)]) == [red(11), red(12), red(13)]
+    assert validate([red(1), red(13), red(12)]) is None
+
+    # outside of the range
+    assert validate([red(12), red(13), red(14)]) is None
+    assert validate([red(0), red(1), red(2)]) is None
+    assert validate([red(4), red(5), red(6)], max_tile=5) is None
+    assert validate([red(3), red(4), red(5)], max_tile=5) == [red(3), red(4), red(5)]
+
+
+def test_sets_are_put_in_color_order():
+    tiles = [Tile(number=7, color=c) for c in (RED, BLACK, ORANGE)]
+
+    assert validate(tiles) == [Tile(number=7, color=c) for c in (BLACK, ORANGE, RED)]
+    assert validate([Tile(number=7, color=RED), joker(), Tile(number=7, color=BLUE), Tile(number=7, color=BLACK)]) == [
+        Tile(number=7, color=BLACK),
+        Tile(number=7, color=BLUE),
+        Tile(number=7, color=RED),
+        joker(),
+    ]
+
+
+def test_sets_with_the_same_color_twice_are_invalid():
+    assert validate([red(7), red(7), Tile(number=7, color=BLUE)]) is None
+    assert validate([red(7), Tile(number=7, color=BLUE), red(7), joker()]) is None
+
+
+def test_the_same_tile_twice_in_a_run_is_invalid():
+    assert validate([red(5), red(5), red(6)]) is None
+    # (two 12s add up to a 13 in the key, which
+    # must not pass for an 11, 12, 13 run)
+    assert validate([red(11), red(12), red(12)]) is None
+    assert validate([red(13), red(13), red(12), red(11)]) is None
+
+
+def test_too_many_jokers_is_invalid():
+    jokers = [joker() for _ in range(MAX_GROUP_JOKERS)]
+
+    assert validate([red(1)] + jokers) == [red(1)] + jokers
+    assert validate([red(1)] + jokers + [joker()]) is None
+    assert validate([red(1), red(2)] + jokers + [joker()]) is None
+
+
+def test_too_few_tiles_is_invalid():
+    assert validate([red(1), red(2)]) is None
+    assert validate([red(1), joker()]) is None
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Working out what a move changed (see tablediff.py): tiles
+are counted, not compared group by group, and Rummikub has
+two of every tile.
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+from classes import COLORS, Tile, Group, TileArray
+from tablediff import diff_table
+
+
+BLACK = COLORS["BLACK"]
+BLUE = COLORS["BLUE"]
+RED = COLORS["RED"]
+
+
+def tile(number: int, color: str = RED) -> Tile:
+    return Tile(number=number, color=color)
+
+
+def group(*tiles: Tile) -> Group:
+    return Group(tiles=list(tiles))
+
+
+# what's on the table before every move below
+TABLE = (
+    group(tile(5), tile(6), tile(7)),
+    group(tile(9, BLACK), tile(9, BLUE), tile(9)),
+)
+
+
+def test_adding_a_tile_from_the_hand():
+    hand = TileArray([tile(1, BLUE), tile(8), tile(2, BLACK)])
+    new_table = (group(tile(5), tile(6), tile(7), tile(8)), TABLE[1])
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert diff.valid
+    assert list(diff.added) == [tile(8)]
+    assert list(diff.missing) == []
+    assert list(diff.not_in_hand) == []
+
+
+def test_the_second_copy_of_a_tile_on_the_table():
+    # one red 7 is on the table already, the other is in the hand
+    hand = TileArray([tile(7), tile(3, BLUE)])
+    new_table = TABLE + (group(tile(7), tile(7, BLACK), tile(7, BLUE)),)
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert not diff.valid
+    # (sorted by tile code, which puts the colors in order)
+    assert list(diff.added) == [tile(7, BLACK), tile(7, BLUE), tile(7)]
+    assert list(diff.not_in_hand) == [tile(7, BLACK), tile(7, BLUE)]
+    assert list(diff.remaining_hand) == [tile(3, BLUE)]
+
+
+def test_only_one_copy_of_a_tile_is_taken_from_the_hand():
+    hand = TileArray([tile(7), tile(7), tile(3, BLUE)])
+    new_table = (TABLE[0], group(tile(7), tile(8), tile(9)), TABLE[1])
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert list(diff.added) == [tile(7), tile(8), tile(9)]
+    assert list(diff.not_in_hand) == [tile(8), tile(9)]
+    assert list(diff.remaining_hand) == [tile(7), tile(3, BLUE)]
+
+
+def test_rearranging_only_is_not_a_move():
+    new_table = (
+        group(tile(5), tile(6)),
+        group(tile(7), tile(9, BLACK), tile(9, BLUE), tile(9)),
+    )
+
+    diff = diff_table(TABLE, new_table, TileArray([tile(1)]))
+
+    assert not diff.valid
+    assert list(diff.added) == []
+    assert list(diff.missing) == []
+    assert list(diff.remaining_hand) == [tile(1)]
+
+
+def test_taking_a_tile_off_the_table():
+    hand = TileArray([tile(4)])
+    # the 7 went back into the hand, the 4 came out of it
+    new_table = (group(tile(4), tile(5), tile(6)), TABLE[1])
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert not diff.valid
+    assert list(diff.added) == [tile(4)]
+    assert list(diff.missing) == [tile(7)]
+    assert list(diff.not_in_hand) == []
+
+
+def test_tiles_that_are_not_in_the_hand():
+    hand = TileArray([tile(1), tile(2)])
+    new_table = (group(tile(4), tile(5), tile(6), tile(7)), TABLE[1])
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert not diff.valid
+    assert list(diff.added) == [tile(4)]
+    assert list(diff.not_in_hand) == [tile(4)]
+
+
+def test_the_remaining_hand_keeps_its_order():
+    hand = TileArray([tile(12, BLUE), tile(8), tile(1, BLACK), tile(4), tile(8), tile(3)])
+    new_table = (group(tile(4), tile(5), tile(6), tile(7), tile(8)), TABLE[1])
+
+    diff = diff_table(TABLE, new_table, hand)
+
+    assert diff.valid
+    # only the first 8 is used
+    assert list(diff.remaining_hand) == [tile(12, BLUE), tile(1, BLACK), tile(8), tile(3)]
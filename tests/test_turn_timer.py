@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+The turn timer (see turntimer.py and the TURN TIMER section
+of server.py): which games get their turns timed, and when
+it stops moving a game along by itself.
+
+Run from the repository root with:
+
+python -m pytest -q
+"""
+
+import sqlite3
+import asyncio
+from contextlib import closing
+
+import queries
+from classes import Game, GameSettings, Hand, IngameRow
+from functions import initialize_db_and_tables
+
+
+def ongoing_game(turn_time_limit: int = 60, players: int = 4) -> tuple[Game, list[IngameRow]]:
+    """
+    A game that was just started, and its players.
+    """
+    game = Game(game_data=GameSettings(turn_time_limit=turn_time_limit))
+    game.start()
+
+    rows = [IngameRow(game_id=game.id, user_id=f"player{i}", hand=Hand(), turn_number=i) for i in range(players)]
+    game.dole_out_hands(rows)
+    game.current_player_turn = 1
+
+    return game, rows
+
+
+def test_untimed_games_have_no_deadline():
+    with closing(sqlite3.connect(":memory:")) as con:
+        initialize_db_and_tables(con)
+
+        timed, _ = ongoing_game()
+        timed.turn_deadline = 1000
+        untimed, _ = ongoing_game(turn_time_limit=0)
+
+        for game in (timed, untimed):
+            queries.insert_game(con, game)
+
+        assert queries.turn_deadlines(con) == [(timed.id, timed.current_player_turn, 1000)]
+
+
+def test_untimed_turns_are_not_scheduled(server):
+    for limit in (0, -1):
+        game, _ = ongoing_game(turn_time_limit=limit)
+        server.schedule_turn(game)
+
+        assert game.turn_deadline is None
+        assert game.id not in server.TURN_TIMER
+
+
+def test_timed_turns_are_scheduled(server):
+    game, _ = ongoing_game(turn_time_limit=60)
+    server.schedule_turn(game)
+
+    assert game.turn_deadline is not None
+    assert server.TURN_TIMER.deadline(game.id) == game.turn_deadline
+
+    server.TURN_TIMER.cancel(game.id)
+
+
+def test_abandoned_games_stop_being_timed(server):
+    game, rows = ongoing_game()
+    live = server.games.add(game, rows)
+    last_active = game.last_active
+    server.schedule_turn(game)
+
+    async def expire_all() -> int:
+        expired = 0
+
+        while game.id in server.TURN_TIMER and expired < 100:
+            await server.expire_turn(game.id, game.current_player_turn)
+            expired += 1
+
+        return expired
+
+    try:
+        expired = asyncio.run(expire_all())
+    finally:
+        server.games.discard(game.id)
+
+    assert expired == game.game_data.max_players * server.MAX_TIMED_OUT_ROUNDS
+    assert game.turn_deadline is None
+    # running out of time isn't activity
+    assert game.last_active == last_active
+
+    # until somebody plays again
+    server.GameController.finish_turn(live, rows[game.current_player_turn % 4].user_id)
+    assert game.timeouts == 0
+    assert game.id in server.TURN_TIMER
+
+    server.TURN_TIMER.cancel(game.id)
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+
+# created by @wiz-rd
+
+"""
+Enforces GameSettings.turn_time_limit.
+
+Every ongoing game has one deadline: when its current turn
+runs out. All of them live in a single heap (earliest first)
+that one background task works through, sleeping until the
+earliest deadline instead of every game having a task of its own.
+
+Scheduling a game again (i.e. the turn moved on) or cancelling
+it doesn't dig through the heap: the old entry just stays in
+there and is skipped when it comes up, since it no longer
+matches the game's current deadline. The heap is rebuilt
+every so often so those don't pile up.
+
+Deadlines are unix timestamps (when the turn started +
+turn_time_limit), the same as what's saved in the database
+(turnDeadline), so they can be rebuilt from it after a
+restart (see queries.turn_deadlines).
+"""
+
+import heapq
+import asyncio
+import logging
+from time import time
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+######################
+# ABSOLUTE VARIABLES #
+######################
+
+# the heap is rebuilt once it has this many
+# times more entries than there are deadlines
+COMPACT_RATIO = 2
+# but never when it's smaller than this
+COMPACT_MIN = 1024
+
+
+###########
+# CLASSES #
+###########
+
+
+class TurnTimer:
+    """
+    Calls on_expire(game_id, turn) for every turn
+    that runs out before it's played.
+
+    on_expire has to check the turn still hasn't been
+    played itself; a move and the deadline can race.
+    """
+
+    def __init__(self, on_expire: Callable[[str, int], Awaitable[None]]):
+        self.on_expire = on_expire
+
+        # (deadline, game ID, turn), earliest first.
+        # can have old entries, see _is_current()
+        self._heap: list[tuple[float, str, int]] = list()
+        # game ID -> (deadline, turn) of its current turn
+        self._deadlines: dict[str, tuple[float, int]] = dict()
+
+        # set when there's a new earliest deadline,
+        # so the loop stops sleeping for the old one
+        self._changed = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+
+        self.expired_count = 0
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def stats(self) -> dict:
+        return {
+            "games": len(self._deadlines),
+            "heap": len(self._heap),
+            "expired": self.expired_count,
+        }
+
+    def deadline(self, game_id: str) -> float | None:
+        entry = self._deadlines.get(game_id)
+        return entry[0] if entry is not None else None
+
+    def schedule(self, game_id: str, turn: int, deadline: float) -> None:
+        """
+        Sets when the game's turn runs out, replacing
+        whatever deadline it had before.
+        """
+        self._deadlines[game_id] = (deadline, turn)
+        heapq.heappush(self._heap, (deadline, game_id, turn))
+
+        # it's the earliest one now
+        if self._heap[0][1] == game_id:
+            self._changed.set()
+
+        self._compact()
+
+    def cancel(self, game_id: str) -> None:
+        """
+        Stops timing the game, e.g. when it ends.
+        """
+        self._deadlines.pop(game_id, None)
+
+    def _is_current(self, entry: tuple[float, str, int]) -> bool:
+        deadline, game_id, turn = entry
+        return self._deadlines.get(game_id) == (deadline, turn)
+
+    def _compact(self) -> None:
+        if len(self._heap) < max(COMPACT_MIN, len(self._deadlines) * COMPACT_RATIO):
+            return
+
+        self._heap = [(deadline, game_id, turn) for game_id, (deadline, turn) in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def next_deadline(self) -> float | None:
+        """
+        The earliest deadline, if there are any.
+        """
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+
+        return self._heap[0][0] if self._heap else None
+
+    def expired(self, now: float | None = None) -> list[tuple[str, int]]:
+        """
+        Removes and returns every (game ID, turn)
+        whose deadline has passed.
+        """
+        if now is None:
+            now = time()
+
+        expired = list()
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+
+            if self._is_current(entry):
+                _, game_id, turn = entry
+                del self._deadlines[game_id]
+                expired.append((game_id, turn))
+
+        return expired
+
+    async def _run(self) -> None:
+        while True:
+            self._changed.clear()
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0, deadline - time())
+
+            # woken up early if something earlier is scheduled
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+                continue
+            except TimeoutError:
+                pass
+
+            for game_id, turn in self.expired():
+                self.expired_count += 1
+
+                try:
+                    await self.on_expire(game_id, turn)
+                except Exception:
+                    logger.exception("Failed to end turn %s of game %s.", turn, game_id)
+
+    async def start(self) -> None:
+        """
+        Starts enforcing the deadlines in the background.
+        """
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None